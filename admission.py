@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from clients import SqliteConnections
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+
+
+class AdmissionError(Exception):
+    """Work turned away: 429 when the caller is over their own rate, 503 when the server or Groq is saturated."""
+
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class BucketStore:
+    """Token buckets in SQLite, so every gunicorn worker using the same file draws on the same budget."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connections = SqliteConnections(path, autocommit=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def take(self, buckets: List[Tuple[str, float, float, float]]) -> float:
+        """Take `cost` tokens from every (key, refill per second, capacity, cost) bucket, all or nothing.
+
+        Returns 0 when they were taken, otherwise the seconds until all of them could be; a cost above
+        a bucket's capacity is capped at the capacity so it is delayed rather than refused forever.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            levels, wait = [], 0.0
+            for key, rate, capacity, cost in buckets:
+                row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                cost = min(cost, capacity)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+                levels.append((key, tokens - cost))
+            if wait == 0:
+                conn.executemany('INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                                 [(key, tokens, now) for key, tokens in levels])
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+class UserRateLimiter:
+    """A token bucket per user: `per_minute` requests sustained, up to `burst` at once. 0 disables it."""
+
+    def __init__(self, buckets: BucketStore, per_minute: float, burst: int):
+        self.buckets = buckets
+        self.per_minute = per_minute
+        self.burst = max(1, burst)
+        self.limited = 0
+        self._lock = threading.Lock()
+
+    def check(self, user: str, cost: float = 1.0):
+        """Charge one request to `user`; raises AdmissionError (429) when their bucket is empty."""
+        if self.per_minute <= 0:
+            return
+        wait = self.buckets.take([(f"user:{user}", self.per_minute / 60, self.burst, cost)])
+        if wait:
+            with self._lock:
+                self.limited += 1
+            logger.info(f"Rate limited {user} for {wait:.1f}s")
+            raise AdmissionError("Too many requests; please slow down", 429, wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'per_minute': self.per_minute, 'burst': self.burst, 'limited': self.limited}
+
+
+class _Ticket:
+    __slots__ = ('user', 'granted', 'wake')
+
+    def __init__(self, user: str, wake: Optional[Callable[[], None]] = None):
+        self.user = user
+        self.granted = False
+        self.wake = wake
+
+
+class FairQueue:
+    """Caps the expensive requests a worker process runs at once.
+
+    When all `slots` are busy, requests wait in per-user queues that are served round-robin, so a
+    user with many uploads in flight cannot starve everyone else. A request waits at most `max_wait`
+    seconds, and at most `max_waiting` requests wait at all; the rest are rejected (503) with a
+    Retry-After estimated from how long slots have recently been held.
+    """
+
+    def __init__(self, slots: int, max_wait: float, max_waiting: int):
+        self.slots = max(1, slots)
+        self.max_wait = max_wait
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.hold_seconds = 5.0  # moving average of how long a request keeps its slot
+        self._queues: 'OrderedDict[str, deque]' = OrderedDict()
+        self._cond = threading.Condition()
+
+    def _retry_after(self) -> float:
+        return self.hold_seconds * (self.waiting + 1) / self.slots
+
+    def _reject(self, message: str):
+        self.rejected += 1
+        raise AdmissionError(message, 503, self._retry_after())
+
+    def _grant_next(self):
+        while self.active < self.slots and self._queues:
+            user, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # The user goes to the back of the line for their next request
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+            ticket.granted = True
+            if ticket.wake is not None:
+                ticket.wake()
+            self.waiting -= 1
+            self.active += 1
+        self._cond.notify_all()
+
+    def _release(self, start: float):
+        with self._cond:
+            self.hold_seconds = 0.8 * self.hold_seconds + 0.2 * (time.monotonic() - start)
+            self.active -= 1
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, user: str):
+        with self._cond:
+            if self.active < self.slots and not self._queues:
+                self.active += 1
+            else:
+                if self.waiting >= self.max_waiting:
+                    self._reject("Server is busy; please retry shortly")
+                ticket = _Ticket(user)
+                self._queues.setdefault(user, deque()).append(ticket)
+                self.waiting += 1
+                if not self._cond.wait_for(lambda: ticket.granted, timeout=self.max_wait):
+                    self._queues[user].remove(ticket)
+                    if not self._queues[user]:
+                        del self._queues[user]
+                    self.waiting -= 1
+                    self._reject("Server is busy; please retry shortly")
+            self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(start)
+
+    @asynccontextmanager
+    async def aslot(self, user: str):
+        """slot() for coroutines; shares the same slots and queues, and waits without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        granted = asyncio.Event()
+        ticket = None
+        with self._cond:
+            if self.active < self.slots and not self._queues:
+                self.active += 1
+            else:
+                if self.waiting >= self.max_waiting:
+                    self._reject("Server is busy; please retry shortly")
+                # Slots are released from threads as well, so the wake-up is handed to the loop
+                ticket = _Ticket(user, wake=lambda: loop.call_soon_threadsafe(granted.set))
+                self._queues.setdefault(user, deque()).append(ticket)
+                self.waiting += 1
+        if ticket is not None:
+            try:
+                await asyncio.wait_for(granted.wait(), self.max_wait)
+            except BaseException as e:
+                # Timed out, or cancelled because the client went away
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                with self._cond:
+                    if not ticket.granted:
+                        self._queues[user].remove(ticket)
+                        if not self._queues[user]:
+                            del self._queues[user]
+                        self.waiting -= 1
+                        if timed_out:
+                            self._reject("Server is busy; please retry shortly")
+                        raise
+                # The slot was granted just as the wait ended: a timed-out request takes it, a cancelled one hands it on
+                if not timed_out:
+                    self._release(time.monotonic())
+                    raise
+        with self._cond:
+            self.admitted += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(start)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'slots': self.slots,
+                'active': self.active,
+                'waiting': self.waiting,
+                'waiting_users': len(self._queues),
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+            }
+
+
+class GroqLimiter:
+    """Keeps Groq calls within the account's requests- and tokens-per-minute limits and a concurrency cap.
+
+    The per-minute budgets are shared by all workers through `buckets`; `max_concurrency` applies per
+    process. A call that cannot start within `max_wait` seconds raises AdmissionError (503). Limits
+    of 0 are not enforced.
+    """
+
+    def __init__(self, buckets: BucketStore, max_concurrency: int, requests_per_minute: float,
+                 tokens_per_minute: float, max_wait: float):
+        self.buckets = buckets
+        self.max_concurrency = max(1, max_concurrency)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.calls = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+
+    def _budgets(self, tokens: int) -> List[Tuple[str, float, float, float]]:
+        budgets = []
+        if self.requests_per_minute > 0:
+            budgets.append(('groq:requests', self.requests_per_minute / 60, self.requests_per_minute, 1))
+        if self.tokens_per_minute > 0 and tokens > 0:
+            budgets.append(('groq:tokens', self.tokens_per_minute / 60, self.tokens_per_minute, tokens))
+        return budgets
+
+    @contextmanager
+    def call(self, tokens: int = 0):
+        """Hold a Groq call slot for the duration of the block; `tokens` is the call's estimated token use."""
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        if not self._semaphore.acquire(timeout=self.max_wait):
+            with self._lock:
+                self.throttled += 1
+            raise AdmissionError("Too many transcription and extraction calls in progress", 503, self.max_wait)
+        try:
+            budgets = self._budgets(tokens)
+            while budgets:
+                wait = self.buckets.take(budgets)
+                if not wait:
+                    break
+                if time.monotonic() + wait > deadline:
+                    with self._lock:
+                        self.throttled += 1
+                    raise AdmissionError("Groq rate limit reached", 503, wait)
+                time.sleep(wait)
+            with self._lock:
+                self.calls += 1
+                self.wait_seconds += time.monotonic() - start
+            yield
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def acall(self, tokens: int = 0):
+        """call() for coroutines: waits for a slot and for budget without blocking the event loop."""
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        # The slot semaphore is shared with threads, so it is polled rather than awaited
+        while not self._semaphore.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                with self._lock:
+                    self.throttled += 1
+                raise AdmissionError("Too many transcription and extraction calls in progress", 503, self.max_wait)
+            await asyncio.sleep(0.01)
+        try:
+            budgets = self._budgets(tokens)
+            while budgets:
+                wait = await asyncio.to_thread(self.buckets.take, budgets)
+                if not wait:
+                    break
+                if time.monotonic() + wait > deadline:
+                    with self._lock:
+                        self.throttled += 1
+                    raise AdmissionError("Groq rate limit reached", 503, wait)
+                await asyncio.sleep(wait)
+            with self._lock:
+                self.calls += 1
+                self.wait_seconds += time.monotonic() - start
+            yield
+        finally:
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'calls': self.calls,
+                'throttled': self.throttled,
+                'wait_seconds': round(self.wait_seconds, 3),
+            }
@@ -0,0 +1,299 @@
+"""ASGI app: `uvicorn asgi:app --workers 2`.
+
+The endpoints that mostly wait on Groq and the downstream backends, /transcribe,
+/extract-action-items and /accept-action-item, run natively on the event loop with the async Groq
+client and one shared httpx client, so a worker is not limited to one in-flight call per thread.
+Every other route, the sign-in flow included, is served by the Flask app in main.py through a WSGI
+bridge running on a thread pool. URLs, sessions and JSON responses are the same in both modes.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from werkzeug.utils import secure_filename
+
+import main
+from admission import AdmissionError
+from audio_pipeline import shutdown_audio_process_pool
+from cache import content_key
+from dispatch import CircuitOpen
+from extraction import extract_chunked_async
+from metrics import instrument_endpoint, stage
+from prompts import ActionItemsList
+
+logger = logging.getLogger(__name__)
+
+flask_app = main.app
+
+
+def user_session(request) -> dict:
+    """The Flask session carried by the request's cookie, read-only; empty when missing or invalid."""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not cookie:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        return dict(serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds())))
+    except BadSignature:
+        return {}
+
+
+def rate_limit_key(request, user_session: dict) -> str:
+    return user_session.get('user_email') or f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def is_json(request) -> bool:
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+
+def admission_error_response(e: AdmissionError, payload: dict) -> JSONResponse:
+    return JSONResponse(payload, e.status_code, headers=main.admission_error_headers(e))
+
+
+def transcription_error(error: str, status_code: int, headers=None) -> JSONResponse:
+    return JSONResponse(main.TranscriptionResponse(transcription="", error=error).model_dump(), status_code,
+                        headers=headers)
+
+
+def upload_too_large() -> JSONResponse:
+    max_mb = flask_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return transcription_error(f"File too large. Maximum upload size is {max_mb} MB.", 413)
+
+
+async def extract_chunk(transcript, prompt=None):
+    """main.extract_chunk() with the async instructor client."""
+    prompt = prompt or main.prompt_registry.choose(transcript)
+    actionable, hints = main.transcript_gate.check(transcript)
+    if not actionable:
+        return []
+    return await main.model_router.arun(transcript, lambda tier: extract_with_model(transcript, prompt, tier, hints))
+
+
+async def extract_with_model(transcript, prompt, tier, hints=None):
+    """main.extract_with_model() with the async instructor client."""
+    with stage('extraction'):
+        async with main.groq_limiter.acall(main.extraction_tokens(transcript, prompt)):
+            start = time.perf_counter()
+            try:
+                action_items, completion = await main.async_groq_client_with_instructor.get().chat.completions.create_with_completion(
+                    model=tier.model,
+                    response_model=ActionItemsList,
+                    messages=prompt.messages(transcript, hints),
+                    temperature=0.5,
+                    max_retries=tier.max_retries,
+                )
+            except Exception as e:
+                main.record_failed_extraction(prompt, tier, e, time.perf_counter() - start)
+                raise
+    return main.extraction_output(transcript, prompt, action_items, completion, time.perf_counter() - start,
+                                  tier.model)
+
+
+async def extract_items(transcript, user_email):
+    """main.extract_items() on the event loop; cache and store calls run in threads."""
+    result_cache = main.result_cache
+    cache_key = main.extraction_cache_key(transcript)
+    output_data = await asyncio.to_thread(result_cache.get, cache_key) if result_cache else None
+    if output_data is None:
+        if main.is_long_transcript(transcript):
+            output_data = await extract_chunked_async(
+                lambda chunk, prompt=main.prompt_registry.choose(transcript): extract_chunk(chunk, prompt),
+                transcript,
+                flask_app.config['EXTRACTION_CHUNK_TOKENS'],
+                flask_app.config['EXTRACTION_CHUNK_OVERLAP_TOKENS'],
+                flask_app.config['EXTRACTION_MAX_WORKERS'],
+            )
+        else:
+            output_data = await extract_chunk(transcript)
+        if result_cache:
+            await asyncio.to_thread(result_cache.set, cache_key, output_data)
+    else:
+        logger.info("Extraction cache hit")
+    await asyncio.to_thread(main.action_item_store.add_meeting, user_email, main.convert_action_items(output_data))
+    return output_data
+
+
+async def run_transcription(filename, audio_stream):
+    """main.run_transcription() with each backend's atranscribe()."""
+    backend = main.transcription_backend
+    fallback = main.fallback_transcription_backend
+    start_time = time.time()
+    with stage('transcription'):
+        try:
+            text, segments = await backend.atranscribe(filename, audio_stream)
+        except Exception as e:
+            if not fallback:
+                raise
+            logger.warning(f"{backend.name} transcription failed ({e}); falling back to {fallback.name}")
+            backend = fallback
+            text, segments = await backend.atranscribe(filename, audio_stream)
+    logger.info(f"{backend.name} transcription took {time.time() - start_time:.2f} seconds for file {filename}")
+    return text, segments, backend
+
+
+async def transcribe_stream(filename, audio_stream):
+    """main.transcribe_stream() on the event loop; hashing and cache calls run in threads."""
+    result_cache = main.result_cache
+    cache_key = await asyncio.to_thread(content_key, 'transcription', main.transcription_backend.cache_id, audio_stream)
+    cached = await asyncio.to_thread(result_cache.get, cache_key) if result_cache else None
+    if cached is not None:
+        logger.info(f"Transcription cache hit for file {filename}")
+        return cached['text'], cached['segments']
+    text, segments, backend = await run_transcription(filename, audio_stream)
+    if result_cache:
+        if backend is not main.transcription_backend:
+            cache_key = await asyncio.to_thread(content_key, 'transcription', backend.cache_id, audio_stream)
+        await asyncio.to_thread(result_cache.set, cache_key, {'text': text, 'segments': segments})
+    return text, segments
+
+
+async def send_accepted_item(backend_type, item, headers):
+    """main.send_accepted_item() without tying up a thread for the downstream call."""
+    if flask_app.config['ACCEPT_QUEUE_ENABLED']:
+        await asyncio.wrap_future(main.accept_coalescer.submit(backend_type, item, headers))
+        return
+    try:
+        response = await main.backend_dispatcher.apost(backend_type, [item], headers=headers)
+    except CircuitOpen as e:
+        logger.error(str(e))
+        raise main.AcceptError(f'{e}, please try again shortly', 503)
+    except httpx.TimeoutException:
+        logger.error(f"Backend request to {backend_type} timed out")
+        raise main.AcceptError(f'Timed out waiting for the {backend_type} backend', 504)
+    except httpx.HTTPError as e:
+        logger.error(f"Backend request to {backend_type} failed: {e}")
+        raise main.AcceptError(f'Failed to reach the {backend_type} backend: {e}', 502)
+    main.check_accept_response(response)
+
+
+@instrument_endpoint('/transcribe')
+async def transcribe_audio(request):
+    max_bytes = flask_app.config['MAX_CONTENT_LENGTH']
+    try:
+        session = user_session(request)
+        await asyncio.to_thread(main.user_rate_limiter.check, rate_limit_key(request, session))
+        if not main.transcription_backend:
+            return transcription_error("No transcription backend available; set GROQ_API or TRANSCRIBE_BACKEND=local", 500)
+        if int(request.headers.get('content-length') or 0) > max_bytes:
+            return upload_too_large()
+        with stage('upload'):
+            form = await request.form()
+        try:
+            file = form.get('file')
+            if file is None or isinstance(file, str):
+                return transcription_error("No file provided", 400)
+            if not (file.content_type or '').startswith('audio/'):
+                return transcription_error("Invalid file type. Please upload an audio file.", 400)
+            if file.size is not None and file.size > max_bytes:
+                return upload_too_large()
+            filename = secure_filename(file.filename or '') or 'recording.webm'
+            async with main.admission_queue.aslot(rate_limit_key(request, session)):
+                text, segments = await transcribe_stream(filename, file.file)
+        finally:
+            await form.close()
+        return JSONResponse(main.TranscriptionResponse(transcription=text, segments=segments).model_dump())
+    except AdmissionError as e:
+        return transcription_error(str(e), e.status_code, main.admission_error_headers(e))
+    except Exception as e:
+        return transcription_error(str(e), 500)
+
+
+@instrument_endpoint('/extract-action-items')
+async def extract_action_items(request):
+    try:
+        if not main.groq_client:
+            return JSONResponse({"error": "GROQ_API environment variable not set"}, 500)
+        if not is_json(request):
+            return JSONResponse({"error": "Request must contain JSON data"}, 400)
+        data = await request.json()
+        transcript = data.get("transcript")
+        if not transcript:
+            return JSONResponse({"error": "Transcript is required"}, 400)
+        session = user_session(request)
+        await asyncio.to_thread(main.user_rate_limiter.check, rate_limit_key(request, session))
+        async with main.admission_queue.aslot(rate_limit_key(request, session)):
+            output_data = await extract_items(transcript, session.get('user_email', 'anonymous'))
+        return JSONResponse({
+            "message": "Action items processed and converted successfully",
+            "items": output_data
+        }, 200)
+    except AdmissionError as e:
+        return admission_error_response(e, {"error": str(e), "retry_after": e.retry_after})
+    except Exception as e:
+        return JSONResponse({"error": f"Error processing transcript: {str(e)}"}, 500)
+
+
+@instrument_endpoint('/accept-action-item')
+async def accept_action_item(request):
+    try:
+        if not is_json(request):
+            logger.error("Request must contain JSON data")
+            return JSONResponse({'error': 'Request must contain JSON data'}, 400)
+        data = await request.json()
+        logger.debug(f"Received data: {data}")
+        file_type = data.get('file_type')
+        index = data.get('index')
+        item = data.get('item')
+        if not file_type or (index is None and not data.get('id')) or not isinstance(item, dict):
+            logger.error(f"Missing or invalid file_type: {file_type}, index: {index}, item: {item}")
+            return JSONResponse({'error': 'Missing or invalid file_type, index, or item'}, 400)
+        if not data.get('id') and main.item_index(index) is None:
+            return JSONResponse({'error': 'index must be an integer'}, 400)
+
+        # Resolve the stored item before the downstream call so a concurrent edit cannot shift the index
+        session = user_session(request)
+        user_email = session.get('user_email', 'anonymous')
+        item_id = await asyncio.to_thread(main.resolve_item_id, user_email, data)
+
+        # Loading (and possibly refreshing) Gmail credentials blocks, so the request is prepared in a thread
+        login_url = flask_app.url_map.bind('').build('login')
+        prepared = await asyncio.to_thread(main.accepted_item_request, file_type, item, session,
+                                           lambda: main.gmail_credentials_for(session), login_url)
+        await send_accepted_item(*prepared)
+        if item_id and not await asyncio.to_thread(main.action_item_store.delete_item, user_email, item_id):
+            logger.error(f"Failed to delete accepted item {item_id}")
+        return JSONResponse({'message': 'Item accepted and removed successfully'}, 200)
+    except main.AcceptError as e:
+        return JSONResponse({'error': str(e), **e.extra}, e.status_code)
+    except Exception as e:
+        logger.error(f"Error accepting action item: {str(e)}")
+        return JSONResponse({'error': f'Error accepting action item: {str(e)}'}, 500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # The Flask routes start the worker on their first request; the native ones do not go through Flask
+    await asyncio.to_thread(main.create_app)
+    try:
+        yield
+    finally:
+        await main.backend_dispatcher.aclose()
+        # uvicorn re-raises the stop signal once shut down, so the pool's atexit handler never runs
+        await asyncio.to_thread(shutdown_audio_process_pool)
+
+
+# The same CORS policy as flask_cors applies in main.py; preflight requests are answered by Flask
+cors = [Middleware(CORSMiddleware, allow_origins=main.CORS_ORIGINS, allow_methods=['GET', 'POST', 'OPTIONS'],
+                   allow_headers=['*'], allow_credentials=True)]
+
+app = Starlette(
+    routes=[
+        Route('/transcribe', transcribe_audio, methods=['POST'], middleware=cors),
+        Route('/extract-action-items', extract_action_items, methods=['POST'], middleware=cors),
+        Route('/accept-action-item', accept_action_item, methods=['POST'], middleware=cors),
+        # Other methods on the routes above, OPTIONS included, fall through to Flask and are answered as before
+        Mount('/', WSGIMiddleware(flask_app, workers=int(os.getenv('ASGI_WSGI_THREADS', 16)))),
+    ],
+    lifespan=lifespan,
+)
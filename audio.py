@@ -0,0 +1,218 @@
+import io
+import logging
+import operator
+import shutil
+import subprocess
+import tempfile
+import threading
+import wave
+from array import array
+from dataclasses import dataclass, field
+from typing import IO, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Whisper works on 16 kHz mono internally, so decoding to anything richer only costs memory
+TARGET_SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.02
+COPY_CHUNK_BYTES = 64 * 1024
+DEFAULT_SPOOL_BYTES = 1024 * 1024
+
+AudioSource = Union[bytes, IO[bytes]]
+
+
+@dataclass
+class PcmAudio:
+    file: IO[bytes]  # raw signed 16-bit little-endian mono samples
+    sample_rate: int
+    num_samples: int
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def duration(self) -> float:
+        return self.num_samples / self.sample_rate
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> array:
+        end = self.num_samples if end is None else min(end, self.num_samples)
+        samples = array('h')
+        if end > start:
+            # Windows are encoded from several pool threads at once
+            with self.lock:
+                self.file.seek(start * 2)
+                samples.frombytes(self.file.read((end - start) * 2))
+        return samples
+
+    def close(self):
+        self.file.close()
+
+
+def ffmpeg_binary() -> Optional[str]:
+    return shutil.which('ffmpeg')
+
+
+def _open_source(source: AudioSource) -> IO[bytes]:
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def _feed(source: IO[bytes], sink: IO[bytes]):
+    try:
+        shutil.copyfileobj(source, sink, COPY_CHUNK_BYTES)
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            sink.close()
+        except BrokenPipeError:
+            pass
+
+
+def decode_pcm(source: AudioSource, sample_rate: int = TARGET_SAMPLE_RATE,
+               spool_bytes: int = DEFAULT_SPOOL_BYTES) -> Optional[PcmAudio]:
+    """Decode an uploaded recording into 16-bit mono PCM.
+
+    The samples are written to a spooled buffer that moves to an anonymous temporary file past
+    `spool_bytes`, so long recordings are never held in memory whole. Plain mono 16-bit WAV is
+    read with the standard library; anything else (webm/ogg from MediaRecorder, mp3, ...) goes
+    through ffmpeg, as is WAV at another sample rate unless ffmpeg is missing. Returns None when the
+    audio cannot be decoded.
+    """
+    stream = _open_source(source)
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    binary = ffmpeg_binary()
+
+    if stream.read(4) == b'RIFF':
+        stream.seek(0)
+        try:
+            with wave.open(stream, 'rb') as wav:
+                if (wav.getnchannels() == 1 and wav.getsampwidth() == 2
+                        and (wav.getframerate() == sample_rate or not binary)):
+                    frames = COPY_CHUNK_BYTES // 2
+                    while True:
+                        block = wav.readframes(frames)
+                        if not block:
+                            break
+                        spool.write(block)
+                    return PcmAudio(file=spool, sample_rate=wav.getframerate(), num_samples=spool.tell() // 2)
+        except (wave.Error, EOFError) as e:
+            logger.debug(f"Falling back to ffmpeg for WAV input: {e}")
+        spool.seek(0)
+        spool.truncate()
+    stream.seek(0)
+
+    if not binary:
+        logger.warning("ffmpeg not found; cannot decode audio for chunked processing")
+        spool.close()
+        return None
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            [binary, '-nostdin', '-loglevel', 'error', '-i', 'pipe:0',
+             '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=errors,
+        )
+        feeder = threading.Thread(target=_feed, args=(stream, process.stdin), daemon=True)
+        feeder.start()
+        shutil.copyfileobj(process.stdout, spool, COPY_CHUNK_BYTES)
+        process.stdout.close()
+        returncode = process.wait()
+        feeder.join()
+        if returncode != 0:
+            errors.seek(0)
+            logger.error(f"ffmpeg failed to decode audio: {errors.read().decode(errors='ignore').strip()}")
+            spool.close()
+            return None
+    return PcmAudio(file=spool, sample_rate=sample_rate, num_samples=spool.tell() // 2)
+
+
+def encode_wav(pcm: PcmAudio, start: int = 0, end: Optional[int] = None) -> bytes:
+    """Encode samples[start:end] as an in-memory mono 16-bit WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(pcm.sample_rate)
+        wav.writeframes(pcm.read(start, end).tobytes())
+    return buffer.getvalue()
+
+
+# ffmpeg settings per codec: (file extension, encoder arguments)
+CODECS = {
+    'opus': ('ogg', ['-c:a', 'libopus', '-application', 'voip']),
+    'flac': ('flac', ['-c:a', 'flac']),
+}
+
+
+def encode_file(pcm: PcmAudio, start: int, end: int, path: str, codec: str = 'opus', bitrate: str = '24k') -> str:
+    """Encode samples[start:end] to `path` plus the codec's extension and return the full path.
+
+    Falls back to WAV when ffmpeg is missing, the codec is 'wav' or unknown, or encoding fails.
+    """
+    binary = ffmpeg_binary()
+    if binary and codec in CODECS:
+        extension, arguments = CODECS[codec]
+        output = f"{path}.{extension}"
+        bitrate_arguments = ['-b:a', bitrate] if codec == 'opus' else []
+        process = subprocess.run(
+            [binary, '-nostdin', '-loglevel', 'error', '-y',
+             '-f', 's16le', '-ac', '1', '-ar', str(pcm.sample_rate), '-i', 'pipe:0',
+             *arguments, *bitrate_arguments, output],
+            input=pcm.read(start, end).tobytes(),
+            stderr=subprocess.PIPE,
+        )
+        if process.returncode == 0:
+            return output
+        logger.error(f"ffmpeg failed to encode {codec}: {process.stderr.decode(errors='ignore').strip()}")
+    output = f"{path}.wav"
+    with open(output, 'wb') as f:
+        f.write(encode_wav(pcm, start, end))
+    return output
+
+
+def frame_energy(samples: array, start: int, end: int) -> float:
+    """Mean squared amplitude of samples[start:end]."""
+    if end <= start:
+        return 0.0
+    chunk = samples[start:end]
+    return sum(map(operator.mul, chunk, chunk)) / len(chunk)
+
+
+def quietest_point(pcm: PcmAudio, lo: int, hi: int) -> int:
+    """Return the sample offset of the lowest-energy frame in [lo, hi), falling back to hi."""
+    frame = max(1, int(pcm.sample_rate * FRAME_SECONDS))
+    samples = pcm.read(lo, hi)
+    best, best_energy = hi, None
+    for offset in range(0, len(samples) - frame + 1, frame):
+        energy = frame_energy(samples, offset, offset + frame)
+        if best_energy is None or energy < best_energy:
+            best, best_energy = lo + offset + frame // 2, energy
+    return best
+
+
+def plan_windows(pcm: PcmAudio, window_seconds: float, overlap_seconds: float,
+                 search_seconds: float = 10.0) -> List[Tuple[int, int]]:
+    """Split the recording into overlapping (start, end) sample windows.
+
+    Each window ends at the quietest frame within the last `search_seconds` before its nominal
+    length, so cuts tend to land between words; the next window starts `overlap_seconds` earlier.
+    """
+    total = pcm.num_samples
+    window = int(window_seconds * pcm.sample_rate)
+    overlap = min(int(overlap_seconds * pcm.sample_rate), window // 2)
+    search = int(min(search_seconds, window_seconds / 2) * pcm.sample_rate)
+    # Every cut must advance at least half a stride past the previous one, or a long pause
+    # near the overlap could be picked again and again
+    min_advance = max(1, (window - overlap) // 2)
+    windows = []
+    start, previous_cut = 0, 0
+    while True:
+        target = start + window
+        if target >= total:
+            windows.append((start, total))
+            return windows
+        cut = quietest_point(pcm, max(target - search, previous_cut + min_advance), target)
+        windows.append((start, cut))
+        start, previous_cut = cut - overlap, cut
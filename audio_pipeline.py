@@ -0,0 +1,191 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from audio import COPY_CHUNK_BYTES, DEFAULT_SPOOL_BYTES, AudioSource, decode_pcm, encode_file, plan_windows
+from metrics import AUDIO_BYTES, stage
+from vad import SpeechMap, VadSettings, strip_silence
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_audio_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process-wide pool for decoding and encoding, so CPU-bound audio work never holds a web worker's GIL."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Pool processes belong to the process that started them
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=max_workers)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def shutdown_audio_process_pool():
+    """Stop this process's pool now, for servers such as uvicorn that exit without running atexit handlers."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            return
+        pool, _pool = _pool, None
+    pool.shutdown(wait=True, cancel_futures=True)
+
+
+@dataclass
+class PreparedAudio:
+    """A recording decoded to 16 kHz mono, optionally stripped of silence, and re-encoded per window."""
+
+    folder: str
+    sample_rate: int
+    duration: float
+    windows: List[Tuple[int, int]]  # sample ranges on the (possibly stripped) timeline
+    paths: List[str]
+    speech_pieces: Optional[List[Tuple[float, float, float]]]
+    original_bytes: int
+    encoded_bytes: int
+    conversion_seconds: float
+    use_original: bool = False
+
+    @property
+    def speech_map(self) -> Optional[SpeechMap]:
+        return SpeechMap(self.speech_pieces, self.duration) if self.speech_pieces is not None else None
+
+    def close(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+def prepare_audio(source_path: str, folder: str, window_seconds: float, overlap_seconds: float,
+                  vad: Optional[VadSettings], codec: str, bitrate: str,
+                  spool_bytes: int) -> Optional[PreparedAudio]:
+    """Decode, strip silence, window and encode one recording; runs inside a pool process."""
+    start_time = time.time()
+    original_bytes = os.path.getsize(source_path)
+    with open(source_path, 'rb') as source:
+        pcm = decode_pcm(source, spool_bytes=spool_bytes)
+    if pcm is None:
+        return None
+    duration = pcm.duration
+    speech_map = None
+    if vad is not None:
+        stripped = strip_silence(pcm, vad, spool_bytes)
+        if stripped is not None:
+            pcm.close()
+            pcm, speech_map = stripped
+    try:
+        windows = [] if pcm.num_samples == 0 else plan_windows(pcm, window_seconds, overlap_seconds)
+        paths = [encode_file(pcm, start, end, os.path.join(folder, f"window_{i}"), codec, bitrate)
+                 for i, (start, end) in enumerate(windows)]
+        sample_rate = pcm.sample_rate
+    finally:
+        pcm.close()
+    encoded_bytes = sum(os.path.getsize(path) for path in paths)
+    # A recording that needed no cutting may already be in a tighter codec than ours
+    use_original = speech_map is None and len(windows) == 1 and encoded_bytes >= original_bytes
+    return PreparedAudio(
+        folder=folder,
+        sample_rate=sample_rate,
+        duration=duration,
+        windows=windows,
+        paths=paths,
+        speech_pieces=speech_map.pieces if speech_map is not None else None,
+        original_bytes=original_bytes,
+        encoded_bytes=original_bytes if use_original else encoded_bytes,
+        conversion_seconds=time.time() - start_time,
+        use_original=use_original,
+    )
+
+
+class AudioPipeline:
+    """Normalizes uploads before transcription: downmix to 16 kHz mono, drop silence, re-encode compactly.
+
+    The work runs in a pool of `max_workers` processes (inline when 0). Conversion time and the bytes
+    saved against the original upload are logged per recording and totalled in stats().
+    """
+
+    def __init__(self, window_seconds: float = 300, overlap_seconds: float = 5, vad: Optional[VadSettings] = None,
+                 codec: str = 'opus', bitrate: str = '24k', spool_bytes: int = DEFAULT_SPOOL_BYTES,
+                 max_workers: int = 2):
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.vad = vad
+        self.codec = codec
+        self.bitrate = bitrate
+        self.spool_bytes = spool_bytes
+        self.max_workers = max_workers
+        self.conversions = 0
+        self.conversion_seconds = 0.0
+        self.original_bytes = 0
+        self.encoded_bytes = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Fork the pool processes now. Started on first use, they would inherit every client connection the
+        worker holds at that moment and keep it open after the server closes it."""
+        if self.max_workers > 0:
+            get_audio_process_pool(self.max_workers).submit(int).result()
+
+    @property
+    def cache_id(self) -> str:
+        cache_id = f"{self.codec}:{self.bitrate}"
+        return f"{cache_id}:{self.vad.cache_id}" if self.vad else cache_id
+
+    def prepare(self, audio: AudioSource) -> Optional[PreparedAudio]:
+        """Returns None when the recording cannot be decoded locally."""
+        with stage('conversion'):
+            return self._prepare(audio)
+
+    def _prepare(self, audio: AudioSource) -> Optional[PreparedAudio]:
+        folder = tempfile.mkdtemp(prefix='audio-')
+        source_path = os.path.join(folder, 'source')
+        try:
+            # Pool processes cannot see in-memory spools, so hand them the upload on disk
+            with open(source_path, 'wb') as f:
+                if isinstance(audio, (bytes, bytearray)):
+                    f.write(audio)
+                else:
+                    audio.seek(0)
+                    shutil.copyfileobj(audio, f, COPY_CHUNK_BYTES)
+                    audio.seek(0)
+            args = (source_path, folder, self.window_seconds, self.overlap_seconds, self.vad,
+                    self.codec, self.bitrate, self.spool_bytes)
+            if self.max_workers > 0:
+                prepared = get_audio_process_pool(self.max_workers).submit(prepare_audio, *args).result()
+            else:
+                prepared = prepare_audio(*args)
+        except BaseException:
+            shutil.rmtree(folder, ignore_errors=True)
+            raise
+        if prepared is None:
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+        saved = prepared.original_bytes - prepared.encoded_bytes
+        logger.info(f"Prepared {prepared.duration:.1f}s of audio in {prepared.conversion_seconds:.2f}s: "
+                    f"{prepared.original_bytes} -> {prepared.encoded_bytes} bytes "
+                    f"({100 * saved / max(prepared.original_bytes, 1):.0f}% saved)")
+        AUDIO_BYTES.labels('original').inc(prepared.original_bytes)
+        AUDIO_BYTES.labels('encoded').inc(prepared.encoded_bytes)
+        with self._lock:
+            self.conversions += 1
+            self.conversion_seconds += prepared.conversion_seconds
+            self.original_bytes += prepared.original_bytes
+            self.encoded_bytes += prepared.encoded_bytes
+        return prepared
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'conversions': self.conversions,
+                'conversion_seconds': round(self.conversion_seconds, 3),
+                'original_bytes': self.original_bytes,
+                'encoded_bytes': self.encoded_bytes,
+                'bytes_saved': self.original_bytes - self.encoded_bytes,
+            }
@@ -0,0 +1,83 @@
+"""Measure the pre-LLM transcript gate (gating.py) on the labelled transcripts, without calling any model.
+
+    python benchmarks/gate.py
+    python benchmarks/gate.py --min-cues 1,2,3 --fixtures my-transcripts.jsonl
+
+A fixture with expected items is actionable. For every EXTRACTION_GATE_MIN_CUES value it reports
+the share of transcripts skipped, the recall of actionable transcripts (those still sent to the
+LLM; anything below 1.0 loses action items) and the precision of the skips (skipped transcripts
+that really had nothing to extract). It also reports how many expected email addresses the prompt
+hints carry. Raise the threshold only while recall stays at 1.0.
+"""
+import argparse
+import json
+import os
+import sys
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS)
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from gating import TranscriptGate, analyze  # noqa: E402
+from prompt_ab import DEFAULT_FIXTURES, load_fixtures  # noqa: E402
+
+
+def evaluate(fixtures, min_cues: int) -> dict:
+    gate = TranscriptGate(min_cues=min_cues)
+    skipped, lost, wrongly_kept = [], [], []
+    for fixture in fixtures:
+        actionable = gate.is_actionable(analyze(fixture['transcript']))
+        if not actionable:
+            skipped.append(fixture['id'])
+            if fixture['expected']:
+                lost.append(fixture['id'])
+        elif not fixture['expected']:
+            wrongly_kept.append(fixture['id'])
+    positives = sum(1 for fixture in fixtures if fixture['expected'])
+    return {
+        'skip_rate': round(len(skipped) / len(fixtures), 3),
+        'recall': round((positives - len(lost)) / positives, 3) if positives else None,
+        'skip_precision': round((len(skipped) - len(lost)) / len(skipped), 3) if skipped else None,
+        'lost': lost,
+        'not_skipped': wrongly_kept,
+    }
+
+
+def hint_coverage(fixtures) -> tuple:
+    """Expected keywords that are email addresses, and how many of them the hints include."""
+    wanted = found = 0
+    for fixture in fixtures:
+        hints = analyze(fixture['transcript']).hints().lower()
+        for expected in fixture['expected']:
+            for keyword in expected['keywords']:
+                if '@' in keyword:
+                    wanted += 1
+                    found += keyword.lower() in hints
+    return found, wanted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES, help='JSONL file of labelled transcripts')
+    parser.add_argument('--min-cues', default='1,2,3,4', help='comma-separated EXTRACTION_GATE_MIN_CUES values')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures)
+    results = {int(level): evaluate(fixtures, int(level)) for level in args.min_cues.split(',') if level}
+    empty = sum(1 for fixture in fixtures if not fixture['expected'])
+    print(f"{len(fixtures)} transcripts, {empty} with nothing to extract")
+    print(f"{'min cues':>8} {'skipped':>8} {'recall':>7} {'skip prec':>9}  lost / not skipped")
+    for level, result in results.items():
+        print(f"{level:>8} {result['skip_rate']:>8} {result['recall']!s:>7} {result['skip_precision']!s:>9}  "
+              f"{','.join(result['lost']) or '-'} / {','.join(result['not_skipped']) or '-'}")
+    found, wanted = hint_coverage(fixtures)
+    print(f"Email hints: {found} of {wanted} expected addresses")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'fixtures': len(fixtures), 'min_cues': results,
+                       'email_hints': {'found': found, 'expected': wanted}}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
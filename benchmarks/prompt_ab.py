@@ -0,0 +1,203 @@
+"""Compare extraction prompt versions offline on a fixed set of labelled transcripts.
+
+    python benchmarks/prompt_ab.py                          # every version against Groq (needs GROQ_API)
+    python benchmarks/prompt_ab.py --versions 1,2 --repeat 3
+    python benchmarks/prompt_ab.py --stub                   # against the local stubs, to check the harness
+    python benchmarks/prompt_ab.py --small-model llama-3.1-8b-instant   # with the app's model routing
+
+Each fixture line holds a transcript and the action items a careful reader would extract, as a type
+and a few keywords. A predicted item matches an expected one when the types agree and every keyword
+appears somewhere in its fields. For every prompt version it reports recall, precision, the prompt
+and completion tokens from the API's usage and the call latency, so a cheaper prompt can be checked
+for lost recall before it becomes the default (EXTRACTION_PROMPT_VERSION).
+
+With --small-model, extraction goes through the same ModelRouter as the app: short transcripts try
+the small model first and are escalated to --model when its output fails the checks in routing.py.
+Tokens and latency then cover every tier a transcript went through, and the escalation rate is
+reported, to weigh EXTRACTION_SMALL_MODEL against quality.
+
+With --gate, transcripts go through the app's TranscriptGate first: the ones it skips count as
+extracted with no items and no tokens, and the rest get its email and date hints in the prompt.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import instructor
+from groq import Groq
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS)
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from gating import TranscriptGate  # noqa: E402
+from prompts import PROMPTS, ActionItemsList  # noqa: E402
+from routing import ModelRouter  # noqa: E402
+from stubs import DEFAULT_BEHAVIOURS, serve  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(BENCHMARKS, 'fixtures', 'extraction.jsonl')
+DEFAULT_MODEL = 'llama-3.3-70b-versatile'
+
+
+def load_fixtures(path: str) -> List[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def matches(item: dict, expected: dict) -> bool:
+    if item.get('type') != expected['type']:
+        return False
+    text = ' '.join(str(value) for value in item.values() if value).lower()
+    return all(keyword.lower() in text for keyword in expected['keywords'])
+
+
+def score(items: List[dict], expected: List[dict]) -> int:
+    """Number of expected items found, each matched by a different predicted item."""
+    unused = list(items)
+    found = 0
+    for wanted in expected:
+        for item in unused:
+            if matches(item, wanted):
+                unused.remove(item)
+                found += 1
+                break
+    return found
+
+
+def evaluate(client, version: str, fixtures: List[dict], router: ModelRouter, temperature: float, repeat: int,
+             gate: Optional[TranscriptGate] = None) -> dict:
+    prompt = PROMPTS[version]
+    expected_total = predicted_total = found_total = failures = escalated = skipped = 0
+    prompt_tokens, completion_tokens, latencies = [], [], []
+    misses: Dict[str, int] = {}
+    for _ in range(repeat):
+        for fixture in fixtures:
+            calls = []  # (prompt tokens, completion tokens) of each tier tried
+            start = time.perf_counter()
+            actionable, hints = gate.check(fixture['transcript']) if gate else (True, None)
+
+            def extract(tier):
+                try:
+                    result, completion = client.chat.completions.create_with_completion(
+                        model=tier.model,
+                        response_model=ActionItemsList,
+                        messages=prompt.messages(fixture['transcript'], hints),
+                        temperature=temperature,
+                        max_retries=tier.max_retries,
+                    )
+                except Exception as e:
+                    usage = getattr(e, 'total_usage', None)
+                    calls.append((getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None)))
+                    raise
+                usage = completion.usage
+                calls.append((usage.prompt_tokens, usage.completion_tokens) if usage is not None else (None, None))
+                return result.model_dump()['items']
+
+            try:
+                items = router.run(fixture['transcript'], extract) if actionable else []
+            except Exception as e:
+                failures += 1
+                print(f"  v{version} {fixture['id']}: {e}", file=sys.stderr)
+                continue
+            latencies.append(time.perf_counter() - start)
+            escalated += len(calls) > 1
+            skipped += not actionable
+            if all(tokens is not None for call in calls for tokens in call):
+                prompt_tokens.append(sum(call[0] for call in calls))
+                completion_tokens.append(sum(call[1] for call in calls))
+            found = score(items, fixture['expected'])
+            expected_total += len(fixture['expected'])
+            predicted_total += len(items)
+            found_total += found
+            if found < len(fixture['expected']):
+                misses[fixture['id']] = misses.get(fixture['id'], 0) + len(fixture['expected']) - found
+
+    def mean(values):
+        return round(statistics.mean(values), 1) if values else None
+
+    return {
+        'description': prompt.description,
+        'calls': len(latencies),
+        'failures': failures,
+        'escalated': escalated,
+        'skipped': skipped,
+        'recall': round(found_total / expected_total, 3) if expected_total else None,
+        'precision': round(found_total / predicted_total, 3) if predicted_total else None,
+        'avg_prompt_tokens': mean(prompt_tokens),
+        'avg_completion_tokens': mean(completion_tokens),
+        'p50_seconds': round(statistics.median(latencies), 3) if latencies else None,
+        'avg_seconds': round(statistics.mean(latencies), 3) if latencies else None,
+        'missed': misses,
+    }
+
+
+def start_stubs() -> tuple:
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=serve, args=(DEFAULT_BEHAVIOURS, sender), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{receiver.recv()}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--versions', default=','.join(PROMPTS), help='comma-separated prompt versions')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES, help='JSONL file of labelled transcripts')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--small-model', help='route short transcripts to this model first, as the app does')
+    parser.add_argument('--small-max-tokens', type=int, default=1500,
+                        help='longest transcript, in estimated tokens, tried on --small-model')
+    parser.add_argument('--gate', action='store_true', help='skip and hint transcripts with the app\'s TranscriptGate')
+    parser.add_argument('--gate-min-cues', type=int, default=2, help='EXTRACTION_GATE_MIN_CUES for --gate')
+    parser.add_argument('--temperature', type=float, default=0.5, help='the app extracts at 0.5')
+    parser.add_argument('--repeat', type=int, default=1, help='passes over the fixtures per version')
+    parser.add_argument('--stub', action='store_true', help='call the local stubs instead of Groq')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    versions = [version for version in args.versions.split(',') if version]
+    unknown = [version for version in versions if version not in PROMPTS]
+    if unknown:
+        parser.error(f"unknown prompt versions: {', '.join(unknown)}")
+
+    stub_process = None
+    if args.stub:
+        stub_process, base_url = start_stubs()
+        groq_client = Groq(api_key='benchmark', base_url=base_url)
+    elif os.getenv('GROQ_API'):
+        groq_client = Groq(api_key=os.getenv('GROQ_API'))
+    else:
+        parser.error('set GROQ_API or pass --stub')
+    client = instructor.from_groq(groq_client, mode=instructor.Mode.JSON)
+
+    fixtures = load_fixtures(args.fixtures)
+    router = ModelRouter(args.model, small_model=args.small_model, small_max_tokens=args.small_max_tokens)
+    results = {}
+    try:
+        for version in versions:
+            gate = TranscriptGate(min_cues=args.gate_min_cues) if args.gate else None
+            results[version] = evaluate(client, version, fixtures, router, args.temperature, args.repeat, gate)
+    finally:
+        if stub_process is not None:
+            stub_process.terminate()
+
+    print(f"{len(fixtures)} transcripts x {args.repeat}, model {router.cache_id}")
+    print(f"{'version':<8} {'recall':>7} {'precision':>9} {'prompt tok':>10} {'compl tok':>9} {'p50 s':>7} "
+          f"{'failed':>6} {'escalated':>9} {'skipped':>7}")
+    for version, result in results.items():
+        print(f"{version:<8} {result['recall']!s:>7} {result['precision']!s:>9} {result['avg_prompt_tokens']!s:>10} "
+              f"{result['avg_completion_tokens']!s:>9} {result['p50_seconds']!s:>7} {result['failures']:>6} "
+              f"{result['escalated']:>9} {result['skipped']:>7}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'small_model': args.small_model,
+                       'gate_min_cues': args.gate_min_cues if args.gate else None, 'fixtures': len(fixtures),
+                       'repeat': args.repeat, 'routing': router.stats(), 'versions': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+"""Load-test the app against local stubs and compare the numbers with a stored baseline.
+
+    python benchmarks/run.py                                 # run every scenario, compare with baseline.json
+    python benchmarks/run.py --scenarios extract-long --concurrency 1,8 --latency chat=2
+    python benchmarks/run.py --server asgi                   # under uvicorn (asgi.py) instead of gunicorn
+    python benchmarks/run.py --save-baseline                 # accept the current numbers as the new baseline
+
+For every scenario and concurrency level it reports throughput, p50/p95/p99 latency, errors and the
+peak RSS of the server's process tree, and exits with status 1 if any of them regressed by more than
+--tolerance against the baseline.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stubs import DEFAULT_BEHAVIOURS, StubBehaviour, serve  # noqa: E402
+from workload import synthetic_audio, synthetic_transcript  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+@dataclass
+class Scenario:
+    method: str
+    path: str
+    build: Callable[[], dict]  # keyword arguments for requests, built once and reused for every call
+
+
+def audio_upload(seconds: float) -> Callable[[], dict]:
+    return lambda: {'files': {'file': ('meeting.wav', synthetic_audio(seconds), 'audio/wav')}}
+
+
+def transcript_body(tokens: int) -> Callable[[], dict]:
+    return lambda: {'json': {'transcript': synthetic_transcript(tokens)}}
+
+
+def accept_body() -> dict:
+    return {'json': {'file_type': 'notes', 'index': 0,
+                     'item': {'title': 'Offsite', 'description': 'Offsite moves to June', 'tag': 'meeting'}}}
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    'transcribe-30s': Scenario('POST', '/transcribe', audio_upload(30)),
+    'transcribe-10min': Scenario('POST', '/transcribe', audio_upload(600)),
+    'extract-short': Scenario('POST', '/extract-action-items', transcript_body(800)),
+    'extract-long': Scenario('POST', '/extract-action-items', transcript_body(20000)),
+    'transcribe-and-extract-2min': Scenario('POST', '/transcribe-and-extract', audio_upload(120)),
+    'accept-note': Scenario('POST', '/accept-action-item', accept_body),
+    'get-json-files': Scenario('GET', '/get-json-files', dict),
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))]
+
+
+def process_tree_rss(root_pid: int) -> Optional[int]:
+    """Resident memory in bytes of a process and all its descendants (Linux only)."""
+    parents = {}
+    rss = {}
+    try:
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+            try:
+                with open(f'/proc/{name}/status') as f:
+                    fields = dict(line.split(':', 1) for line in f if ':' in line)
+            except OSError:
+                continue
+            parents[int(name)] = int(fields.get('PPid', '0').strip())
+            rss[int(name)] = int(fields.get('VmRSS', '0 kB').split()[0]) * 1024
+    except OSError:
+        return None
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        children = [child for child, parent in parents.items() if parent == pid]
+        tree.update(children)
+        frontier.extend(children)
+    return sum(rss.get(pid, 0) for pid in tree)
+
+
+class RssSampler:
+    """Tracks the peak RSS of a process tree in a background thread."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        self.peak = max(self.peak, process_tree_rss(self.pid) or 0)
+
+    def reset(self):
+        self.peak = 0
+        self.sample()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def session_cookie(secret_key: str, user_email: str) -> str:
+    """A signed Flask session cookie for a signed-in user, so no OAuth round trip is needed."""
+    from flask import Flask
+    from flask.sessions import SecureCookieSessionInterface
+
+    app = Flask('benchmark')
+    app.secret_key = secret_key
+    serializer = SecureCookieSessionInterface().get_signing_serializer(app)
+    return serializer.dumps({'user_email': user_email, 'token': 'benchmark-token'})
+
+
+def run_level(base_url: str, scenario: Scenario, kwargs: dict, cookies: List[str], concurrency: int,
+              num_requests: int, timeout: float, sampler: RssSampler) -> dict:
+    local = threading.local()
+
+    def call(i: int):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            local.session.cookies.set('session', cookies[i % len(cookies)])
+        start = time.perf_counter()
+        try:
+            status = local.session.request(scenario.method, base_url + scenario.path, timeout=timeout, **kwargs).status_code
+        except requests.RequestException:
+            status = None
+        return time.perf_counter() - start, status
+
+    sampler.reset()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(call, range(num_requests)))
+    elapsed = time.perf_counter() - start
+    sampler.sample()
+    latencies = sorted(latency for latency, _ in results)
+    errors = sum(1 for _, status in results if status is None or status >= 400)
+    return {
+        'requests': num_requests,
+        'errors': errors,
+        'throughput_rps': round(num_requests / elapsed, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'peak_rss_mb': round(sampler.peak / 2 ** 20, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Regressions of more than `tolerance` (a fraction) against the baseline, as readable lines."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {previous[metric]} -> {current[metric]}")
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{key}: throughput_rps {previous['throughput_rps']} -> {current['throughput_rps']}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{key}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def parse_kind_values(values: List[str], option: str) -> Dict[str, float]:
+    parsed = {}
+    for value in values:
+        kind, _, number = value.partition('=')
+        if kind not in DEFAULT_BEHAVIOURS or not number:
+            raise SystemExit(f"{option} expects KIND=VALUE with KIND one of {', '.join(DEFAULT_BEHAVIOURS)}")
+        parsed[kind] = float(number)
+    return parsed
+
+
+def start_stubs(behaviours: Dict[str, StubBehaviour]):
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=serve, args=(behaviours, sender), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{receiver.recv()}"
+
+
+def app_env(args, stub_url: str, workdir: str, secret_key: str) -> dict:
+    env = {
+        **os.environ,
+        'GROQ_API': 'benchmark',
+        'GROQ_BASE_URL': stub_url,
+        'FLASK_SECRET_KEY': secret_key,
+        'TRANSCRIBE_BACKEND': 'groq',
+        'CACHE_ENABLED': 'true' if args.with_cache else 'false',
+        'CACHE_FOLDER': os.path.join(workdir, 'cache'),
+        'ACTION_ITEMS_DB': os.path.join(workdir, 'action_items.db'),
+        'JOBS_FOLDER': os.path.join(workdir, 'jobs'),
+        'LIVE_FOLDER': os.path.join(workdir, 'live'),
+        'RATE_LIMIT_DB': os.path.join(workdir, 'rate_limits.db'),
+        'CREDENTIALS_FOLDER': os.path.join(workdir, 'credentials'),
+        # Measure the server, not the per-user limit; set it explicitly to benchmark admission control
+        'RATE_LIMIT_PER_MINUTE': os.environ.get('RATE_LIMIT_PER_MINUTE', '0'),
+        'BACKEND_MAX_RETRIES': '0' if args.no_retries else os.environ.get('BACKEND_MAX_RETRIES', '3'),
+    }
+    for backend_type in ('email', 'web_search', 'note', 'to_do', 'calendar_event'):
+        env[f'BACKEND_URL_{backend_type.upper()}'] = f"{stub_url}/backend/{backend_type}"
+    return env
+
+
+def start_gunicorn(gunicorn_args: List[str], env: dict, port: int, workdir: str, name: str = 'gunicorn'):
+    """Start gunicorn from the repository root and wait until it answers; returns (process, base URL)."""
+    return start_server(['gunicorn', *gunicorn_args, '--bind', f"127.0.0.1:{port}"], env, port, workdir, name)
+
+
+def start_uvicorn(uvicorn_args: List[str], env: dict, port: int, workdir: str, name: str = 'uvicorn'):
+    """Start uvicorn with the ASGI app from the repository root and wait until it answers."""
+    return start_server(['uvicorn', 'asgi:app', *uvicorn_args, '--host', '127.0.0.1', '--port', str(port)],
+                        env, port, workdir, name)
+
+
+def start_server(module_args: List[str], env: dict, port: int, workdir: str, name: str):
+    log = open(os.path.join(workdir, f'{name}.log'), 'wb')
+    process = subprocess.Popen(
+        [sys.executable, '-m', *module_args],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{name} exited early; see {log.name}")
+        try:
+            requests.get(f"{base_url}/cache-stats", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.05)
+    process.terminate()
+    raise SystemExit(f"{name} did not come up within 60s; see {log.name}")
+
+
+def start_app(args, stub_url: str, workdir: str, secret_key: str, server: str = 'wsgi', env: Optional[dict] = None):
+    env = env or app_env(args, stub_url, workdir, secret_key)
+    if server == 'asgi':
+        return start_uvicorn(['--workers', str(args.workers), '--no-access-log'], env, args.port, workdir)
+    # gunicorn.conf.py supplies the app and its preload and post_fork settings, as in production
+    return start_gunicorn(
+        ['-c', 'gunicorn.conf.py', '--workers', str(args.workers), '--threads', str(args.threads),
+         '--timeout', '600'],
+        env, args.port, workdir,
+    )
+
+
+def result_key(server: str, name: str, concurrency: int) -> str:
+    # Keys of the default server carry no prefix, so baselines recorded before --server still apply
+    return f"{name}@{concurrency}" if server == 'wsgi' else f"{server}:{name}@{concurrency}"
+
+
+def parse_behaviours(args) -> Dict[str, StubBehaviour]:
+    behaviours = {kind: StubBehaviour(b.latency, b.jitter, b.failure_rate) for kind, b in DEFAULT_BEHAVIOURS.items()}
+    for kind, value in parse_kind_values(args.latency, '--latency').items():
+        behaviours[kind].latency = value
+    for kind, value in parse_kind_values(args.jitter, '--jitter').items():
+        behaviours[kind].jitter = value
+    for kind, value in parse_kind_values(args.failure_rate, '--failure-rate').items():
+        behaviours[kind].failure_rate = value
+    return behaviours
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma-separated scenario names')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma-separated client concurrency levels')
+    parser.add_argument('--requests', type=int, default=24, help='requests per scenario and concurrency level')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests before each scenario')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='gunicorn with main.py, or uvicorn with asgi.py')
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--timeout', type=float, default=600, help='client timeout per request in seconds')
+    parser.add_argument('--latency', action='append', default=[], metavar='KIND=SECONDS',
+                        help='stub latency for transcription, chat or backend calls')
+    parser.add_argument('--jitter', action='append', default=[], metavar='KIND=SECONDS')
+    parser.add_argument('--failure-rate', action='append', default=[], metavar='KIND=FRACTION',
+                        help='fraction of stub calls answered with 503')
+    parser.add_argument('--with-cache', action='store_true', help='leave the result cache on (repeated payloads then hit it)')
+    parser.add_argument('--no-retries', action='store_true', help='disable downstream backend retries')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression as a fraction')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+
+    behaviours = parse_behaviours(args)
+
+    secret_key = uuid.uuid4().hex
+    cookies = [session_cookie(secret_key, f"bench-{i}@example.com") for i in range(max(levels))]
+    workdir = tempfile.mkdtemp(prefix='benchmark-')
+    stubs, stub_url = start_stubs(behaviours)
+    app, base_url = start_app(args, stub_url, workdir, secret_key, args.server)
+    results = {}
+    try:
+        with RssSampler(app.pid) as sampler:
+            print(f"{'scenario':<30}{'conc':>5}{'reqs':>6}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}"
+                  f"{'p99 ms':>10}{'rss MB':>9}")
+            for name in names:
+                scenario = SCENARIOS[name]
+                kwargs = scenario.build()
+                run_level(base_url, scenario, kwargs, cookies, 1, args.warmup, args.timeout, sampler)
+                for concurrency in levels:
+                    result = run_level(base_url, scenario, kwargs, cookies, concurrency, args.requests,
+                                       args.timeout, sampler)
+                    results[result_key(args.server, name, concurrency)] = result
+                    print(f"{name:<30}{concurrency:>5}{result['requests']:>6}{result['errors']:>5}"
+                          f"{result['throughput_rps']:>9}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                          f"{result['p99_ms']:>10}{result['peak_rss_mb']:>9}")
+        print(f"Stub calls: {requests.get(f'{stub_url}/stats', timeout=5).json()}")
+    finally:
+        app.terminate()
+        app.wait()
+        stubs.terminate()
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'server': args.server,
+            'workers': args.workers,
+            'threads': args.threads,
+            'stubs': {kind: vars(b) for kind, b in behaviours.items()},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        baseline = {'meta': report['meta'], 'results': {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline['meta'] = report['meta']
+        baseline['results'].update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; run with --save-baseline to store one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('cpus') != report['meta']['cpus']:
+        print("Warning: the baseline was recorded on a machine with a different CPU count")
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%} of the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
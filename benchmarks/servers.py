@@ -0,0 +1,100 @@
+"""Run the same I/O-bound load against the gunicorn (WSGI) and uvicorn (ASGI) servers and compare them.
+
+    python benchmarks/servers.py
+    python benchmarks/servers.py --scenarios extract-short --concurrency 16,64 --latency chat=2
+
+Both servers get the same worker count and the same stub latencies, which stand in for Groq and the
+downstream backends. A gunicorn worker handles at most --threads requests at once, while the ASGI
+endpoints keep every call in flight on the event loop. Admission slots and the Groq concurrency cap
+are raised for both, so the servers rather than those limits decide how many calls overlap.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import uuid
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run import (SCENARIOS, RssSampler, app_env, parse_behaviours, run_level, session_cookie,  # noqa: E402
+                 start_app, start_stubs)
+
+SERVERS = ('wsgi', 'asgi')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # Transcription scenarios are left out by default: converting the audio is CPU-bound in either server
+    parser.add_argument('--scenarios', default='extract-short,accept-note',
+                        help='comma-separated scenario names from run.py')
+    parser.add_argument('--concurrency', default='8,32,64', help='comma-separated client concurrency levels')
+    parser.add_argument('--requests', type=int, default=128, help='requests per scenario and concurrency level')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests before each scenario')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for either server')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--timeout', type=float, default=600, help='client timeout per request in seconds')
+    parser.add_argument('--latency', action='append', default=['transcription=1', 'chat=1', 'backend=0.5'],
+                        metavar='KIND=SECONDS', help='stub latency for transcription, chat or backend calls; '
+                                                      'given values override the defaults')
+    parser.add_argument('--jitter', action='append', default=[], metavar='KIND=SECONDS')
+    parser.add_argument('--failure-rate', action='append', default=[], metavar='KIND=FRACTION')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+    args.with_cache = False
+    args.no_retries = False
+
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+    behaviours = parse_behaviours(args)
+
+    secret_key = uuid.uuid4().hex
+    cookies = [session_cookie(secret_key, f"bench-{i}@example.com") for i in range(max(levels))]
+    stubs, stub_url = start_stubs(behaviours)
+    results = {server: {} for server in SERVERS}
+    try:
+        for server in SERVERS:
+            workdir = tempfile.mkdtemp(prefix=f'servers-{server}-')
+            env = app_env(args, stub_url, workdir, secret_key)
+            limit = str(max(levels) * 2)
+            env.update({'ADMISSION_SLOTS': limit, 'ADMISSION_MAX_QUEUE': limit, 'GROQ_MAX_CONCURRENCY': limit,
+                        'BACKEND_MAX_WORKERS': limit, 'LOG_FORMAT': 'text'})
+            app, base_url = start_app(args, stub_url, workdir, secret_key, server, env)
+            try:
+                with RssSampler(app.pid) as sampler:
+                    for name in names:
+                        scenario = SCENARIOS[name]
+                        kwargs = scenario.build()
+                        run_level(base_url, scenario, kwargs, cookies, 1, args.warmup, args.timeout, sampler)
+                        for concurrency in levels:
+                            results[server][f"{name}@{concurrency}"] = run_level(
+                                base_url, scenario, kwargs, cookies, concurrency, args.requests, args.timeout, sampler)
+            finally:
+                app.terminate()
+                app.wait()
+        print(f"Stub calls: {requests.get(f'{stub_url}/stats', timeout=5).json()}")
+    finally:
+        stubs.terminate()
+
+    print(f"{'scenario':<24}{'conc':>5}{'':>4}{'wsgi rps':>10}{'asgi rps':>10}{'wsgi p95':>10}{'asgi p95':>10}"
+          f"{'wsgi err':>9}{'asgi err':>9}{'wsgi MB':>9}{'asgi MB':>9}")
+    for key in results['wsgi']:
+        wsgi, asgi = results['wsgi'][key], results['asgi'][key]
+        name, concurrency = key.split('@')
+        print(f"{name:<24}{concurrency:>5}{'':>4}{wsgi['throughput_rps']:>10}{asgi['throughput_rps']:>10}"
+              f"{wsgi['p95_ms']:>10}{asgi['p95_ms']:>10}{wsgi['errors']:>9}{asgi['errors']:>9}"
+              f"{wsgi['peak_rss_mb']:>9}{asgi['peak_rss_mb']:>9}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'workers': args.workers, 'threads': args.threads,
+                       'stubs': {kind: vars(b) for kind, b in behaviours.items()}, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Measure how quickly the app starts and how much memory its gunicorn workers use.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --workers 4 --modes preload --output startup.json
+
+It reports the time to `import main` in a fresh interpreter, then starts gunicorn in each mode:
+
+    lazy     `main:create_app()` without --preload; every worker imports the app itself and loads the
+             Groq and Google client libraries on first use
+    preload  gunicorn.conf.py; the master loads everything once and the workers fork from it
+
+For each mode it prints the time until the server answers, the latency of the first and later
+extraction requests (the first one pays for anything left lazy), and the RSS and PSS of the master
+and each worker. PSS divides shared pages between the processes sharing them, so it shows how much
+of a worker is really its own.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from run import REPO_ROOT, app_env, session_cookie, start_gunicorn, start_stubs  # noqa: E402
+from stubs import DEFAULT_BEHAVIOURS  # noqa: E402
+from workload import synthetic_transcript  # noqa: E402
+
+MODES = ('lazy', 'preload')
+
+
+def import_seconds(env: dict, runs: int) -> List[float]:
+    """Wall time of `import main` in a fresh interpreter, `runs` times."""
+    code = 'import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)'
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env=env, check=True,
+                                capture_output=True, text=True).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    """RSS and PSS of one process in kB (Linux only)."""
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Pss'):
+                    usage[name.lower()] = int(value.split()[0])
+    except OSError:
+        pass
+    return usage
+
+
+def children(pid: int) -> List[int]:
+    found = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # The command name may contain spaces, so split after its closing parenthesis
+                if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                    found.append(int(name))
+        except (OSError, IndexError, ValueError):
+            continue
+    return sorted(found)
+
+
+def wait_for_workers(pid: int, workers: int, timeout: float = 60) -> List[int]:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        found = children(pid)
+        if len(found) >= workers:
+            return found
+        time.sleep(0.05)
+    raise SystemExit(f"gunicorn started {len(children(pid))} of {workers} workers")
+
+
+def run_mode(mode: str, args, env: dict, workdir: str, cookie: str) -> dict:
+    if mode == 'preload':
+        gunicorn_args = ['-c', 'gunicorn.conf.py']
+    else:
+        # An empty config file, so ./gunicorn.conf.py and its preload setting are not picked up
+        empty_config = os.path.join(workdir, 'empty.conf.py')
+        open(empty_config, 'w').close()
+        gunicorn_args = ['-c', empty_config, 'main:create_app()']
+    gunicorn_args += ['--workers', str(args.workers), '--threads', str(args.threads), '--timeout', '600']
+
+    start = time.perf_counter()
+    process, base_url = start_gunicorn(gunicorn_args, env, args.port, workdir, name=f'gunicorn-{mode}')
+    ready_seconds = time.perf_counter() - start
+    try:
+        workers = wait_for_workers(process.pid, args.workers)
+        session = requests.Session()
+        session.cookies.set('session', cookie)
+        body = {'transcript': synthetic_transcript(400)}
+        latencies = []
+        for _ in range(args.requests):
+            request_start = time.perf_counter()
+            response = session.post(f"{base_url}/extract-action-items", json=body, timeout=120)
+            latencies.append(time.perf_counter() - request_start)
+            if response.status_code != 200:
+                raise SystemExit(f"{mode}: extraction failed with {response.status_code}: {response.text[:200]}")
+        return {
+            'ready_seconds': round(ready_seconds, 3),
+            'first_request_ms': round(latencies[0] * 1000, 1),
+            'later_request_ms': round(statistics.median(latencies[1:]) * 1000, 1) if len(latencies) > 1 else None,
+            'master': memory_kb(process.pid),
+            'workers': [memory_kb(pid) for pid in workers],
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated gunicorn modes')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--import-runs', type=int, default=5, help='fresh interpreters timed importing main')
+    parser.add_argument('--requests', type=int, default=5, help='extraction requests per mode, one at a time')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise SystemExit(f"Unknown modes: {', '.join(unknown)}; choose from {', '.join(MODES)}")
+
+    secret_key = uuid.uuid4().hex
+    workdir = tempfile.mkdtemp(prefix='startup-')
+    stubs, stub_url = start_stubs(DEFAULT_BEHAVIOURS)
+    env = app_env(argparse.Namespace(with_cache=False, no_retries=False), stub_url, workdir, secret_key)
+    env['LOG_FORMAT'] = 'text'
+    report = {'workers': args.workers, 'threads': args.threads}
+    try:
+        timings = import_seconds(env, args.import_runs)
+        report['import_ms'] = {'median': round(statistics.median(timings) * 1000, 1),
+                               'max': round(max(timings) * 1000, 1)}
+        print(f"import main: median {report['import_ms']['median']} ms, max {report['import_ms']['max']} ms "
+              f"over {args.import_runs} runs")
+        cookie = session_cookie(secret_key, 'startup@example.com')
+        for mode in modes:
+            result = report[mode] = run_mode(mode, args, env, workdir, cookie)
+            print(f"{mode}: ready in {result['ready_seconds']} s, first request {result['first_request_ms']} ms, "
+                  f"later requests {result['later_request_ms']} ms")
+            print(f"  master  rss {result['master'].get('rss', 0) / 1024:7.1f} MB  "
+                  f"pss {result['master'].get('pss', 0) / 1024:7.1f} MB")
+            for i, usage in enumerate(result['workers']):
+                print(f"  worker {i} rss {usage.get('rss', 0) / 1024:7.1f} MB  pss {usage.get('pss', 0) / 1024:7.1f} MB")
+    finally:
+        stubs.terminate()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
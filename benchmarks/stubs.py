@@ -0,0 +1,165 @@
+"""Local stand-ins for the Groq API and the note, to-do and email backends.
+
+Each kind of endpoint answers after an injected latency and fails a configurable fraction of calls
+with 503, so the app's retries, fallbacks and error paths are exercised as well as its happy path.
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+
+# Bytes of re-encoded upload per second of audio: 24 kbit/s Opus, the app's default codec
+UPLOAD_BYTES_PER_SECOND = 3000
+SEGMENT_SECONDS = 5
+CHARS_PER_TOKEN = 4
+
+SPOKEN_WORDS = ("we", "should", "follow", "up", "on", "the", "budget", "review", "and", "send", "notes",
+                "to", "the", "team", "before", "friday", "so", "everyone", "knows", "next", "steps")
+
+
+@dataclass
+class StubBehaviour:
+    latency: float = 0.0  # seconds before answering
+    jitter: float = 0.0  # +/- uniform spread around latency
+    failure_rate: float = 0.0  # fraction of calls answered with 503
+
+    def delay(self, extra: float = 0.0):
+        time.sleep(max(0.0, self.latency + extra + random.uniform(-self.jitter, self.jitter)))
+
+    def fails(self) -> bool:
+        return random.random() < self.failure_rate
+
+
+# Kinds: 'transcription', 'chat' and 'backend'
+DEFAULT_BEHAVIOURS = {
+    'transcription': StubBehaviour(latency=0.3, jitter=0.1),
+    'chat': StubBehaviour(latency=0.8, jitter=0.2),
+    'backend': StubBehaviour(latency=0.1, jitter=0.05),
+}
+
+
+def fake_segments(audio_bytes: int) -> list:
+    """verbose_json segments for an upload, one per SEGMENT_SECONDS of the audio it probably holds."""
+    duration = max(1.0, audio_bytes / UPLOAD_BYTES_PER_SECOND)
+    segments = []
+    for i, start in enumerate(range(0, int(duration), SEGMENT_SECONDS)):
+        words = [SPOKEN_WORDS[(i + j) % len(SPOKEN_WORDS)] for j in range(12)]
+        segments.append({
+            'id': i, 'seek': 0, 'start': float(start), 'end': float(min(start + SEGMENT_SECONDS, duration)),
+            'text': ' ' + ' '.join(words) + '.', 'tokens': [], 'temperature': 0.0,
+            'avg_logprob': -0.2, 'compression_ratio': 1.2, 'no_speech_prob': 0.01,
+        })
+    return segments
+
+
+def fake_action_items(transcript: str) -> list:
+    """Roughly one action item per sentence that asks for something, like a real extraction would."""
+    items = []
+    for sentence in re.split(r'(?<=[.!?])\s+', transcript):
+        lowered = sentence.lower()
+        if 'email' in lowered or 'send' in lowered:
+            items.append({'type': 'email', 'content': sentence, 'recipient': 'team@example.com',
+                          'subject': 'Follow-up', 'body': sentence})
+        elif 'remind' in lowered or 'todo' in lowered or 'follow up' in lowered:
+            items.append({'type': 'to_do', 'content': sentence, 'title': sentence[:40]})
+        elif 'note' in lowered:
+            items.append({'type': 'note', 'content': sentence, 'title': sentence[:40], 'tag': 'meeting'})
+        elif 'look up' in lowered or 'search' in lowered:
+            items.append({'type': 'web_search', 'content': sentence})
+    return items[:20]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    behaviours: Dict[str, StubBehaviour] = DEFAULT_BEHAVIOURS
+    counts: Dict[str, int] = {}
+    counts_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, kind: str):
+        with self.counts_lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            with self.counts_lock:
+                return self._send(200, dict(self.counts))
+        self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path.endswith('/audio/transcriptions'):
+            kind = 'transcription'
+        elif self.path.endswith('/chat/completions'):
+            kind = 'chat'
+        elif self.path.startswith('/backend/'):
+            kind = 'backend'
+        else:
+            return self._send(404, {'error': 'not found'})
+        self._count(kind)
+        behaviour = self.behaviours[kind]
+        if behaviour.fails():
+            behaviour.delay()
+            self._count(f'{kind}_failed')
+            return self._send(503, {'error': {'message': 'injected failure', 'type': 'service_unavailable'}})
+
+        if kind == 'transcription':
+            behaviour.delay()
+            segments = fake_segments(len(body))
+            return self._send(200, {'text': ''.join(s['text'] for s in segments).strip(), 'segments': segments,
+                                    'language': 'english', 'duration': segments[-1]['end'],
+                                    'x_groq': {'id': uuid.uuid4().hex}})
+        if kind == 'chat':
+            request = json.loads(body or b'{}')
+            # Prompt hints follow the transcript after a blank line and are not part of it
+            transcript = request.get('messages', [{}])[-1].get('content', '').split('\n\n')[0]
+            content = json.dumps({'items': fake_action_items(transcript)})
+            prompt_tokens = sum(len(m.get('content') or '') for m in request.get('messages', [])) // CHARS_PER_TOKEN
+            completion_tokens = len(content) // CHARS_PER_TOKEN
+            # Generation time grows with the answer, as it does on the real API
+            behaviour.delay(extra=completion_tokens / 2000)
+            return self._send(200, {
+                'id': f'chatcmpl-{uuid.uuid4().hex}', 'object': 'chat.completion', 'created': int(time.time()),
+                'model': request.get('model', 'stub'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+        behaviour.delay()
+        return self._send(200, {'success': True})
+
+
+def serve(behaviours: Dict[str, StubBehaviour], port_pipe=None, host: str = '127.0.0.1', port: int = 0):
+    """Run the stubs until killed; the bound port is sent down `port_pipe` when given."""
+    StubHandler.behaviours = behaviours
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    if port_pipe is not None:
+        port_pipe.send(server.server_address[1])
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=9100)
+    args = parser.parse_args()
+    print(f"Stubs listening on http://127.0.0.1:{args.port}")
+    serve(DEFAULT_BEHAVIOURS, port=args.port)
@@ -0,0 +1,55 @@
+"""Synthetic recordings and transcripts of a chosen size, reproducible from a seed."""
+import io
+import math
+import random
+import wave
+from array import array
+
+SAMPLE_RATE = 16000
+
+SENTENCES = (
+    "Thanks everyone for joining, let's go through the agenda.",
+    "The launch slipped a week because the payment provider changed its API.",
+    "Priya, please send an email to the vendor asking for the revised quote.",
+    "I think the dashboard numbers look fine for this quarter.",
+    "Remind me to follow up with legal about the data retention policy.",
+    "Can someone take a note that the offsite moves to the second week of June.",
+    "We should look up how other teams handle on-call rotations.",
+    "Marketing wants the new pricing page live before the conference.",
+    "Let's add a todo to clean up the old feature flags.",
+    "Nothing else from me, the migration is on track.",
+)
+
+
+def synthetic_audio(seconds: float, seed: int = 0) -> bytes:
+    """Mono 16 kHz WAV of speech-like bursts of tones separated by short and long pauses."""
+    rng = random.Random(seed)
+    samples = array('h')
+    total = int(seconds * SAMPLE_RATE)
+    while len(samples) < total:
+        burst = int(rng.uniform(0.8, 4.0) * SAMPLE_RATE)
+        pitch = rng.uniform(110, 260)
+        for i in range(min(burst, total - len(samples))):
+            envelope = 0.6 + 0.4 * math.sin(2 * math.pi * 4 * i / SAMPLE_RATE)
+            samples.append(int(6000 * envelope * math.sin(2 * math.pi * pitch * i / SAMPLE_RATE)
+                               + rng.gauss(0, 150)))
+        pause = int(rng.choice((0.2, 0.4, 1.5)) * SAMPLE_RATE)
+        samples.extend(int(rng.gauss(0, 60)) for _ in range(min(pause, total - len(samples))))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def synthetic_transcript(tokens: int, seed: int = 0) -> str:
+    """Meeting-like text of about `tokens` tokens (4 characters each), with an action item every few sentences."""
+    rng = random.Random(seed)
+    sentences, length = [], 0
+    while length < tokens * 4:
+        sentence = rng.choice(SENTENCES)
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
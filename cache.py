@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import IO, Any, Optional, Union
+
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 64 * 1024
+
+
+def content_key(*parts: Union[str, bytes, IO[bytes]]) -> str:
+    """SHA-256 over the given parts; binary streams are hashed in chunks and rewound."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        if isinstance(part, (bytes, bytearray)):
+            digest.update(part)
+        else:
+            part.seek(0)
+            for block in iter(lambda: part.read(HASH_CHUNK_BYTES), b''):
+                digest.update(block)
+            part.seek(0)
+        # Separator so ("ab", "c") and ("a", "bc") hash differently
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """JSON values on disk keyed by content hash, with a TTL and size-bounded LRU eviction.
+
+    Each entry stores the time it was written, which the TTL counts from. Recency is tracked through
+    file mtimes, bumped on every hit, so every gunicorn worker shares the same LRU order.
+    """
+
+    def __init__(self, folder: str, max_bytes: int = 512 * 1024 * 1024, ttl_seconds: int = 7 * 24 * 3600):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._size = self._scan_size()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.folder, key[:2], f"{key}.json")
+
+    def _entries(self):
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Entries written before created_at was stored are treated as expired
+            if not isinstance(entry, dict) or time.time() - entry.get('created_at', 0) > self.ttl_seconds:
+                self._remove(path)
+                raise FileNotFoundError(path)
+            value = entry['value']
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            CACHE_LOOKUPS.labels('miss').inc()
+            return None
+        with self._lock:
+            self.hits += 1
+        CACHE_LOOKUPS.labels('hit').inc()
+        return value
+
+    def set(self, key: str, value: Any):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'created_at': time.time(), 'value': value}, f)
+            size = os.path.getsize(tmp_path)
+            try:
+                # An overwritten entry only grows the store by the difference
+                size -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Failed to write cache entry {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._size += size
+            over_limit = self._size > self.max_bytes
+        if over_limit:
+            self._evict()
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def _evict(self):
+        """Drop least recently used entries until the store fits in max_bytes, and any not used within the TTL.
+
+        An entry last used more than ttl_seconds ago was also created before then, so it has expired.
+        """
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for path, size, mtime in entries:
+            if total <= target and now - mtime <= self.ttl_seconds:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._size = total
+            self.evictions += evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size_bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
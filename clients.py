@@ -0,0 +1,114 @@
+import importlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Imported on first use rather than with main: together they take seconds to load. A gunicorn
+# master started with --preload imports them once so every worker shares them copy-on-write.
+HEAVY_MODULES = (
+    'groq',
+    'instructor',
+    'google_auth_oauthlib.flow',
+    'google.oauth2.credentials',
+    'google.auth.transport.requests',
+    'jwt',
+)
+
+
+class ProcessLocal(Generic[T]):
+    """A value built by `factory` on first use in each process.
+
+    HTTP clients hold connection pools and sometimes threads that must not be shared across a fork,
+    so a worker forked from a preloaded master builds its own instead of inheriting the master's.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str = ''):
+        self.factory = factory
+        self.name = name
+        self._value: Optional[T] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    start_time = time.time()
+                    self._value = self.factory()
+                    self._pid = os.getpid()
+                    logger.debug(f"Built {self.name or 'client'} in {time.time() - start_time:.3f} seconds")
+        return self._value
+
+    @property
+    def built(self) -> bool:
+        return self._pid == os.getpid()
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._pid = None
+
+
+class SqliteConnections:
+    """One connection to the SQLite database at `path` per thread, in WAL mode.
+
+    Like ProcessLocal, a connection is never used across a fork: a forked worker opens its own.
+    `autocommit` leaves transactions to the caller (BEGIN ... COMMIT); otherwise sqlite3 opens them.
+    """
+
+    def __init__(self, path: str, autocommit: bool = False, row_factory=None, foreign_keys: bool = False):
+        self.path = path
+        self.autocommit = autocommit
+        self.row_factory = row_factory
+        self.foreign_keys = foreign_keys
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None if self.autocommit else '')
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            if self.foreign_keys:
+                conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+def build_groq_client(api_key: str):
+    from groq import Groq
+    return Groq(api_key=api_key)
+
+
+def build_async_groq_client(api_key: str):
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=api_key)
+
+
+def build_instructor_client(client):
+    """`client` (sync or async) wrapped by instructor for structured output in JSON mode."""
+    import instructor
+    return instructor.from_groq(client, mode=instructor.Mode.JSON)
+
+
+def import_heavy_modules() -> float:
+    """Load HEAVY_MODULES now; returns the seconds it took."""
+    start_time = time.time()
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+    # instructor loads its providers on first use, so wrap a throwaway client to load them as well
+    build_instructor_client(build_groq_client('preload'))
+    return time.time() - start_time
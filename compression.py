@@ -0,0 +1,62 @@
+import gzip
+import logging
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # br is offered only when the optional brotli package is installed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """The best encoding the client accepts, from a werkzeug Accept-Encoding header; br wins a tie."""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0
+    for encoding in offered:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+class ResponseCompressor:
+    """Compresses buffered JSON and text responses of at least `min_size` bytes for clients that accept it.
+
+    Streamed responses and files are left alone: the former must reach the client as they are
+    produced, and the latter are sent straight from disk. The default levels favour CPU over ratio,
+    since these responses are small and built per request.
+    """
+
+    def __init__(self, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def init_app(self, app):
+        from flask import request
+
+        @app.after_request
+        def _compress(response):
+            return self.process(response, request.accept_encodings)
+
+    def process(self, response, accept_encodings):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(accept_encodings)
+        if encoding is None or (response.content_length or 0) < self.min_size:
+            return response
+        response.set_data(compress(response.get_data(), encoding, self.gzip_level, self.brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+        return response
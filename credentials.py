@@ -0,0 +1,210 @@
+import datetime
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import requests
+
+if TYPE_CHECKING:
+    # google-auth is slow to import; it is loaded when credentials are first used
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('creds', 'mtime', 'last_used')
+
+    def __init__(self, creds: 'Credentials', mtime: float):
+        self.creds = creds
+        self.mtime = mtime
+        self.last_used = time.time()
+
+
+class CredentialStore:
+    """Google OAuth credentials per user, parsed once and kept in memory with an on-disk copy.
+
+    Every worker process keeps its own parsed copy and picks up a newer file written by another
+    worker. A background thread refreshes access tokens that expire within `refresh_margin` seconds
+    for users active in the last `idle_seconds`, so requests rarely wait for Google. Refreshes are
+    serialized per user with a thread lock and a file lock, so concurrent requests and workers never
+    refresh the same token twice.
+    """
+
+    def __init__(self, folder: str, scopes: List[str], refresh_margin: float = 300, refresh_interval: float = 60,
+                 idle_seconds: float = 24 * 3600):
+        self.folder = folder
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.refresh_interval = refresh_interval
+        self.idle_seconds = idle_seconds
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.hits = 0
+        self.loads = 0
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._refresher_pid = None
+        self._http = None
+        self._http_pid = None
+        os.makedirs(folder, mode=0o700, exist_ok=True)
+
+    def _path(self, user: str) -> str:
+        return os.path.join(self.folder, hashlib.sha256(user.encode()).hexdigest() + '.json')
+
+    def _request(self) -> 'Request':
+        # One keep-alive session per process for token refreshes
+        if self._http is None or self._http_pid != os.getpid():
+            from google.auth.transport.requests import Request
+            self._http = Request(session=requests.Session())
+            self._http_pid = os.getpid()
+        return self._http
+
+    def _user_lock(self, user: str) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user, threading.Lock())
+
+    @contextmanager
+    def _locked(self, user: str):
+        """Hold the user's lock in this process and, through a lock file, across worker processes."""
+        with self._user_lock(user), open(self._path(user) + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _write(self, user: str, creds: 'Credentials') -> float:
+        path = self._path(user)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            f.write(creds.to_json())
+        os.replace(tmp_path, path)
+        return os.path.getmtime(path)
+
+    def _load(self, user: str) -> Optional[_Entry]:
+        """The user's credentials, reloaded from disk when another worker has written a newer copy."""
+        with self._lock:
+            entry = self._entries.get(user)
+        try:
+            mtime = os.path.getmtime(self._path(user))
+        except OSError:
+            with self._lock:
+                self._entries.pop(user, None)
+            return None
+        if entry is not None and entry.mtime >= mtime:
+            self.hits += 1
+            return entry
+        from google.oauth2.credentials import Credentials
+        try:
+            with open(self._path(user), 'r', encoding='utf-8') as f:
+                creds = Credentials.from_authorized_user_info(json.load(f), self.scopes)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load stored credentials: {e}")
+            return None
+        self.loads += 1
+        entry = _Entry(creds, mtime)
+        with self._lock:
+            self._entries[user] = entry
+        return entry
+
+    def _expires_soon(self, creds: 'Credentials') -> bool:
+        if creds.expiry is None:
+            return False
+        # google-auth keeps expiry as a naive UTC datetime
+        remaining = creds.expiry - datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return remaining.total_seconds() < self.refresh_margin
+
+    def put(self, user: str, creds: 'Credentials'):
+        self._ensure_refresher()
+        with self._locked(user):
+            mtime = self._write(user, creds)
+        with self._lock:
+            self._entries[user] = _Entry(creds, mtime)
+
+    def get(self, user: str) -> Optional['Credentials']:
+        """Valid credentials for `user`, refreshed first only if the background refresh has not got to them."""
+        self._ensure_refresher()
+        entry = self._load(user)
+        if entry is None:
+            return None
+        entry.last_used = time.time()
+        if entry.creds.valid and not self._expires_soon(entry.creds):
+            return entry.creds
+        return self._refresh(user)
+
+    def delete(self, user: str):
+        with self._lock:
+            self._entries.pop(user, None)
+        for path in (self._path(user), self._path(user) + '.lock'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _refresh(self, user: str) -> Optional['Credentials']:
+        with self._locked(user):
+            # Another thread or worker may have refreshed while we waited for the lock
+            entry = self._load(user)
+            if entry is None:
+                return None
+            creds = entry.creds
+            if creds.valid and not self._expires_soon(creds):
+                return creds
+            if not creds.refresh_token:
+                return creds if creds.valid else None
+            try:
+                creds.refresh(self._request())
+            except Exception as e:
+                self.refresh_failures += 1
+                logger.error(f"Error refreshing Gmail token: {e}")
+                # A token that is merely close to expiry can still be used this time
+                return creds if creds.valid else None
+            self.refreshes += 1
+            mtime = self._write(user, creds)
+            with self._lock:
+                entry.mtime = mtime
+            logger.debug("Refreshed Gmail OAuth token")
+            return creds
+
+    def _ensure_refresher(self):
+        # Threads do not survive a fork, so each worker starts its own
+        if self._refresher_pid == os.getpid() or self.refresh_interval <= 0:
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, name='credential-refresh', daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            cutoff = time.time() - self.idle_seconds
+            with self._lock:
+                # Users who have gone quiet are dropped from memory; their file stays for next time
+                for user in [user for user, entry in self._entries.items() if entry.last_used < cutoff]:
+                    del self._entries[user]
+                due = [user for user, entry in self._entries.items() if self._expires_soon(entry.creds)]
+            for user in due:
+                try:
+                    self._refresh(user)
+                except Exception as e:
+                    logger.error(f"Background credential refresh failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached = len(self._entries)
+        return {
+            'cached_users': cached,
+            'hits': self.hits,
+            'loads': self.loads,
+            'refreshes': self.refreshes,
+            'refresh_failures': self.refresh_failures,
+        }
@@ -0,0 +1,416 @@
+import asyncio
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import BACKEND_RETRIES, DOWNSTREAM_LATENCY, stage
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean the backend turned the request away without acting on it (throttling, not ready),
+# so a retry cannot create a duplicate note, to-do or email. A 502 or 504 may come from a proxy after
+# the backend already handled the POST, so those are not retried, like read timeouts.
+RETRY_STATUSES = (429, 503)
+# Statuses with which a multi-item backend rejects the payload itself, so one bad item can fail the
+# whole batch. Auth failures and throttling apply to every item alike and are never bisected.
+SPLIT_STATUSES = (400, 422)
+
+
+def retry_after(response) -> Optional[float]:
+    """Seconds a Retry-After header (delay or HTTP date) asks the client to wait, or None without one."""
+    value = (response.headers.get('Retry-After') or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        return None
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def is_connect_error(error: Exception) -> bool:
+    """True when the request failed before a connection was made, so it never reached the backend."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    from urllib3.exceptions import NewConnectionError
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def error_kind(error: Exception) -> str:
+    """Classifies a requests or httpx exception as connect_error, connection_error, timeout or error.
+
+    Only a connect_error is certain not to have reached the backend.
+    """
+    httpx = sys.modules.get('httpx')
+    if httpx is not None and isinstance(error, httpx.HTTPError):
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return 'connect_error'
+        if isinstance(error, httpx.TimeoutException):
+            return 'timeout'
+        if isinstance(error, httpx.TransportError):
+            return 'connection_error'
+        return 'error'
+    if isinstance(error, requests.ConnectionError):
+        return 'connect_error' if is_connect_error(error) else 'connection_error'
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    return 'error'
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one trial call through after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half_open'
+            return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a call that says nothing about the backend's health, such as a cancelled one."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class BackendDispatcher:
+    """Posts to the downstream action backends over one keep-alive session per backend.
+
+    Calls have connect/read timeouts, retry with exponential backoff and full jitter on errors
+    connecting and on RETRY_STATUSES, and fail fast with CircuitOpen while a backend keeps failing.
+    Every attempt ends with the breaker told how it went, so a half-open trial can never be left
+    in flight.
+    apost() does the same from a coroutine, over one httpx.AsyncClient shared by all backends.
+    """
+
+    def __init__(self, urls: Dict[str, str], connect_timeout: float = 3.05, read_timeout: float = 30,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8,
+                 failure_threshold: int = 5, reset_timeout: float = 30, max_workers: int = 8):
+        self.urls = urls
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_workers = max_workers
+        self.breakers = {name: CircuitBreaker(failure_threshold, reset_timeout) for name in urls}
+        self.retries = 0
+        self._sessions: Dict[str, requests.Session] = {}
+        self._async_client: Optional['httpx.AsyncClient'] = None
+        self._pid = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _check_fork(self):
+        # Pooled connections and threads cannot be shared with a forked worker; call with the lock held
+        if self._pid != os.getpid():
+            self._sessions = {}
+            self._async_client = None
+            self._executor = None
+            self._pid = os.getpid()
+
+    def _session(self, backend_type: str) -> requests.Session:
+        with self._lock:
+            self._check_fork()
+            session = self._sessions.get(backend_type)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[backend_type] = session
+            return session
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            self._check_fork()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dispatch')
+            return self._executor
+
+    def _client(self) -> 'httpx.AsyncClient':
+        import httpx
+        with self._lock:
+            self._check_fork()
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                    limits=httpx.Limits(max_keepalive_connections=self.max_workers * len(self.urls)),
+                )
+            return self._async_client
+
+    async def aclose(self):
+        with self._lock:
+            client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _allow(self, backend_type: str) -> CircuitBreaker:
+        breaker = self.breakers[backend_type]
+        if not breaker.allow():
+            raise CircuitOpen(f"{backend_type} backend is unavailable")
+        return breaker
+
+    def _after_attempt(self, backend_type: str, breaker: CircuitBreaker, attempt: int, seconds: float,
+                       response=None, error: Optional[BaseException] = None) -> Optional[float]:
+        """Records one attempt, made with requests or httpx, and decides whether to retry it.
+
+        Returns the delay before the next attempt, or None when `response` or `error` is final.
+        """
+        delay = None
+        if error is not None:
+            if not isinstance(error, Exception):
+                # Cancelled because the client went away, which says nothing about the backend
+                breaker.release()
+                return None
+            kind = error_kind(error)
+            label = 'connection_error' if kind == 'connect_error' else kind
+            DOWNSTREAM_LATENCY.labels(backend_type, label).observe(seconds)
+            breaker.record_failure()
+            # A request that may have reached the backend could be acted on twice
+            if kind != 'connect_error' or attempt >= self.max_retries:
+                return None
+            reason = error
+        else:
+            DOWNSTREAM_LATENCY.labels(backend_type, str(response.status_code)).observe(seconds)
+            if response.status_code >= 500 or response.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return None
+            reason = f"status {response.status_code}"
+            wait = retry_after(response)
+            if wait is not None:
+                # Waiting longer would hold the caller's request open; let it see the response instead
+                if wait > self.backoff_max:
+                    return None
+                delay = max(wait, self._backoff(attempt))
+        if delay is None:
+            delay = self._backoff(attempt)
+        with self._lock:
+            self.retries += 1
+        BACKEND_RETRIES.labels(backend_type).inc()
+        logger.warning(f"Retrying {backend_type} backend in {delay:.2f}s after {reason} (attempt {attempt + 1})")
+        return delay
+
+    def post(self, backend_type: str, payload: Any, headers: Optional[dict] = None) -> requests.Response:
+        """POST `payload` as JSON to the backend; raises CircuitOpen or requests exceptions."""
+        with stage('downstream_post'):
+            return self._post(backend_type, payload, headers)
+
+    def _post(self, backend_type: str, payload: Any, headers: Optional[dict]) -> requests.Response:
+        url = self.urls[backend_type]
+        session = self._session(backend_type)
+        attempt = 0
+        while True:
+            breaker = self._allow(backend_type)
+            attempt_start = time.perf_counter()
+            try:
+                response = session.post(url, json=payload, headers=headers, timeout=self.timeout)
+            except BaseException as e:
+                delay = self._after_attempt(backend_type, breaker, attempt, time.perf_counter() - attempt_start, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = self._after_attempt(backend_type, breaker, attempt, time.perf_counter() - attempt_start,
+                                            response=response)
+                if delay is None:
+                    return response
+            attempt += 1
+            time.sleep(delay)
+
+    async def apost(self, backend_type: str, payload: Any, headers: Optional[dict] = None) -> 'httpx.Response':
+        """post() for coroutines; raises CircuitOpen or httpx exceptions."""
+        with stage('downstream_post'):
+            return await self._apost(backend_type, payload, headers)
+
+    async def _apost(self, backend_type: str, payload: Any, headers: Optional[dict]) -> 'httpx.Response':
+        url = self.urls[backend_type]
+        client = self._client()
+        attempt = 0
+        while True:
+            breaker = self._allow(backend_type)
+            attempt_start = time.perf_counter()
+            try:
+                response = await client.post(url, json=payload, headers=headers)
+            except BaseException as e:
+                delay = self._after_attempt(backend_type, breaker, attempt, time.perf_counter() - attempt_start, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = self._after_attempt(backend_type, breaker, attempt, time.perf_counter() - attempt_start,
+                                            response=response)
+                if delay is None:
+                    return response
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        return self._pool().submit(fn, *args)
+
+    def map(self, fn: Callable, calls: List[Tuple]) -> List[Tuple[Any, Optional[Exception]]]:
+        """Run fn(*call) for every call concurrently; returns (result, exception) pairs in order."""
+        futures = [self._pool().submit(fn, *call) for call in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append((future.result(), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            'retries': self.retries,
+            'breakers': {name: breaker.state for name, breaker in self.breakers.items()},
+        }
+
+
+class AcceptCoalescer:
+    """Buffers accepted items per backend and auth context and sends them as one multi-item POST.
+
+    A group is flushed when it reaches `max_batch` items or its oldest item has waited `max_wait`
+    seconds. If a multi-item send fails and `should_split(error)` says the failure may come from a
+    single item (a 400 or 422 rejection, see SPLIT_STATUSES), the group is bisected and retried so
+    the error ends up only on the items that caused it.
+    """
+
+    def __init__(self, send: Callable[[str, List[dict], dict], Any], submit: Callable[..., Future],
+                 max_batch: int = 20, max_wait: float = 0.25,
+                 should_split: Callable[[Exception], bool] = lambda error: True):
+        self.send = send
+        self.submit_task = submit
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.should_split = should_split
+        self.requests_sent = 0
+        self.items_sent = 0
+        self._groups: Dict[tuple, List[Tuple[dict, Future]]] = {}
+        self._deadlines: Dict[tuple, float] = {}
+        self._changed = threading.Condition()
+        self._pid = None
+
+    def _ensure_timer(self):
+        # Called with the condition held; the timer thread does not survive a fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._groups, self._deadlines = {}, {}
+            threading.Thread(target=self._timer, daemon=True, name='accept-coalescer').start()
+
+    def submit(self, backend_type: str, item: dict, headers: dict, flush: bool = False) -> Future:
+        """Queue an item; the future resolves once its group has been sent."""
+        key = (backend_type, tuple(sorted(headers.items())))
+        future = Future()
+        with self._changed:
+            self._ensure_timer()
+            group = self._groups.setdefault(key, [])
+            group.append((item, future))
+            self._deadlines.setdefault(key, time.monotonic() + self.max_wait)
+            if flush or len(group) >= self.max_batch:
+                self._dispatch(key)
+            self._changed.notify()
+        return future
+
+    def flush(self):
+        with self._changed:
+            for key in list(self._groups):
+                self._dispatch(key)
+
+    def _dispatch(self, key: tuple):
+        # Called with the condition held
+        entries = self._groups.pop(key, [])
+        self._deadlines.pop(key, None)
+        for start in range(0, len(entries), self.max_batch):
+            self.submit_task(self._send_group, key, entries[start:start + self.max_batch])
+
+    def _timer(self):
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                for key, deadline in list(self._deadlines.items()):
+                    if deadline <= now:
+                        self._dispatch(key)
+                timeout = min(self._deadlines.values(), default=now + 60) - now
+                self._changed.wait(max(timeout, 0.001))
+
+    def _send_group(self, key: tuple, entries: List[Tuple[dict, Future]]):
+        backend_type, headers = key[0], dict(key[1])
+        try:
+            self.send(backend_type, [item for item, _ in entries], headers)
+        except Exception as e:
+            if len(entries) > 1 and self.should_split(e):
+                middle = len(entries) // 2
+                self._send_group(key, entries[:middle])
+                self._send_group(key, entries[middle:])
+                return
+            for _, future in entries:
+                future.set_exception(e)
+            return
+        finally:
+            with self._changed:
+                self.requests_sent += 1
+        with self._changed:
+            self.items_sent += len(entries)
+        for _, future in entries:
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        with self._changed:
+            return {'requests_sent': self.requests_sent, 'items_sent': self.items_sent}
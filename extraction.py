@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from difflib import SequenceMatcher
+from typing import Awaitable, Callable, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+# Rough average for English text with Llama-family tokenizers; good enough for budgeting chunks
+CHARS_PER_TOKEN = 4
+DUPLICATE_SIMILARITY = 0.85
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool(max_workers: int) -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract')
+        return _pool
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_sentence(sentence: str, max_chars: int) -> Iterator[str]:
+    """Cut an over-long sentence into pieces of at most `max_chars`, between words where possible."""
+    piece = ''
+    for word in sentence.split():
+        # A single word longer than a piece, e.g. a run of text without spaces, is cut anywhere
+        while len(word) > max_chars:
+            if piece:
+                yield piece
+                piece = ''
+            yield word[:max_chars]
+            word = word[max_chars:]
+        if piece and len(piece) + 1 + len(word) > max_chars:
+            yield piece
+            piece = ''
+        piece = f"{piece} {word}" if piece else word
+    if piece:
+        yield piece
+
+
+def split_transcript(transcript: str, max_tokens: int, overlap_tokens: int) -> List[str]:
+    """Split a transcript into chunks of about `max_tokens`, cut at sentence boundaries.
+
+    Each chunk repeats roughly the last `overlap_tokens` of the previous one so that an action item
+    discussed across a cut is seen whole by at least one chunk. Sentences too long for that, as in
+    unpunctuated ASR output, are first cut between words into pieces no larger than the overlap.
+    Raises ValueError unless the overlap is smaller than the chunk, which it would otherwise never
+    move past.
+    """
+    if max_tokens < 1 or not 0 <= overlap_tokens < max_tokens:
+        raise ValueError(f"Chunk overlap ({overlap_tokens} tokens) must be smaller than the chunk "
+                         f"({max_tokens} tokens)")
+    piece_tokens = max(1, min(max_tokens, overlap_tokens or max_tokens))
+    max_chars = max(CHARS_PER_TOKEN, (piece_tokens - 1) * CHARS_PER_TOKEN)
+    sentences = []
+    for sentence in re.split(r'(?<=[.!?])\s+', transcript.strip()):
+        if estimate_tokens(sentence) > piece_tokens:
+            sentences.extend(_split_sentence(sentence, max_chars))
+        elif sentence:
+            sentences.append(sentence)
+    chunks, current, current_tokens = [], [], 0
+    for sentence in sentences:
+        tokens = estimate_tokens(sentence)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(' '.join(current))
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                overlap_size += estimate_tokens(previous)
+                if overlap_size > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+            current, current_tokens = overlap, sum(estimate_tokens(s) for s in overlap)
+        current.append(sentence)
+        current_tokens += tokens
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def _normalize(text) -> str:
+    return re.sub(r'\W+', ' ', text or '').strip().lower()
+
+
+class ActionItemMerger:
+    """Collects action items from several chunks, dropping near-duplicates.
+
+    Two items are duplicates when they share `type` and `recipient` and their `content` is at least
+    DUPLICATE_SIMILARITY similar; the longer content is kept.
+    """
+
+    def __init__(self):
+        self.items: List[dict] = []
+
+    def add(self, item: dict) -> bool:
+        """Add an item; returns False if it duplicates one already collected."""
+        content = _normalize(item.get('content'))
+        for existing in self.items:
+            if (existing.get('type') == item.get('type')
+                    and _normalize(existing.get('recipient')) == _normalize(item.get('recipient'))
+                    and SequenceMatcher(None, _normalize(existing.get('content')), content).ratio() >= DUPLICATE_SIMILARITY):
+                if len(content) > len(_normalize(existing.get('content'))):
+                    existing.update({k: v for k, v in item.items() if v})
+                return False
+        self.items.append(dict(item))
+        return True
+
+
+def extract_chunked(extract_fn: Callable[[str], List[dict]], transcript: str, max_tokens: int,
+                    overlap_tokens: int, max_workers: int = 4) -> List[dict]:
+    """Run `extract_fn` over transcript chunks concurrently and merge the results in transcript order."""
+    chunks = split_transcript(transcript, max_tokens, overlap_tokens)
+    logger.info(f"Extracting action items from {len(chunks)} transcript chunks")
+    pool = get_extraction_pool(max_workers)
+    futures = [pool.submit(extract_fn, chunk) for chunk in chunks]
+    merger = ActionItemMerger()
+    for future in futures:
+        for item in future.result():
+            merger.add(item)
+    return merger.items
+
+
+async def extract_chunked_async(extract_fn: Callable[[str], Awaitable[List[dict]]], transcript: str, max_tokens: int,
+                                overlap_tokens: int, max_workers: int = 4) -> List[dict]:
+    """extract_chunked() for a coroutine `extract_fn`, with up to `max_workers` chunks in flight."""
+    chunks = split_transcript(transcript, max_tokens, overlap_tokens)
+    logger.info(f"Extracting action items from {len(chunks)} transcript chunks")
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def extract(chunk: str) -> List[dict]:
+        async with semaphore:
+            return await extract_fn(chunk)
+
+    merger = ActionItemMerger()
+    for items in await asyncio.gather(*(extract(chunk) for chunk in chunks)):
+        for item in items:
+            merger.add(item)
+    return merger.items
+
+
+def iter_chunked(extract_fn: Callable[[str], List[dict]], transcript: str, max_tokens: int,
+                 overlap_tokens: int, max_workers: int = 4) -> Iterator[dict]:
+    """Like extract_chunked, but yields each new item as soon as the chunk it came from finishes."""
+    chunks = split_transcript(transcript, max_tokens, overlap_tokens)
+    logger.info(f"Streaming action items from {len(chunks)} transcript chunks")
+    pool = get_extraction_pool(max_workers)
+    merger = ActionItemMerger()
+    for future in as_completed([pool.submit(extract_fn, chunk) for chunk in chunks]):
+        for item in future.result():
+            if merger.add(item):
+                yield item
@@ -0,0 +1,159 @@
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from metrics import EXTRACTION_GATE
+
+logger = logging.getLogger(__name__)
+
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+
+_WEEKDAYS = r'(?:mon|tues|wednes|thurs|fri|satur|sun)day'
+_MONTHS = r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)'
+DATE_RE = re.compile(
+    r'\b(?:'
+    rf'(?:(?:next|this|on)\s+)?{_WEEKDAYS}(?:\s+(?:morning|afternoon|evening))?'
+    rf'|{_MONTHS}\s+\d{{1,2}}(?:st|nd|rd|th)?'
+    rf'|\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTHS}'
+    r'|\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}(?:/\d{2,4})?'
+    r'|tomorrow|tonight|next\s+(?:week|month|quarter|sprint|year)'
+    r'|end\s+of\s+(?:the\s+)?(?:day|week|month|quarter|sprint)|eod|eow'
+    r'|(?:at\s+)?\d{1,2}(?::\d{2})?\s*(?:am|pm)|at\s+\d{1,2}:\d{2}|at\s+\d{1,2}\b'
+    r')',
+    re.IGNORECASE,
+)
+
+# Phrases that on their own name one of the action item types
+ACTION_RE = re.compile(
+    r'\b(?:'
+    r'action\s+items?|to-?dos?|remind(?:er)?|follow[\s-]up|e-?mail|send|schedule|book|calendar|invite'
+    r'|look\s+(?:up|into)|search|google|research|(?:take|make|save|write)\s+(?:a\s+)?note|note\s+(?:that|down)'
+    r'|set\s+up|write\s+up|draft|sign[\s-]off|deadline|due'
+    r')\b',
+    re.IGNORECASE,
+)
+# Requests and commitments; these only count together with another cue in the same sentence
+COMMITMENT_RE = re.compile(
+    r"\b(?:"
+    r"can\s+you|could\s+you|would\s+you|please|let'?s|i'?ll|we'?ll|he'?ll|she'?ll|they'?ll|will|needs?\s+to"
+    r"|should|have\s+to|has\s+to|must|make\s+sure|don'?t\s+forget|going\s+to|i\s+want|we\s+want"
+    r")\b",
+    re.IGNORECASE,
+)
+# A capitalised name that is addressed ("Priya, can you") or that follows a verb of asking or telling
+RECIPIENT_RE = re.compile(
+    r"(?:^|[.?!]\s+)([A-Z][a-z]+),\s|\b(?:ask|tell|ping|with|to|cc|from)\s+([A-Z][a-z]+)\b"
+)
+# Sentence openers that look like an addressed name
+NOT_NAMES = frozenset((
+    'okay', 'ok', 'alright', 'right', 'so', 'well', 'yes', 'yeah', 'no', 'nice', 'great', 'thanks', 'sure',
+    'also', 'and', 'but', 'then', 'now', 'first', 'second', 'third', 'fourth', 'finally', 'overall', 'anyway',
+    'hi', 'hey', 'hello', 'morning', 'everyone', 'guys', 'team', 'sorry', 'actually', 'honestly',
+))
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+@dataclass(frozen=True)
+class Signals:
+    """What the heuristics found in a transcript."""
+
+    emails: Tuple[str, ...]
+    dates: Tuple[str, ...]
+    recipients: Tuple[str, ...]
+    actions: Tuple[str, ...]
+    max_sentence_cues: int  # most request, date and recipient cues found in any one sentence
+
+    def hints(self) -> str:
+        """Emails and dates for the prompt, so the model copies them rather than recalling them."""
+        lines = []
+        if self.emails:
+            lines.append(f"Email addresses mentioned: {', '.join(self.emails)}")
+        if self.dates:
+            lines.append(f"Dates and times mentioned: {', '.join(self.dates)}")
+        return '\n'.join(lines)
+
+
+def _unique(values) -> Tuple[str, ...]:
+    seen = {}
+    for value in values:
+        value = ' '.join(value.split())
+        seen.setdefault(value.lower(), value)
+    return tuple(seen.values())
+
+
+def analyze(transcript: str) -> Signals:
+    emails = EMAIL_RE.findall(transcript)
+    # Email addresses would otherwise match as dates or recipients
+    text = EMAIL_RE.sub(' ', transcript)
+    max_cues = 0
+    for sentence in SENTENCE_RE.split(text):
+        names = [name for match in RECIPIENT_RE.findall(sentence) for name in match
+                 if name and name.lower() not in NOT_NAMES]
+        cues = len(COMMITMENT_RE.findall(sentence)) + len(DATE_RE.findall(sentence)) + len(names)
+        max_cues = max(max_cues, cues)
+    return Signals(
+        emails=_unique(emails),
+        dates=_unique(DATE_RE.findall(text)),
+        recipients=_unique(name for match in RECIPIENT_RE.findall(text) for name in match
+                           if name and name.lower() not in NOT_NAMES),
+        actions=_unique(ACTION_RE.findall(text)),
+        max_sentence_cues=max_cues,
+    )
+
+
+class TranscriptGate:
+    """Decides, without the LLM, whether a transcript could hold action items at all.
+
+    A transcript is extracted when it mentions an email address or an action (an email, a reminder,
+    a search, a note...), or when one of its sentences holds at least `min_cues` request, date or
+    recipient cues, as in "Dana will have the budget by Friday". Anything else, such as small talk,
+    status updates and the near-empty transcripts of silent recordings, is answered with no items.
+    Raising `min_cues` skips more; 1 skips only transcripts with no cue at all.
+    """
+
+    def __init__(self, enabled: bool = True, min_cues: int = 2, hints: bool = True):
+        self.enabled = enabled
+        self.min_cues = max(1, min_cues)
+        self.hints = hints
+        self.checked = 0
+        self.skipped = 0
+        self.hinted = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the gate's settings in cache keys; both the skip decision and the hints change the output."""
+        return f"gate={self.min_cues if self.enabled else 'off'},hints={int(self.hints)}"
+
+    def is_actionable(self, signals: Signals) -> bool:
+        return bool(signals.emails or signals.actions) or signals.max_sentence_cues >= self.min_cues
+
+    def check(self, transcript: str) -> Tuple[bool, Optional[str]]:
+        """Whether to extract from `transcript`, and the hints to add to the prompt if so."""
+        if not self.enabled and not self.hints:
+            return True, None
+        signals = analyze(transcript)
+        actionable = not self.enabled or self.is_actionable(signals)
+        hints = signals.hints() if actionable and self.hints else ''
+        EXTRACTION_GATE.labels('extracted' if actionable else 'skipped').inc()
+        with self._lock:
+            self.checked += 1
+            self.skipped += int(not actionable)
+            self.hinted += int(bool(hints))
+        if not actionable:
+            logger.info(f"Skipping extraction of a {len(transcript.split())}-word transcript with no action cues")
+        return actionable, hints or None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'min_cues': self.min_cues,
+                'hints': self.hints,
+                'checked': self.checked,
+                'skipped': self.skipped,
+                'hinted': self.hinted,
+                'skip_rate': round(self.skipped / self.checked, 3) if self.checked else None,
+            }
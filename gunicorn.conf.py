@@ -0,0 +1,25 @@
+"""gunicorn settings: `gunicorn -c gunicorn.conf.py`.
+
+The master imports the app and its client libraries once (--preload), so workers fork with them
+already loaded and share those pages copy-on-write. Each worker then builds its own HTTP clients,
+threads and database connections in post_fork.
+"""
+import os
+
+wsgi_app = 'main:create_app(preload=True)'
+preload_app = True
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 600))
+
+
+def post_fork(server, worker):
+    import main
+    main.init_worker()
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
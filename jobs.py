@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from metrics import JOBS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = 'queued'
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    user_email: Optional[str] = None  # only this user may see the job
+    pid: Optional[int] = None  # the worker process running it
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The job as shown to its owner."""
+        job = asdict(self)
+        del job['user_email'], job['pid']
+        return job
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+class JobQueue:
+    """Bounded background worker pool for long-running upload processing.
+
+    Job snapshots are written to `folder` on every status change so that any gunicorn worker
+    process can answer status requests, not only the one that accepted the upload. A snapshot left
+    queued or running by a process that has since died is marked failed when it is next read, and
+    all of them are checked at startup.
+    """
+
+    def __init__(self, folder: str, max_workers: int = 4, max_pending: int = 32, ttl_seconds: int = 3600):
+        self.folder = folder
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._executor = None
+        self._pid = None
+        os.makedirs(folder, exist_ok=True)
+        self._fail_orphans()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            # Worker threads do not survive a fork
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.folder, f"{job_id}.json")
+
+    def _persist(self, job: Job):
+        path = self._path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(asdict(job), f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to persist job {job.id}: {e}")
+
+    def submit(self, fn: Callable[[Callable[[str], None]], Any], user_email: Optional[str] = None) -> Job:
+        """Queue `fn(set_status)` for `user_email`; its return value becomes the job result."""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_pending:
+                raise QueueFull(f"Too many jobs in progress ({pending})")
+            job = Job(id=uuid.uuid4().hex, user_email=user_email, pid=os.getpid())
+            self._jobs[job.id] = job
+            self._persist(job)
+        JOBS_IN_FLIGHT.inc()
+        self._sweep()
+        self._pool().submit(self._run, job, fn)
+        return job
+
+    def _update(self, job: Job, status: str, **fields):
+        with self._changed:
+            job.status = status
+            job.updated_at = time.time()
+            for key, value in fields.items():
+                setattr(job, key, value)
+            self._persist(job)
+            self._changed.notify_all()
+
+    def _run(self, job: Job, fn):
+        try:
+            result = fn(lambda status: self._update(job, status))
+            self._update(job, 'completed', result=result)
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            self._update(job, 'failed', error=str(e))
+        finally:
+            JOBS_IN_FLIGHT.dec()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return Job(**asdict(job))
+        job = self._load(self._path(job_id))
+        if job is not None and self._orphaned(job):
+            job.status, job.error, job.updated_at = 'failed', 'The worker processing this job stopped', time.time()
+            self._persist(job)
+            logger.warning(f"Marked job {job.id} failed; its worker process {job.pid} is gone")
+        return job
+
+    def _load(self, path: str) -> Optional[Job]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return Job(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _orphaned(self, job: Job) -> bool:
+        """True when a job that is not done belongs to no live process."""
+        if job.done:
+            return False
+        if job.pid == os.getpid():
+            # Ours from an earlier run that had the same pid, since our own jobs are answered from memory
+            with self._lock:
+                return job.id not in self._jobs
+        if job.pid is None:
+            return True
+        try:
+            os.kill(job.pid, 0)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            pass
+        return False
+
+    def _fail_orphans(self):
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.json'):
+                self.get(name[:-len('.json')])
+
+    def wait(self, job_id: str, since: float, timeout: float) -> Optional[Job]:
+        """Block until the job changes after `since` (its updated_at) or the timeout expires."""
+        deadline = time.time() + timeout
+        with self._changed:
+            local = self._jobs.get(job_id)
+            while local and local.updated_at <= since and not local.done:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        if not local:
+            # Owned by another worker process; fall back to polling its snapshot
+            job = self.get(job_id)
+            while job and job.updated_at <= since and not job.done and time.time() < deadline:
+                time.sleep(0.5)
+                job = self.get(job_id)
+            return job
+        return self.get(job_id)
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.done and job.updated_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+        try:
+            for name in os.listdir(self.folder):
+                path = os.path.join(self.folder, name)
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError as e:
+            logger.debug(f"Job sweep failed: {e}")
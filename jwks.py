@@ -0,0 +1,136 @@
+import logging
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+import requests
+
+if TYPE_CHECKING:
+    # PyJWT pulls in cryptography, so it is imported when keys are first fetched
+    import jwt
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_JWKS_URL = 'https://www.googleapis.com/oauth2/v3/certs'
+GOOGLE_ISSUERS = ('https://accounts.google.com', 'accounts.google.com')
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def fetch_jwks(url: str, timeout: float = 5) -> Tuple[dict, Optional[float]]:
+    """GET a JWKS document; returns it with the Cache-Control max-age in seconds, if any."""
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    match = _MAX_AGE.search(response.headers.get('Cache-Control', ''))
+    return response.json(), float(match.group(1)) if match else None
+
+
+class JwksCache:
+    """Signing keys from a JWKS endpoint, kept in process for as long as the endpoint's max-age allows.
+
+    Expired keys keep being served while a background thread fetches the new set. A token signed
+    with a key id we have never seen triggers an immediate fetch, since providers publish new keys
+    before they use them; such fetches are spaced at least `min_refresh_interval` seconds apart so
+    made-up key ids cannot turn into a flood of requests. `fetch` can be swapped for a local key set.
+    """
+
+    def __init__(self, url: str = GOOGLE_JWKS_URL,
+                 fetch: Callable[[str], Tuple[dict, Optional[float]]] = fetch_jwks,
+                 default_max_age: float = 3600, min_refresh_interval: float = 30):
+        self.url = url
+        self.fetch = fetch
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.fetches = 0
+        self.fetch_failures = 0
+        self._keys: Dict[str, 'jwt.PyJWK'] = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshing = False
+
+    def _refresh(self):
+        import jwt
+        # One fetch at a time; callers that were waiting on it find the keys already updated
+        with self._refresh_lock:
+            if time.time() - self._fetched_at < self.min_refresh_interval:
+                return
+            try:
+                document, max_age = self.fetch(self.url)
+                keys = {key.key_id: key for key in jwt.PyJWKSet.from_dict(document).keys if key.key_id}
+            except Exception as e:
+                self.fetch_failures += 1
+                logger.error(f"Failed to fetch signing keys from {self.url}: {e}")
+                with self._lock:
+                    self._fetched_at = time.time()
+                return
+            now = time.time()
+            with self._lock:
+                self._keys = keys
+                self._fetched_at = now
+                self._expires_at = now + (self.default_max_age if max_age is None else max_age)
+                self.fetches += 1
+            logger.debug(f"Fetched {len(keys)} signing keys from {self.url}")
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh()
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+    def prefetch(self):
+        """Load the keys in the background, so the first sign-in does not wait for them."""
+        self._refresh_in_background()
+
+    def get_key(self, key_id: Optional[str]) -> Optional['jwt.PyJWK']:
+        with self._lock:
+            key = self._keys.get(key_id)
+            expired = time.time() >= self._expires_at
+        if key is not None:
+            if expired:
+                self._refresh_in_background()
+            return key
+        self._refresh()
+        with self._lock:
+            return self._keys.get(key_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'keys': len(self._keys),
+                'expires_in': max(0, round(self._expires_at - time.time())),
+                'fetches': self.fetches,
+                'fetch_failures': self.fetch_failures,
+            }
+
+
+def verify_id_token(token: str, audience: str, jwks: JwksCache, issuers=GOOGLE_ISSUERS, leeway: float = 60) -> dict:
+    """Check an OpenID Connect id_token's signature, audience, issuer and expiry; returns its claims.
+
+    Raises jwt.InvalidTokenError (or a subclass) when the token cannot be trusted.
+    """
+    import jwt
+    header = jwt.get_unverified_header(token)
+    key = jwks.get_key(header.get('kid'))
+    if key is None:
+        raise jwt.InvalidTokenError(f"Unknown signing key {header.get('kid')!r}")
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[key.algorithm_name or 'RS256'],
+        audience=audience,
+        issuer=issuers,
+        leeway=leeway,
+        options={'require': ['exp', 'iat', 'iss', 'aud', 'sub']},
+    )
@@ -0,0 +1,302 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from audio import COPY_CHUNK_BYTES, TARGET_SAMPLE_RATE, AudioSource, PcmAudio, decode_pcm, encode_wav, quietest_point
+from extraction import ActionItemMerger, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Final segments from before the pending text that are sent along as context for extraction
+EXTRACTION_CONTEXT_SEGMENTS = 2
+
+
+class LiveSessionError(Exception):
+    def __init__(self, message: str, status_code: int, extra: Optional[dict] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.extra = extra or {}
+
+
+class LiveSessionManager:
+    """Transcribes a meeting while it is being recorded, from audio slices posted in order.
+
+    Every slice is decoded and appended to the session's 16 kHz PCM. Whenever `window_seconds` of
+    audio past the last cut has arrived, the window is cut at its quietest point and transcribed into
+    final segments. With `partials` on, the audio after the cut is also transcribed after every slice
+    as partial segments that later slices replace; that re-transcribes the open window each time, so
+    it costs several times the audio's own transcription and is off by default. Once `extract_min_tokens` of final text has built up it is run through `extract`, and
+    new action items are handed to `store`.
+
+    State and audio live on disk under `folder`, guarded by file locks, so consecutive slices may be
+    handled by different gunicorn workers.
+    """
+
+    def __init__(self, folder: str,
+                 transcribe: Callable[[str, bytes], Tuple[str, List[dict]]],
+                 extract: Optional[Callable[[str], List[dict]]],
+                 store: Callable[[str, Optional[str], Dict[str, int], List[dict]], Tuple[str, List[dict]]],
+                 window_seconds: float = 30, partials: bool = False, min_partial_seconds: float = 2,
+                 extract_min_tokens: int = 400, ttl_seconds: int = 6 * 3600):
+        self.folder = folder
+        self.transcribe = transcribe
+        self.extract = extract
+        self.store = store
+        self.window_seconds = window_seconds
+        self.partials = partials
+        self.min_partial_seconds = min_partial_seconds
+        self.extract_min_tokens = extract_min_tokens
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(folder, exist_ok=True)
+
+    def _dir(self, session_id: str) -> str:
+        return os.path.join(self.folder, session_id)
+
+    def _audio_path(self, session_id: str) -> str:
+        return os.path.join(self._dir(session_id), 'audio.pcm')
+
+    def _state_path(self, session_id: str) -> str:
+        return os.path.join(self._dir(session_id), 'state.json')
+
+    def _save(self, state: dict):
+        state['updated_at'] = time.time()
+        path = self._state_path(state['id'])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @contextmanager
+    def _locked(self, session_id: str, user_email: str):
+        """Yield the session's state with its lock held; only the user who started it may touch it."""
+        if not session_id.isalnum():
+            raise LiveSessionError("Unknown live session", 404)
+        try:
+            lock_file = open(os.path.join(self._dir(session_id), 'lock'), 'a')
+        except OSError:
+            raise LiveSessionError("Unknown live session", 404)
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self._state_path(session_id), 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                raise LiveSessionError("Unknown live session", 404)
+            if state['user_email'] != user_email:
+                raise LiveSessionError("Unknown live session", 404)
+            yield state
+
+    @contextmanager
+    def _advancing(self, session_id: str):
+        """Hold the session's second lock, which lets one request at a time transcribe and extract.
+
+        The Groq calls run under this lock only, so the state lock stays free for appending slices and
+        reading the session meanwhile.
+        """
+        with open(os.path.join(self._dir(session_id), 'advance.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def create(self, user_email: str) -> dict:
+        self._sweep()
+        session_id = uuid.uuid4().hex
+        os.makedirs(self._dir(session_id))
+        open(self._audio_path(session_id), 'wb').close()
+        state = {
+            'id': session_id,
+            'user_email': user_email,
+            'created_at': time.time(),
+            'next_seq': 0,
+            'num_samples': 0,
+            'window_start': 0,
+            'final_segments': [],
+            'partial_segments': [],
+            'extracted_upto': 0,
+            'items': [],
+            'meeting_id': None,
+            'positions': {},
+            'closed': False,
+            'finished': False,
+        }
+        self._save(state)
+        return state
+
+    def summary(self, session_id: str, user_email: str) -> dict:
+        with self._locked(session_id, user_email) as state:
+            return self._summary(state)
+
+    def _summary(self, state: dict) -> dict:
+        return {
+            'session_id': state['id'],
+            'next_seq': state['next_seq'],
+            'duration': state['num_samples'] / TARGET_SAMPLE_RATE,
+            'transcription': self._text(state['final_segments']),
+            'segments': state['final_segments'],
+            'partial': state['partial_segments'],
+            'meeting_id': state['meeting_id'],
+            'items': state['items'],
+            'finished': state['finished'],
+        }
+
+    def add_chunk(self, session_id: str, user_email: str, seq: int, audio: AudioSource) -> dict:
+        """Append slice `seq` and return the new final segments, current partial segments and new items.
+
+        Slices must arrive in order; a repeated slice is acknowledged without being applied again.
+        """
+        with self._locked(session_id, user_email) as state:
+            if state['finished'] or state.get('closed'):
+                raise LiveSessionError("Live session already finished", 410)
+            if seq < state['next_seq']:
+                return {'seq': seq, 'duplicate': True, 'final': [], 'partial': state['partial_segments'], 'items': []}
+            if seq > state['next_seq']:
+                raise LiveSessionError("Audio slice out of order", 409, {'expected_seq': state['next_seq']})
+            pcm = decode_pcm(audio, sample_rate=TARGET_SAMPLE_RATE)
+            if pcm is None or pcm.sample_rate != TARGET_SAMPLE_RATE:
+                if pcm is not None:
+                    pcm.close()
+                raise LiveSessionError("Could not decode audio slice", 400)
+            try:
+                pcm.file.seek(0)
+                with open(self._audio_path(session_id), 'ab') as f:
+                    shutil.copyfileobj(pcm.file, f, COPY_CHUNK_BYTES)
+            finally:
+                pcm.close()
+            state['num_samples'] += pcm.num_samples
+            state['next_seq'] = seq + 1
+            self._save(state)
+        with self._advancing(session_id):
+            result = self._advance(session_id, user_email, finishing=False)
+        return {'seq': seq, **result}
+
+    def finish(self, session_id: str, user_email: str) -> dict:
+        """Transcribe and extract whatever is left and return the whole meeting."""
+        with self._locked(session_id, user_email) as state:
+            if state['finished']:
+                return self._summary(state)
+            # No slice may land after the last window has been planned
+            state['closed'] = True
+            self._save(state)
+        with self._advancing(session_id):
+            result = self._advance(session_id, user_email, finishing=True)
+            if 'error' in result:
+                raise LiveSessionError(f"Transcription failed: {result['error']}", 502)
+            with self._locked(session_id, user_email) as state:
+                if not state['finished']:
+                    if state['meeting_id'] is None and self.extract is not None:
+                        # A meeting without action items still replaces the previous one on the dashboard
+                        state['meeting_id'], _ = self.store(state['user_email'], None, state['positions'], [])
+                    state['finished'] = True
+                    state['partial_segments'] = []
+                    self._save(state)
+                    try:
+                        os.remove(self._audio_path(session_id))
+                    except OSError:
+                        pass
+                return self._summary(state)
+
+    def _advance(self, session_id: str, user_email: str, finishing: bool) -> dict:
+        """Transcribe the windows that are ready, then extract; call with _advancing() held.
+
+        Only this method moves window_start, final_segments and extraction forward, so the state lock is
+        taken just to read and write them, and slices can be appended during the slow calls in between.
+        """
+        with self._locked(session_id, user_email) as state:
+            if state['finished']:
+                return {'final': [], 'partial': [], 'items': []}
+            num_samples, start, first_id = state['num_samples'], state['window_start'], len(state['final_segments'])
+        window = int(self.window_seconds * TARGET_SAMPLE_RATE)
+        search = int(min(5.0, self.window_seconds / 2) * TARGET_SAMPLE_RATE)
+        new_final: List[dict] = []
+        partial = None
+        error = None
+        with open(self._audio_path(session_id), 'rb') as f:
+            pcm = PcmAudio(file=f, sample_rate=TARGET_SAMPLE_RATE, num_samples=num_samples)
+            try:
+                while num_samples - start >= window or (finishing and num_samples > start):
+                    if num_samples - start > window:
+                        cut = quietest_point(pcm, start + window - search, start + window)
+                    else:
+                        cut = num_samples
+                    new_final.extend(self._transcribe_range(pcm, session_id, start, cut, first_id + len(new_final)))
+                    start = cut
+                partial = []
+                remaining = num_samples - start
+                if not finishing and self.partials and remaining >= self.min_partial_seconds * TARGET_SAMPLE_RATE:
+                    partial = self._transcribe_range(pcm, session_id, start, num_samples, None)
+            except Exception as e:
+                # The audio is kept, so the next slice (or finish) retries from the last cut
+                logger.error(f"Live transcription failed for session {session_id}: {e}")
+                error = str(e)
+        with self._locked(session_id, user_email) as state:
+            state['final_segments'].extend(new_final)
+            state['window_start'] = start
+            if partial is not None:
+                state['partial_segments'] = partial
+            self._save(state)
+            partial = state['partial_segments']
+        items = self._extract_pending(session_id, user_email, finishing) if error is None else []
+        result = {'final': new_final, 'partial': partial, 'items': items}
+        if error:
+            result['error'] = error
+        return result
+
+    def _transcribe_range(self, pcm: PcmAudio, session_id: str, start: int, end: int,
+                          first_id: Optional[int]) -> List[dict]:
+        _, segments = self.transcribe(f"live_{session_id}_{start}.wav", encode_wav(pcm, start, end))
+        offset = start / TARGET_SAMPLE_RATE
+        shifted = []
+        for i, segment in enumerate(segments):
+            segment = {**segment, 'start': segment.get('start', 0.0) + offset, 'end': segment.get('end', 0.0) + offset}
+            if first_id is not None:
+                segment['id'] = first_id + i
+            shifted.append(segment)
+        return shifted
+
+    @staticmethod
+    def _text(segments: List[dict]) -> str:
+        return " ".join(segment['text'].strip() for segment in segments if segment.get('text'))
+
+    def _extract_pending(self, session_id: str, user_email: str, finishing: bool) -> List[dict]:
+        if self.extract is None:
+            return []
+        with self._locked(session_id, user_email) as state:
+            upto, end = state['extracted_upto'], len(state['final_segments'])
+            pending = self._text(state['final_segments'][upto:])
+            if not pending or (not finishing and estimate_tokens(pending) < self.extract_min_tokens):
+                return []
+            context = self._text(state['final_segments'][max(0, upto - EXTRACTION_CONTEXT_SEGMENTS):upto])
+        try:
+            extracted = self.extract(f"{context} {pending}".strip())
+        except Exception as e:
+            logger.error(f"Live extraction failed for session {session_id}: {e}")
+            return []
+        with self._locked(session_id, user_email) as state:
+            merger = ActionItemMerger()
+            for item in state['items']:
+                merger.add(item['action_item'])
+            new_items = [item for item in extracted if merger.add(item)]
+            state['extracted_upto'] = end
+            stored = []
+            if new_items:
+                state['meeting_id'], stored = self.store(state['user_email'], state['meeting_id'], state['positions'],
+                                                         new_items)
+                state['items'].extend(stored)
+            self._save(state)
+        return stored
+
+    def _sweep(self):
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            for name in os.listdir(self.folder):
+                path = os.path.join(self.folder, name)
+                state_path = os.path.join(path, 'state.json')
+                if os.path.isdir(path) and os.path.getmtime(state_path if os.path.exists(state_path) else path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+        except OSError as e:
+            logger.debug(f"Live session sweep failed: {e}")
@@ -0,0 +1,231 @@
+import bisect
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+from audio import DEFAULT_SPOOL_BYTES, TARGET_SAMPLE_RATE, AudioSource, PcmAudio, decode_pcm, plan_windows
+from transcription import TranscriptionBackend
+from vad import VadSettings, strip_silence
+
+logger = logging.getLogger(__name__)
+
+# Whisper's encoder sees at most 30 seconds at a time
+CLIP_SECONDS = 30
+
+
+class WhisperEngine:
+    """A faster-whisper model loaded once per process, fed by a queue of transcription requests.
+
+    One inference thread owns the model. It takes the next request, waits up to `max_wait` for more
+    to queue up, lays all of their 30-second clips end to end and decodes them in batches of
+    `batch_size` through faster-whisper's batched pipeline, then hands each request back its own
+    segments. Under load this keeps the CPU busy with full batches instead of one clip at a time.
+
+    Requests in one batch share a single language setting, so `language` should be set when the
+    deployment only sees one; with None it is detected from the first clip of each batch.
+    """
+
+    def __init__(self, model_size: str = 'small', cpu_threads: int = 4, compute_type: str = 'int8',
+                 batch_size: int = 8, max_wait: float = 0.1, language: Optional[str] = 'en',
+                 download_root: Optional[str] = None):
+        self.model_size = model_size
+        self.cpu_threads = cpu_threads
+        self.compute_type = compute_type
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.language = language
+        self.download_root = download_root
+        self.batches = 0
+        self.requests = 0
+        self._pipeline = None
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the model and start the inference thread; safe to call repeatedly and after a fork."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            try:
+                from faster_whisper import BatchedInferencePipeline, WhisperModel
+            except ImportError as e:
+                raise RuntimeError("The local transcription backend requires faster-whisper: "
+                                   "pip install -r requirements-local.txt") from e
+            start_time = time.time()
+            model = WhisperModel(
+                self.model_size,
+                device='cpu',
+                compute_type=self.compute_type,
+                cpu_threads=self.cpu_threads,
+                download_root=self.download_root,
+            )
+            self._pipeline = BatchedInferencePipeline(model)
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, daemon=True, name='whisper-engine').start()
+            logger.info(f"Loaded Whisper {self.model_size} ({self.compute_type}, {self.cpu_threads} threads) "
+                        f"in {time.time() - start_time:.2f} seconds")
+
+    def submit(self, samples, clips: List[Tuple[int, int]]) -> Future:
+        """Queue float32 16 kHz `samples` cut into (start, end) clips; resolves to the segment list."""
+        self.load()
+        future = Future()
+        if not clips:
+            future.set_result([])
+        else:
+            self._queue.put((samples, clips, future))
+        return future
+
+    def _collect(self) -> list:
+        jobs = [self._queue.get()]
+        clip_count = len(jobs[0][1])
+        deadline = time.monotonic() + self.max_wait
+        while clip_count < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            clip_count += len(job[1])
+        return jobs
+
+    def _run(self):
+        import numpy as np
+
+        while True:
+            jobs = self._collect()
+            try:
+                offsets, clip_timestamps, position = [], [], 0
+                for samples, clips, _ in jobs:
+                    offsets.append(position / TARGET_SAMPLE_RATE)
+                    clip_timestamps.extend(
+                        {'start': (position + start) / TARGET_SAMPLE_RATE, 'end': (position + end) / TARGET_SAMPLE_RATE}
+                        for start, end in clips
+                    )
+                    position += len(samples)
+                audio = np.concatenate([samples for samples, _, _ in jobs])
+                segments, _ = self._pipeline.transcribe(
+                    audio,
+                    language=self.language,
+                    clip_timestamps=clip_timestamps,
+                    batch_size=self.batch_size,
+                    without_timestamps=False,
+                    vad_filter=False,
+                )
+                results = [[] for _ in jobs]
+                for segment in segments:
+                    # Rounding can put a segment a hair before its clip; nudge it back in before looking up its request
+                    index = max(0, bisect.bisect_right(offsets, segment.start + 1e-3) - 1)
+                    offset = offsets[index]
+                    results[index].append({
+                        'id': len(results[index]),
+                        'start': max(0.0, segment.start - offset),
+                        'end': max(0.0, segment.end - offset),
+                        'text': segment.text,
+                        'avg_logprob': segment.avg_logprob,
+                        'no_speech_prob': segment.no_speech_prob,
+                        'compression_ratio': segment.compression_ratio,
+                    })
+            except Exception as e:
+                logger.error(f"Local Whisper batch of {len(jobs)} requests failed: {e}")
+                for _, _, future in jobs:
+                    future.set_exception(e)
+                continue
+            with self._lock:
+                self.batches += 1
+                self.requests += len(jobs)
+            for (_, _, future), result in zip(jobs, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'model': self.model_size,
+                'loaded': self._pid == os.getpid(),
+                'batches': self.batches,
+                'requests': self.requests,
+                'queued': self._queue.qsize() if self._queue is not None else 0,
+            }
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """Transcribes on this machine's CPU through a shared WhisperEngine."""
+
+    name = 'local'
+
+    def __init__(self, engine: WhisperEngine, spool_bytes: int = DEFAULT_SPOOL_BYTES,
+                 vad: Optional[VadSettings] = None):
+        self.engine = engine
+        self.spool_bytes = spool_bytes
+        self.vad = vad
+
+    @property
+    def cache_id(self) -> str:
+        engine = self.engine
+        cache_id = f"local:{engine.model_size}:{engine.compute_type}:{engine.language or 'auto'}"
+        return f"{cache_id}:{self.vad.cache_id}" if self.vad else cache_id
+
+    def load(self):
+        self.engine.load()
+
+    def transcribe(self, filename: str, audio: AudioSource) -> Tuple[str, List[dict]]:
+        pcm = decode_pcm(audio, sample_rate=TARGET_SAMPLE_RATE, spool_bytes=self.spool_bytes)
+        if pcm is None:
+            raise ValueError(f"Could not decode {filename} for local transcription")
+        speech_map = None
+        if self.vad is not None:
+            stripped = strip_silence(pcm, self.vad, self.spool_bytes)
+            if stripped is not None:
+                pcm.close()
+                pcm, speech_map = stripped
+        try:
+            if pcm.num_samples == 0:
+                return '', []
+            clips = plan_windows(pcm, CLIP_SECONDS, 0)
+            samples = read_float32(pcm, TARGET_SAMPLE_RATE)
+        finally:
+            pcm.close()
+        if pcm.sample_rate != TARGET_SAMPLE_RATE:
+            ratio = TARGET_SAMPLE_RATE / pcm.sample_rate
+            clips = [(int(start * ratio), int(end * ratio)) for start, end in clips]
+        segments = self.engine.submit(samples, clips).result()
+        if speech_map is not None:
+            segments = speech_map.remap_segments(segments)
+        text = " ".join(segment['text'].strip() for segment in segments if segment.get('text'))
+        return text, segments
+
+
+def read_float32(pcm: PcmAudio, sample_rate: int, window_seconds: float = CLIP_SECONDS):
+    """The recording as float32 samples in [-1, 1) at `sample_rate`, read one window at a time.
+
+    Only the float32 array Whisper needs and a single window of 16-bit samples are held at once,
+    rather than the whole recording as bytes, int16 and float32 copies.
+    """
+    import numpy as np
+
+    ratio = sample_rate / pcm.sample_rate
+    samples = np.empty(int(pcm.num_samples * ratio), dtype=np.float32)
+    step = max(1, int(window_seconds * pcm.sample_rate))
+    for start in range(0, pcm.num_samples, step):
+        end = min(start + step, pcm.num_samples)
+        if ratio == 1:
+            window = np.frombuffer(pcm.read(start, end), dtype=np.int16)
+            np.multiply(window, 1 / 32768, out=samples[start:end], casting='unsafe')
+            continue
+        # WAV uploads are read at their own rate; linear resampling is plenty for speech. Each output
+        # sample between start and end interpolates within this window and the first sample of the next
+        first = math.ceil(start * ratio)
+        last = math.ceil(end * ratio) if end < pcm.num_samples else len(samples)
+        window = np.frombuffer(pcm.read(start, end + 1), dtype=np.int16).astype(np.float32) / 32768
+        positions = np.arange(first, last) / ratio
+        samples[first:last] = np.interp(positions, np.arange(start, start + len(window)), window)
+    return samples
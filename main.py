@@ -1,40 +1,69 @@
-from flask import Flask, request, jsonify, send_from_directory, render_template, session, flash, redirect, url_for
+from flask import Flask, Response, g, request, jsonify, send_from_directory, render_template, session, flash, redirect, url_for
 from flask_cors import CORS
 import os
 import json
-import instructor
-from groq import Groq
-from pydantic import BaseModel, Field
+import shutil
+import tempfile
+from pydantic import BaseModel
 from typing import List, Optional
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import time
+import functools
+import threading
 import requests
+from contextlib import ExitStack
 import logging
-from google_auth_oauthlib.flow import Flow
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 from urllib.parse import parse_qs, urlparse
 import uuid
-import jwt
+from clients import ProcessLocal, build_async_groq_client, build_groq_client, build_instructor_client, import_heavy_modules
+from credentials import CredentialStore
+from jwks import GOOGLE_JWKS_URL, JwksCache, verify_id_token
+from prompts import ActionItem, ActionItemsList, PromptRegistry
+from admission import AdmissionError, BucketStore, FairQueue, GroqLimiter, UserRateLimiter
+from transcription import GroqBackend
+from local_whisper import LocalWhisperBackend, WhisperEngine
+from vad import VadSettings
+from audio_pipeline import AudioPipeline
+from live import LiveSessionError, LiveSessionManager
+from uploads import SpooledUploadRequest, upload_stream
+from jobs import JobQueue, QueueFull
+from cache import DiskCache, content_key
+from store import FILE_TYPES, ActionItemStore
+from dispatch import SPLIT_STATUSES, AcceptCoalescer, BackendDispatcher, CircuitOpen
+from extraction import estimate_tokens, extract_chunked, iter_chunked
+from compression import ResponseCompressor
+from gating import TranscriptGate
+from routing import ModelRouter
+from metrics import configure_logging, instrument_app, metrics_response, request_id_var, stage
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: 'json' (one object per line, with request ids and stage timings) or 'text'
+configure_logging(os.getenv('LOG_FORMAT', 'json'))
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, template_folder='templates')
+app.request_class = SpooledUploadRequest
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secure-secret-key')
 app.config['SESSION_TYPE'] = 'filesystem'
 app.config['SESSION_PERMANENT'] = False
 app.config['SESSION_USE_SIGNER'] = True
+instrument_app(app)
+# JSON and HTML responses are gzip- or brotli-compressed for clients that accept it
+ResponseCompressor(
+    min_size=int(os.getenv('COMPRESS_MIN_BYTES', 1024)),
+    gzip_level=int(os.getenv('COMPRESS_GZIP_LEVEL', 6)),
+    brotli_quality=int(os.getenv('COMPRESS_BROTLI_QUALITY', 4)),
+).init_app(app)
 BASE_URL = os.getenv('BASE_URL')
 
+CORS_ORIGINS = ["http://localhost:8080", "http://localhost", "https://meet-sync-backend-1.vercel.app"]
 CORS(app, resources={
     r"/*": {
-        "origins": ["http://localhost:8080", "http://localhost", "https://meet-sync-backend-1.vercel.app"],
+        "origins": CORS_ORIGINS,
         "allow_headers": "*",
         "methods": ["GET", "POST", "OPTIONS"],
         "supports_credentials": True
@@ -42,8 +71,68 @@ CORS(app, resources={
 })
 
 app.config['STATIC_FOLDER'] = 'static'
-app.config['UPLOAD_FOLDER'] = 'temp'
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+# Uploads are streamed to the transcription client instead of being saved to disk; file parts are
+# buffered in memory up to UPLOAD_SPOOL_MAX_MEMORY and spill to an anonymous temporary file beyond it
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_MB', 100)) * 1024 * 1024
+app.config['UPLOAD_SPOOL_MAX_MEMORY'] = int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY', 1024 * 1024))
+
+# Long recordings are split into overlapping windows and transcribed in parallel
+app.config['TRANSCRIBE_CHUNK_SECONDS'] = float(os.getenv('TRANSCRIBE_CHUNK_SECONDS', 300))
+app.config['TRANSCRIBE_CHUNK_OVERLAP_SECONDS'] = float(os.getenv('TRANSCRIBE_CHUNK_OVERLAP_SECONDS', 5))
+app.config['TRANSCRIBE_MAX_WORKERS'] = int(os.getenv('TRANSCRIBE_MAX_WORKERS', 4))
+
+# Transcripts longer than EXTRACTION_CHUNK_TOKENS are split into overlapping chunks, extracted in parallel and merged
+app.config['EXTRACTION_CHUNK_TOKENS'] = int(os.getenv('EXTRACTION_CHUNK_TOKENS', 6000))
+app.config['EXTRACTION_CHUNK_OVERLAP_TOKENS'] = int(os.getenv('EXTRACTION_CHUNK_OVERLAP_TOKENS', 300))
+if not 0 <= app.config['EXTRACTION_CHUNK_OVERLAP_TOKENS'] < app.config['EXTRACTION_CHUNK_TOKENS']:
+    raise ValueError("EXTRACTION_CHUNK_OVERLAP_TOKENS must be at least 0 and smaller than EXTRACTION_CHUNK_TOKENS")
+app.config['EXTRACTION_MAX_WORKERS'] = int(os.getenv('EXTRACTION_MAX_WORKERS', 4))
+
+# Content-addressed cache for transcriptions and extracted action items
+if os.getenv('CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+    result_cache = DiskCache(
+        os.getenv('CACHE_FOLDER', 'cache'),
+        max_bytes=int(os.getenv('CACHE_MAX_MB', 512)) * 1024 * 1024,
+        ttl_seconds=int(os.getenv('CACHE_TTL_SECONDS', 7 * 24 * 3600)),
+    )
+else:
+    result_cache = None
+
+# Per-user action items extracted from meetings
+action_item_store = ActionItemStore(os.getenv('ACTION_ITEMS_DB', 'action_items.db'))
+
+# Background jobs for /transcribe-and-extract?async=1
+app.config['JOBS_FOLDER'] = os.getenv('JOBS_FOLDER', 'jobs')
+job_queue = JobQueue(
+    app.config['JOBS_FOLDER'],
+    max_workers=int(os.getenv('JOB_MAX_WORKERS', 4)),
+    max_pending=int(os.getenv('JOB_MAX_PENDING', 32)),
+    ttl_seconds=int(os.getenv('JOB_TTL_SECONDS', 3600)),
+)
+
+# Admission control for the expensive endpoints: a token bucket per user, then a per-process cap on
+# concurrent requests with fair, bounded queueing; Groq calls also stay within the account's limits
+rate_limit_buckets = BucketStore(os.getenv('RATE_LIMIT_DB', 'rate_limits.db'))
+user_rate_limiter = UserRateLimiter(
+    rate_limit_buckets,
+    per_minute=float(os.getenv('RATE_LIMIT_PER_MINUTE', 10)),
+    burst=int(os.getenv('RATE_LIMIT_BURST', 5)),
+)
+admission_queue = FairQueue(
+    slots=int(os.getenv('ADMISSION_SLOTS', 4)),
+    max_wait=float(os.getenv('ADMISSION_MAX_WAIT', 30)),
+    max_waiting=int(os.getenv('ADMISSION_MAX_QUEUE', 64)),
+)
+groq_limiter = GroqLimiter(
+    rate_limit_buckets,
+    max_concurrency=int(os.getenv('GROQ_MAX_CONCURRENCY', 8)),
+    requests_per_minute=float(os.getenv('GROQ_REQUESTS_PER_MINUTE', 0)),
+    tokens_per_minute=float(os.getenv('GROQ_TOKENS_PER_MINUTE', 0)),
+    max_wait=float(os.getenv('GROQ_MAX_WAIT', 60)),
+)
+# Completion tokens charged against GROQ_TOKENS_PER_MINUTE for each extraction call, on top of the prompt
+EXTRACTION_COMPLETION_TOKENS = 1000
 
 # OAuth 2.0 configuration
 SCOPES = [
@@ -52,55 +141,199 @@ SCOPES = [
     'https://www.googleapis.com/auth/userinfo.email'
 ]
 
+# Parsed Google credentials per user, kept server-side and refreshed in the background before they expire
+credential_store = CredentialStore(
+    os.getenv('CREDENTIALS_FOLDER', 'credentials'),
+    SCOPES,
+    refresh_margin=float(os.getenv('CREDENTIALS_REFRESH_MARGIN_SECONDS', 300)),
+    refresh_interval=float(os.getenv('CREDENTIALS_REFRESH_INTERVAL_SECONDS', 60)),
+)
+
 def get_gmail_credentials():
-    creds = None
-    if 'gmail_token' in session:
+    """The signed-in user's Gmail credentials, or None when they have to sign in again."""
+    return gmail_credentials_for(session)
+
+def gmail_credentials_for(user_session):
+    """get_gmail_credentials() for any session mapping, such as the decoded cookie the ASGI app reads."""
+    user_email = user_session.get('user_email')
+    if not user_email:
+        return None
+    if 'gmail_token' in user_session:
+        # Sessions from before the credential store still carry the token; move it server-side once
+        from google.oauth2.credentials import Credentials
         try:
-            creds = Credentials.from_authorized_user_info(eval(session['gmail_token']), SCOPES)
-            logger.debug("Loaded Gmail credentials from session")
-        except Exception as e:
+            credential_store.put(user_email, Credentials.from_authorized_user_info(json.loads(user_session['gmail_token']), SCOPES))
+        except (TypeError, ValueError) as e:
             logger.error(f"Error loading Gmail credentials: {e}")
-            session.pop('gmail_token', None)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                logger.debug("Attempting to refresh Gmail OAuth token")
-                creds.refresh(Request())
-                session['gmail_token'] = creds.to_json()
-                session.modified = True
-                logger.debug("Refreshed Gmail OAuth token successfully")
-            except Exception as e:
-                logger.error(f"Error refreshing Gmail token: {e}")
-                session.pop('gmail_token', None)
-                return None
-        else:
-            logger.debug("No valid Gmail credentials")
-            return None
+        user_session.pop('gmail_token', None)
+    creds = credential_store.get(user_email)
+    if not creds:
+        logger.debug("No valid Gmail credentials")
     return creds
 
-class ActionItem(BaseModel):
-    type: str = Field(..., description="Type of action item: note, email, calendar_event, to_do, or web_search")
-    content: str = Field(..., description="Content of the action item")
-    recipient: Optional[str] = Field(None, description="Recipient for email type")
-    subject: Optional[str] = Field(None, description="Subject for email type")
-    body: Optional[str] = Field(None, description="Body for email type")
-    title: Optional[str] = Field(None, description="Title for note type")
-    tag: Optional[str] = Field(None, description="Tag for note type")
+@functools.lru_cache(maxsize=8)
+def google_client_config(redirect_uri):
+    return {
+        "web": {
+            "client_id": os.getenv('GOOGLE_CLIENT_ID'),
+            "client_secret": os.getenv('GOOGLE_CLIENT_SECRET'),
+            "redirect_uris": [redirect_uri],
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token"
+        }
+    }
+
+# Google's id_token signing keys, cached for their max-age so sign-ins are verified without a network hop
+google_jwks = JwksCache(os.getenv('GOOGLE_JWKS_URL', GOOGLE_JWKS_URL))
 
-class ActionItemsList(BaseModel):
-    items: List[ActionItem] = Field(..., description="List of actionable items")
+def google_oauth_flow():
+    """A Flow for one sign-in; flows carry per-login state, so only their client config is shared."""
+    from google_auth_oauthlib.flow import Flow
+    redirect_uri = url_for('oauth2callback', _external=True, _scheme='https')
+    flow = Flow.from_client_config(google_client_config(redirect_uri), SCOPES)
+    flow.redirect_uri = redirect_uri
+    return flow
+
+EXTRACTION_MODEL = "llama-3.3-70b-versatile"
+# Short transcripts try the small model first and are escalated to EXTRACTION_MODEL when its output fails checks
+model_router = ModelRouter(
+    EXTRACTION_MODEL,
+    small_model=os.getenv('EXTRACTION_SMALL_MODEL', 'llama-3.1-8b-instant') or None,
+    small_max_tokens=int(os.getenv('EXTRACTION_SMALL_MAX_TOKENS', 1500)),
+    large_retries=int(os.getenv('EXTRACTION_MAX_RETRIES', 3)),
+)
+# Transcripts without any action cue get no items without an LLM call; the others get email and date hints
+transcript_gate = TranscriptGate(
+    enabled=os.getenv('EXTRACTION_GATE', '1') == '1',
+    min_cues=int(os.getenv('EXTRACTION_GATE_MIN_CUES', 2)),
+    hints=os.getenv('EXTRACTION_HINTS', '1') == '1',
+)
+# Prompts are versioned in prompts.py; the version is part of the cache key, so changing it never reuses old extractions
+prompt_registry = PromptRegistry(
+    os.getenv('EXTRACTION_PROMPT_VERSION', '1'),
+    candidate=os.getenv('EXTRACTION_PROMPT_CANDIDATE') or None,
+    candidate_share=float(os.getenv('EXTRACTION_PROMPT_CANDIDATE_SHARE', 0)),
+)
 
 class TranscriptionResponse(BaseModel):
     transcription: str
+    segments: Optional[List[dict]] = None
     error: Optional[str] = None
 
+# Groq clients are built on first use in each worker process; see clients.py
 api_key = os.getenv("GROQ_API")
 if not api_key:
     print("Warning: GROQ_API environment variable not set. Transcription and action item extraction will not work.")
     groq_client = None
+    groq_client_with_instructor = None
+    async_groq_client = None
+    async_groq_client_with_instructor = None
 else:
-    groq_client = Groq(api_key=api_key)
-    groq_client_with_instructor = instructor.from_groq(groq_client, mode=instructor.Mode.JSON)
+    groq_client = ProcessLocal(lambda: build_groq_client(api_key), 'Groq client')
+    groq_client_with_instructor = ProcessLocal(lambda: build_instructor_client(groq_client.get()), 'instructor client')
+    # Used only by the ASGI app (asgi.py)
+    async_groq_client = ProcessLocal(lambda: build_async_groq_client(api_key), 'async Groq client')
+    async_groq_client_with_instructor = ProcessLocal(lambda: build_instructor_client(async_groq_client.get()),
+                                                     'async instructor client')
+
+# Transcription runs on Groq or on a local CPU Whisper model; the fallback takes over when the primary fails
+app.config['TRANSCRIBE_BACKEND'] = os.getenv('TRANSCRIBE_BACKEND', 'groq').lower()
+app.config['TRANSCRIBE_FALLBACK_BACKEND'] = os.getenv('TRANSCRIBE_FALLBACK_BACKEND', '').lower()
+whisper_engine = WhisperEngine(
+    model_size=os.getenv('LOCAL_WHISPER_MODEL', 'small'),
+    cpu_threads=int(os.getenv('LOCAL_WHISPER_THREADS', 4)),
+    compute_type=os.getenv('LOCAL_WHISPER_COMPUTE_TYPE', 'int8'),
+    batch_size=int(os.getenv('LOCAL_WHISPER_BATCH_SIZE', 8)),
+    max_wait=float(os.getenv('LOCAL_WHISPER_MAX_WAIT', 0.1)),
+    language=os.getenv('LOCAL_WHISPER_LANGUAGE', 'en') or None,
+)
+
+# Long pauses are cut out before transcription; segment times still refer to the original recording
+if os.getenv('VAD_ENABLED', 'true').lower() in ('1', 'true', 'yes'):
+    vad_settings = VadSettings(
+        margin_db=float(os.getenv('VAD_MARGIN_DB', 12)),
+        min_silence_seconds=float(os.getenv('VAD_MIN_SILENCE_SECONDS', 0.6)),
+        padding_seconds=float(os.getenv('VAD_PADDING_SECONDS', 0.2)),
+    )
+else:
+    vad_settings = None
+
+# Uploads are downmixed to 16 kHz mono and re-encoded compactly in worker processes before going to Groq
+audio_pipeline = AudioPipeline(
+    window_seconds=app.config['TRANSCRIBE_CHUNK_SECONDS'],
+    overlap_seconds=app.config['TRANSCRIBE_CHUNK_OVERLAP_SECONDS'],
+    vad=vad_settings,
+    codec=os.getenv('AUDIO_CODEC', 'opus').lower(),
+    bitrate=os.getenv('AUDIO_BITRATE', '24k'),
+    spool_bytes=app.config['UPLOAD_SPOOL_MAX_MEMORY'],
+    max_workers=int(os.getenv('AUDIO_PROCESS_WORKERS', 2)),
+)
+
+def build_transcription_backend(name):
+    if name == 'groq':
+        if not groq_client:
+            return None
+        return GroqBackend(groq_client.get, audio_pipeline, max_workers=app.config['TRANSCRIBE_MAX_WORKERS'],
+                           limiter=groq_limiter, get_async_client=async_groq_client.get)
+    if name == 'local':
+        return LocalWhisperBackend(whisper_engine, spool_bytes=app.config['UPLOAD_SPOOL_MAX_MEMORY'], vad=vad_settings)
+    if name:
+        logger.error(f"Unknown transcription backend: {name}")
+    return None
+
+transcription_backend = build_transcription_backend(app.config['TRANSCRIBE_BACKEND'])
+fallback_transcription_backend = build_transcription_backend(app.config['TRANSCRIBE_FALLBACK_BACKEND'])
+
+# Set by create_app(preload=True) once the client libraries are loaded in the gunicorn master
+client_libraries_preloaded = False
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+def init_worker():
+    """Per-process startup, run once in every worker: from gunicorn's post_fork hook or before its first request.
+
+    Threads, model weights and HTTP clients are started here rather than at import, so none of them
+    is created in a preloading master and then broken by the fork.
+    """
+    global _worker_pid
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+    google_jwks.prefetch()
+    audio_pipeline.start()
+    # Building the Groq clients is cheap once their libraries are loaded; otherwise it waits for first use
+    if client_libraries_preloaded and groq_client:
+        groq_client_with_instructor.get()
+    # Load the local model when each worker process starts rather than on its first request
+    if os.getenv('LOCAL_WHISPER_PRELOAD', 'true').lower() in ('1', 'true', 'yes'):
+        for backend in (transcription_backend, fallback_transcription_backend):
+            if backend:
+                try:
+                    backend.load()
+                except Exception as e:
+                    logger.error(f"Failed to load {backend.name} transcription backend: {e}")
+
+@app.before_request
+def ensure_worker_started():
+    if _worker_pid != os.getpid():
+        init_worker()
+
+def create_app(preload=False):
+    """The WSGI app, for `gunicorn 'main:create_app()'`.
+
+    Importing main builds only cheap, fork-safe state. With preload=True, as in gunicorn.conf.py, the
+    slow client libraries are imported here once in the gunicorn master and shared copy-on-write by
+    the workers, which run init_worker() after the fork. Otherwise each worker calls init_worker()
+    now and imports the client libraries on first use.
+    """
+    global client_libraries_preloaded
+    if preload:
+        logger.info(f"Preloaded client libraries in {import_heavy_modules():.2f} seconds")
+        client_libraries_preloaded = True
+    else:
+        init_worker()
+    return app
 
 BACKEND_URLS = {
     'email': 'https://flask-email-app-6zfp.onrender.com/backend_service',
@@ -109,6 +342,21 @@ BACKEND_URLS = {
     'to_do': 'https://meet-sync-backend.vercel.app/api/todo/addtodo',
     'calendar_event': 'https://calendar-backend.com/accept-event'  # Dummy link
 }
+# BACKEND_URL_<TYPE> points a backend elsewhere, e.g. at the benchmark stubs
+BACKEND_URLS = {backend_type: os.getenv(f'BACKEND_URL_{backend_type.upper()}', url) for backend_type, url in BACKEND_URLS.items()}
+
+# Keep-alive sessions, timeouts, retries and circuit breakers for the backends above
+backend_dispatcher = BackendDispatcher(
+    BACKEND_URLS,
+    connect_timeout=float(os.getenv('BACKEND_CONNECT_TIMEOUT', 3.05)),
+    read_timeout=float(os.getenv('BACKEND_READ_TIMEOUT', 30)),
+    max_retries=int(os.getenv('BACKEND_MAX_RETRIES', 3)),
+    backoff_base=float(os.getenv('BACKEND_BACKOFF_SECONDS', 0.5)),
+    backoff_max=float(os.getenv('BACKEND_BACKOFF_MAX_SECONDS', 8)),
+    failure_threshold=int(os.getenv('BACKEND_BREAKER_THRESHOLD', 5)),
+    reset_timeout=float(os.getenv('BACKEND_BREAKER_RESET_SECONDS', 30)),
+    max_workers=int(os.getenv('BACKEND_MAX_WORKERS', 8)),
+)
 
 FILE_TYPE_TO_BACKEND_TYPE = {
     'emails': 'email',
@@ -119,7 +367,7 @@ FILE_TYPE_TO_BACKEND_TYPE = {
 }
 
 def convert_action_items(action_items):
-    """Convert action items into separate JSON files for emails, web searches, notes, to-dos, and calendar events."""
+    """Group action items by file type (emails, web searches, notes, to-dos, and calendar events) in the shape the frontend edits."""
     emails = []
     web_searches = []
     notes = []
@@ -156,74 +404,252 @@ def convert_action_items(action_items):
             })
         else:
             print(f"[WARN] Unknown action type: {item_type}")
-    try:
-        if emails:
-            with open("emails.json", "w", encoding="utf-8") as f:
-                json.dump(emails, f, indent=2)
-        if web_searches:
-            with open("web_search.json", "w", encoding="utf-8") as f:
-                json.dump(web_searches, f, indent=2)
-        if notes:
-            with open("notes.json", "w", encoding="utf-8") as f:
-                json.dump(notes, f, indent=2)
-        if todos:
-            with open("todos.json", "w", encoding="utf-8") as f:
-                json.dump(todos, f, indent=2)
-        if calendar_events:
-            with open("calendar_events.json", "w", encoding="utf-8") as f:
-                json.dump(calendar_events, f, indent=2)
-    except Exception as e:
-        print(f"[ERROR] Failed to write JSON files: {str(e)}")
+    return {
+        'emails': emails,
+        'web_searches': web_searches,
+        'notes': notes,
+        'todos': todos,
+        'calendar_events': calendar_events
+    }
 
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     return send_from_directory(app.config['STATIC_FOLDER'], filename)
 
+def rate_limit_key():
+    """Signed-in users are limited by email, everyone else by address."""
+    return session.get('user_email') or f"ip:{request.remote_addr}"
+
+def admission_error_headers(e):
+    return {'Retry-After': str(e.retry_after)}
+
+def validate_audio_upload():
+    """Return (file, None) for a valid audio upload, or (None, error response)."""
+    if not transcription_backend:
+        return None, (jsonify(TranscriptionResponse(
+            transcription="",
+            error="No transcription backend available; set GROQ_API or TRANSCRIBE_BACKEND=local"
+        ).model_dump()), 500)
+        
+    # Touching request.files parses (and spools) the whole upload
+    with stage('upload'):
+        has_file = 'file' in request.files
+    if not has_file:
+        return None, (jsonify(TranscriptionResponse(
+            transcription="",
+            error="No file provided"
+        ).model_dump()), 400)
+        
+    file = request.files['file']
+    
+    if not file.content_type.startswith('audio/'):
+        return None, (jsonify(TranscriptionResponse(
+            transcription="",
+            error="Invalid file type. Please upload an audio file."
+        ).model_dump()), 400)
+    return file, None
+
+def run_transcription(filename, audio_stream):
+    """Transcribe with the configured backend, retrying on the fallback; returns (text, segments, backend used)."""
+    backend = transcription_backend
+    start_time = time.time()
+    with stage('transcription'):
+        try:
+            text, segments = backend.transcribe(filename, audio_stream)
+        except Exception as e:
+            if not fallback_transcription_backend:
+                raise
+            logger.warning(f"{backend.name} transcription failed ({e}); falling back to {fallback_transcription_backend.name}")
+            backend = fallback_transcription_backend
+            text, segments = backend.transcribe(filename, audio_stream)
+    transcription_time = time.time() - start_time
+    logger.info(f"{backend.name} transcription took {transcription_time:.2f} seconds for file {filename}")
+    return text, segments, backend
+
+def transcribe_stream(filename, audio_stream):
+    """Transcribe an audio stream with the configured backend, through the result cache; returns (text, segments)."""
+    cache_key = content_key('transcription', transcription_backend.cache_id, audio_stream)
+    cached = result_cache.get(cache_key) if result_cache else None
+    if cached is not None:
+        logger.info(f"Transcription cache hit for file {filename}")
+        return cached['text'], cached['segments']
+    text, segments, backend = run_transcription(filename, audio_stream)
+    if result_cache:
+        if backend is not transcription_backend:
+            cache_key = content_key('transcription', backend.cache_id, audio_stream)
+        result_cache.set(cache_key, {'text': text, 'segments': segments})
+    return text, segments
+
+def current_user():
+    """Key for the signed-in user's action items."""
+    return session.get('user_email', 'anonymous')
+
+def extraction_cache_key(transcript):
+    return content_key(
+        'extraction', model_router.cache_id, prompt_registry.choose(transcript).version, transcript_gate.cache_id,
+        str(app.config['EXTRACTION_CHUNK_TOKENS']), str(app.config['EXTRACTION_CHUNK_OVERLAP_TOKENS']),
+        transcript,
+    )
+
+def is_long_transcript(transcript):
+    return estimate_tokens(transcript) > app.config['EXTRACTION_CHUNK_TOKENS']
+
+def extraction_tokens(transcript, prompt):
+    """Estimated tokens of one extraction call, charged against the Groq tokens-per-minute budget."""
+    return prompt.prompt_tokens(ActionItemsList) + estimate_tokens(transcript) + EXTRACTION_COMPLETION_TOKENS
+
+def extract_chunk(transcript, prompt=None):
+    """LLM extraction on the tiers model_router picks for the transcript; returns the action items as dicts."""
+    prompt = prompt or prompt_registry.choose(transcript)
+    actionable, hints = transcript_gate.check(transcript)
+    if not actionable:
+        return []
+    return model_router.run(transcript, lambda tier: extract_with_model(transcript, prompt, tier, hints))
+
+def extract_with_model(transcript, prompt, tier, hints=None):
+    """One extraction call on one model tier."""
+    with stage('extraction'), groq_limiter.call(extraction_tokens(transcript, prompt)):
+        start = time.perf_counter()
+        try:
+            action_items, completion = groq_client_with_instructor.get().chat.completions.create_with_completion(
+                model=tier.model,
+                response_model=ActionItemsList,
+                messages=prompt.messages(transcript, hints),
+                temperature=0.5,
+                max_retries=tier.max_retries,
+            )
+        except Exception as e:
+            record_failed_extraction(prompt, tier, e, time.perf_counter() - start)
+            raise
+    return extraction_output(transcript, prompt, action_items, completion, time.perf_counter() - start, tier.model)
+
+def record_failed_extraction(prompt, tier, error, seconds):
+    """Charge the tokens of attempts that never produced valid output, so escalations show up in token spend."""
+    usage = getattr(error, 'total_usage', None)
+    if usage is not None and getattr(usage, 'prompt_tokens', None) is not None:
+        prompt_registry.record(prompt, tier.model, usage.prompt_tokens, usage.completion_tokens, seconds)
+
+def extraction_output(transcript, prompt, action_items, completion, seconds, model=EXTRACTION_MODEL):
+    """Record an extraction call's token usage (estimated when the API reports none) and return its items as dicts."""
+    usage = getattr(completion, 'usage', None)
+    output_data = action_items.model_dump()["items"]
+    if usage is not None:
+        prompt_registry.record(prompt, model, usage.prompt_tokens, usage.completion_tokens, seconds)
+    else:
+        prompt_registry.record(prompt, model, extraction_tokens(transcript, prompt) - EXTRACTION_COMPLETION_TOKENS,
+                               estimate_tokens(json.dumps(output_data)), seconds, estimated=True)
+    return output_data
+
+def stream_chunk(transcript, prompt=None):
+    """extract_chunk() as a stream of action items, yielded as the LLM completes each one.
+
+    Streams always use the large model: items reach the client before the output could be checked
+    as a whole, so there is nothing to escalate. Streamed responses carry no usage, so their token
+    counts are estimated.
+    """
+    prompt = prompt or prompt_registry.choose(transcript)
+    actionable, hints = transcript_gate.check(transcript)
+    if not actionable:
+        return
+    with stage('extraction'), groq_limiter.call(extraction_tokens(transcript, prompt)):
+        start = time.perf_counter()
+        completion_tokens = 0
+        for action_item in groq_client_with_instructor.get().chat.completions.create_iterable(
+            model=EXTRACTION_MODEL,
+            response_model=ActionItem,
+            messages=prompt.messages(transcript, hints),
+            temperature=0.5,
+        ):
+            action_item = action_item.model_dump()
+            completion_tokens += estimate_tokens(json.dumps(action_item))
+            yield action_item
+    prompt_registry.record(prompt, EXTRACTION_MODEL, extraction_tokens(transcript, prompt) - EXTRACTION_COMPLETION_TOKENS,
+                           completion_tokens, time.perf_counter() - start, estimated=True)
+
+def chunked_extraction_args(transcript):
+    # Every chunk of a transcript uses the prompt chosen for the whole of it
+    return (
+        functools.partial(extract_chunk, prompt=prompt_registry.choose(transcript)),
+        transcript,
+        app.config['EXTRACTION_CHUNK_TOKENS'],
+        app.config['EXTRACTION_CHUNK_OVERLAP_TOKENS'],
+        app.config['EXTRACTION_MAX_WORKERS'],
+    )
+
+def extract_items(transcript, user_email):
+    """Extract action items from a transcript with the LLM, store them as a new meeting for the user, and return them as dicts."""
+    cache_key = extraction_cache_key(transcript)
+    output_data = result_cache.get(cache_key) if result_cache else None
+    if output_data is None:
+        if is_long_transcript(transcript):
+            output_data = extract_chunked(*chunked_extraction_args(transcript))
+        else:
+            output_data = extract_chunk(transcript)
+        if result_cache:
+            result_cache.set(cache_key, output_data)
+    else:
+        logger.info("Extraction cache hit")
+    action_item_store.add_meeting(user_email, convert_action_items(output_data))
+    return output_data
+
+def stream_extracted_items(transcript, user_email):
+    """Extract action items one at a time, storing each as soon as it is complete and valid.
+
+    Yields (file_type, index, item_id, item) for every stored item, where item has the same shape as
+    in /get-json-files; the finished list is cached like extract_items() does. Long transcripts are
+    extracted chunk by chunk and stream each chunk's new items as it finishes.
+    """
+    cache_key = extraction_cache_key(transcript)
+    cached = result_cache.get(cache_key) if result_cache else None
+    if cached is not None:
+        logger.info("Extraction cache hit")
+        action_items = iter(cached)
+    elif is_long_transcript(transcript):
+        action_items = iter_chunked(*chunked_extraction_args(transcript))
+    else:
+        action_items = stream_chunk(transcript)
+    meeting_id = action_item_store.create_meeting(user_email)
+    positions = {}
+    output_data = []
+    for action_item in action_items:
+        output_data.append(action_item)
+        for file_type, converted in convert_action_items([action_item]).items():
+            for item in converted:
+                index = positions.get(file_type, 0)
+                positions[file_type] = index + 1
+                item_id = action_item_store.add_item(user_email, meeting_id, file_type, index, item)
+                yield meeting_id, file_type, index, item_id, item
+    if cached is None and result_cache:
+        result_cache.set(cache_key, output_data)
+
 @app.route('/transcribe', methods=['POST'])
 def transcribe_audio():
     try:
-        if not groq_client:
-            return jsonify(TranscriptionResponse(
-                transcription="",
-                error="GROQ_API environment variable not set"
-            ).model_dump()), 500
-            
-        if 'file' not in request.files:
-            return jsonify(TranscriptionResponse(
-                transcription="",
-                error="No file provided"
-            ).model_dump()), 400
-            
-        file = request.files['file']
-        
-        if not file.content_type.startswith('audio/'):
-            return jsonify(TranscriptionResponse(
-                transcription="",
-                error="Invalid file type. Please upload an audio file."
-            ).model_dump()), 400
+        user_rate_limiter.check(rate_limit_key())
+        file, error_response = validate_audio_upload()
+        if error_response:
+            return error_response
             
-        filename = secure_filename(file.filename)
-        temp_file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{filename}")
-        file.save(temp_file_path)
-        
-        start_time = time.time()
+        filename = secure_filename(file.filename) or 'recording.webm'
         
         # Using Groq Whisper model for transcription
-        with open(temp_file_path, "rb") as audio_file:
-            transcription = groq_client.audio.transcriptions.create(
-                file=(temp_file_path, audio_file.read()),
-                model="whisper-large-v3",
-                response_format="verbose_json",
-            )
-        
-        transcription_time = time.time() - start_time
-        print(f"Groq Transcription took {transcription_time:.2f} seconds for file {filename}")
-        
-        os.remove(temp_file_path)
+        with admission_queue.slot(rate_limit_key()), upload_stream(file) as audio_stream:
+            text, segments = transcribe_stream(filename, audio_stream)
         
         return jsonify(TranscriptionResponse(
-            transcription=transcription.text
+            transcription=text,
+            segments=segments
         ).model_dump())
+    except AdmissionError as e:
+        return jsonify(TranscriptionResponse(
+            transcription="",
+            error=str(e)
+        ).model_dump()), e.status_code, admission_error_headers(e)
+    except RequestEntityTooLarge:
+        return jsonify(TranscriptionResponse(
+            transcription="",
+            error=f"File too large. Maximum upload size is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB."
+        ).model_dump()), 413
     except Exception as e:
         return jsonify(TranscriptionResponse(
             transcription="",
@@ -241,120 +667,347 @@ def extract_action_items():
         transcript = data.get("transcript")
         if not transcript:
             return jsonify({"error": "Transcript is required"}), 400
-        action_items = groq_client_with_instructor.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            response_model=ActionItemsList,
-            messages=[
-                {
-                    "role": "system",
-                    "content": '''
-                        You are a smart meeting assistant. Given the transcript below, extract and classify actionable items by type.
-                        Supported action item types:
-                        - note
-                        - email
-                        - calendar_event
-                        - to_do
-                        - web_search
-                        Use the following JSON format for each action item:
-                        {
-                        "type": "<type>",
-                        "content": "<main description of the action item>",
-                        # Required for type 'email'
-                        "recipient": "<recipient email>",
-                        "subject": "<email subject>",
-                        "body": "<full email body>",
-                        # Required for type 'note'
-                        "title": "<short title>",
-                        "tag": "<tag or category for the note>",
-                        # Recommended for type 'to_do'
-                        "title": "<short to-do title>"
-                        }
-                        Notes:
-                        - For action items of type **note**, include `title`, `tag`, and `content` (used as the note description).
-                        - For type **email**, always include `recipient`, `subject`, and `body`.
-                        - For type **to_do**, include a short `title` and a longer `content` (used as the task description).
-                        - For type **calendar_event**, only include `type` and `content`.
-                        - For type **to_do**, include a short `title` and a longer `content` (used as the task description). The `title` is required.
-                        - For type **web_search** only include `content`.
-                        - Respond with a JSON array of action items only.
-                        '''
-                },
-                {
-                    "role": "user",
-                    "content": f"Transcript:\n{transcript}"
-                }
-            ],
-            temperature=0.5,
-        )
-        output_data = action_items.model_dump()["items"]
-        try:
-            with open("action_items.json", "w", encoding="utf-8") as f:
-                json.dump(output_data, f, indent=2)
-        except Exception as e:
-            print(f"Failed to save action_items.json: {e}")
-        convert_action_items(output_data)
+        user_rate_limiter.check(rate_limit_key())
+        with admission_queue.slot(rate_limit_key()):
+            output_data = extract_items(transcript, current_user())
         return jsonify({
             "message": "Action items processed and converted successfully",
             "items": output_data
         }), 200
+    except AdmissionError as e:
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), e.status_code, admission_error_headers(e)
     except Exception as e:
         return jsonify({"error": f"Error processing transcript: {str(e)}"}), 500
 
+@app.route('/extract-action-items/stream', methods=['POST'])
+def extract_action_items_stream():
+    """Like /extract-action-items, but pushes each action item over server-sent events as soon as it is extracted."""
+    if not groq_client:
+        return jsonify({"error": "GROQ_API environment variable not set"}), 500
+    if not request.is_json:
+        return jsonify({"error": "Request must contain JSON data"}), 400
+    transcript = request.get_json().get("transcript")
+    if not transcript:
+        return jsonify({"error": "Transcript is required"}), 400
+    user_email = current_user()
+    # The admission slot is held until the stream has been sent
+    admission = ExitStack()
+    try:
+        user_rate_limiter.check(rate_limit_key())
+        admission.enter_context(admission_queue.slot(rate_limit_key()))
+    except AdmissionError as e:
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), e.status_code, admission_error_headers(e)
+
+    def events():
+        meeting_id, count = None, 0
+        try:
+            for meeting_id, file_type, index, item_id, item in stream_extracted_items(transcript, user_email):
+                count += 1
+                payload = {'meeting_id': meeting_id, 'file_type': file_type, 'index': index, 'item': {**item, 'id': item_id}}
+                yield f"event: item\ndata: {json.dumps(payload)}\n\n"
+            yield f"event: done\ndata: {json.dumps({'meeting_id': meeting_id, 'count': count})}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming action items: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': f'Error processing transcript: {str(e)}'})}\n\n"
+
+    response = Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(admission.close)
+    return response
+
+def store_live_items(user_email, meeting_id, positions, action_items):
+    """Store action items extracted during a live session; returns (meeting_id, item payloads)."""
+    if meeting_id is None:
+        meeting_id = action_item_store.create_meeting(user_email)
+    payloads = []
+    for action_item in action_items:
+        for file_type, converted in convert_action_items([action_item]).items():
+            for item in converted:
+                index = positions.get(file_type, 0)
+                positions[file_type] = index + 1
+                item_id = action_item_store.add_item(user_email, meeting_id, file_type, index, item)
+                payloads.append({'meeting_id': meeting_id, 'file_type': file_type, 'index': index,
+                                 'item': {**item, 'id': item_id}, 'action_item': action_item})
+    return meeting_id, payloads
+
+# Live transcription while a meeting is recorded; sessions are kept on disk so any worker can take the next slice
+app.config['LIVE_FOLDER'] = os.getenv('LIVE_FOLDER', 'live')
+live_sessions = LiveSessionManager(
+    app.config['LIVE_FOLDER'],
+    transcribe=lambda filename, audio: run_transcription(filename, audio)[:2],
+    extract=extract_chunk if groq_client else None,
+    store=store_live_items,
+    window_seconds=float(os.getenv('LIVE_WINDOW_SECONDS', 30)),
+    partials=os.getenv('LIVE_PARTIALS', 'false').lower() in ('1', 'true', 'yes'),
+    min_partial_seconds=float(os.getenv('LIVE_MIN_PARTIAL_SECONDS', 2)),
+    extract_min_tokens=int(os.getenv('LIVE_EXTRACT_MIN_TOKENS', 400)),
+    ttl_seconds=int(os.getenv('LIVE_TTL_SECONDS', 6 * 3600)),
+)
+
+# A slice carries a few seconds of audio, so it is charged as a fraction of an upload against the user's rate limit
+LIVE_CHUNK_RATE_COST = float(os.getenv('LIVE_CHUNK_RATE_COST', 0.25))
+
+def live_session_error(e):
+    return jsonify({"error": str(e), **e.extra}), e.status_code
+
+@app.route('/live-sessions', methods=['POST'])
+def create_live_session():
+    """Start transcribing a meeting while it is being recorded."""
+    if not transcription_backend:
+        return jsonify({"error": "No transcription backend available; set GROQ_API or TRANSCRIBE_BACKEND=local"}), 500
+    try:
+        user_rate_limiter.check(rate_limit_key())
+        state = live_sessions.create(current_user())
+        return jsonify({"session_id": state['id'], "window_seconds": live_sessions.window_seconds}), 201
+    except AdmissionError as e:
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), e.status_code, admission_error_headers(e)
+    except Exception as e:
+        return jsonify({"error": f"Error starting live session: {str(e)}"}), 500
+
+@app.route('/live-sessions/<session_id>', methods=['GET'])
+def get_live_session(session_id):
+    try:
+        return jsonify(live_sessions.summary(session_id, current_user())), 200
+    except LiveSessionError as e:
+        return live_session_error(e)
+
+@app.route('/live-sessions/<session_id>/chunks', methods=['POST'])
+def add_live_chunk(session_id):
+    """Append the next self-contained audio slice ('file', with its 'seq') and return new transcript segments."""
+    try:
+        with stage('upload'):
+            has_file = 'file' in request.files
+        if not has_file:
+            return jsonify({"error": "No file provided"}), 400
+        try:
+            seq = int(request.form.get('seq', ''))
+        except ValueError:
+            return jsonify({"error": "seq is required"}), 400
+        user_rate_limiter.check(rate_limit_key(), cost=LIVE_CHUNK_RATE_COST)
+        with admission_queue.slot(rate_limit_key()), upload_stream(request.files['file']) as audio_stream:
+            result = live_sessions.add_chunk(session_id, current_user(), seq, audio_stream)
+        return jsonify(result), 200
+    except LiveSessionError as e:
+        return live_session_error(e)
+    except AdmissionError as e:
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), e.status_code, admission_error_headers(e)
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"File too large. Maximum upload size is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB."}), 413
+    except Exception as e:
+        return jsonify({"error": f"Error processing audio slice: {str(e)}"}), 500
+
+@app.route('/live-sessions/<session_id>/finish', methods=['POST'])
+def finish_live_session(session_id):
+    """Transcribe and extract the rest of the recording; returns the full transcript and action items."""
+    try:
+        user_rate_limiter.check(rate_limit_key())
+        with admission_queue.slot(rate_limit_key()):
+            return jsonify(live_sessions.finish(session_id, current_user())), 200
+    except LiveSessionError as e:
+        return live_session_error(e)
+    except AdmissionError as e:
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), e.status_code, admission_error_headers(e)
+    except Exception as e:
+        return jsonify({"error": f"Error finishing live session: {str(e)}"}), 500
+
+def run_transcribe_and_extract(filename, audio_stream, user_email, request_id, set_status):
+    """Background job body for /transcribe-and-extract?async=1."""
+    # Log lines from the job carry the id of the request that queued it
+    request_id_token = request_id_var.set(request_id)
+    try:
+        try:
+            set_status('transcribing')
+            transcript, _ = transcribe_stream(filename, audio_stream)
+        finally:
+            audio_stream.close()
+        if not transcript:
+            return {"transcription": "", "items": []}
+        set_status('extracting')
+        return {"transcription": transcript, "items": extract_items(transcript, user_email)}
+    finally:
+        request_id_var.reset(request_id_token)
+
 @app.route('/transcribe-and-extract', methods=['POST'])
 def transcribe_and_extract():
     try:
-        transcription_response = transcribe_audio()
-        
-        if isinstance(transcription_response, tuple) and transcription_response[1] != 200:
-            return transcription_response
-        
-        if isinstance(transcription_response, tuple):
-            transcription_data = json.loads(transcription_response[0].data)
-        else:
-            transcription_data = json.loads(transcription_response.data)
-            
-        transcript = transcription_data.get("transcription", "")
-        
-        request.data = json.dumps({"transcript": transcript}).encode('utf-8')
-        request.is_json = True
-        
-        return extract_action_items()
-    
+        user_rate_limiter.check(rate_limit_key())
+        file, error_response = validate_audio_upload()
+        if error_response:
+            return error_response
+        if not groq_client:
+            return jsonify({"error": "GROQ_API environment variable not set"}), 500
+        filename = secure_filename(file.filename) or 'recording.webm'
+
+        if request.args.get('async') in ('1', 'true'):
+            # The upload is closed when this request ends, so hand the job its own spooled copy
+            job_stream = tempfile.SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_MAX_MEMORY'])
+            try:
+                with upload_stream(file) as audio_stream:
+                    shutil.copyfileobj(audio_stream, job_stream)
+            except BaseException:
+                # Client gone or disk full: the spool's temp file must not outlive the request
+                job_stream.close()
+                raise
+            user_email = current_user()
+            request_id = g.request_id
+            try:
+                job = job_queue.submit(lambda set_status: run_transcribe_and_extract(
+                    filename, job_stream, user_email, request_id, set_status), user_email)
+            except QueueFull as e:
+                job_stream.close()
+                return jsonify({"error": str(e)}), 503, {'Retry-After': '30'}
+            status_url = url_for('get_job', job_id=job.id)
+            return jsonify({"job_id": job.id, "status": job.status, "status_url": status_url}), 202, {'Location': status_url}
+
+        with admission_queue.slot(rate_limit_key()):
+            with upload_stream(file) as audio_stream:
+                transcript, _ = transcribe_stream(filename, audio_stream)
+            output_data = extract_items(transcript, current_user()) if transcript else []
+        return jsonify({
+            "message": "Action items processed and converted successfully",
+            "items": output_data
+        }), 200
+    except AdmissionError as e:
+        return jsonify({"error": str(e), "retry_after": e.retry_after}), e.status_code, admission_error_headers(e)
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"File too large. Maximum upload size is {app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)} MB."}), 413
     except Exception as e:
         return jsonify({"error": f"Error in combined processing: {str(e)}"}), 500
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    if not result_cache:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, **result_cache.stats()}), 200
+
+@app.route('/backend-stats', methods=['GET'])
+def backend_stats():
+    return jsonify({
+        **backend_dispatcher.stats(),
+        'accept_queue': accept_coalescer.stats(),
+        'credentials': credential_store.stats(),
+        'extraction_prompts': prompt_registry.stats(),
+        'extraction_routing': model_router.stats(),
+        'extraction_gate': transcript_gate.stats(),
+        'jwks': google_jwks.stats(),
+        'admission': {
+            'rate_limit': user_rate_limiter.stats(),
+            'queue': admission_queue.stats(),
+            'groq': groq_limiter.stats(),
+        },
+        'transcription': {
+            'backend': transcription_backend.name if transcription_backend else None,
+            'fallback': fallback_transcription_backend.name if fallback_transcription_backend else None,
+            'local_engine': whisper_engine.stats(),
+            'audio_pipeline': audio_pipeline.stats(),
+        },
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    body, content_type = metrics_response()
+    return Response(body, content_type=content_type)
+
+def current_user_job(job_id):
+    """The job, if it exists and was submitted by the signed-in user; others' jobs look like missing ones."""
+    job = job_queue.get(job_id)
+    if job is None or job.user_email != current_user():
+        return None
+    return job
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = current_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    job = current_user_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def stream(job):
+        # Server-sent events: one message per status change, ending with the terminal state
+        yield f"data: {json.dumps(job.to_dict())}\n\n"
+        while not job.done:
+            updated = job_queue.wait(job.id, since=job.updated_at, timeout=15)
+            if not updated:
+                return
+            if updated.updated_at == job.updated_at:
+                yield ": keep-alive\n\n"
+                continue
+            job = updated
+            yield f"data: {json.dumps(job.to_dict())}\n\n"
+
+    return Response(stream(job), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
     
 @app.route('/get-json-files', methods=['GET'])
 def get_json_files():
+    """The latest (or `meeting_id`) meeting's action items, with `version` for later `?since=` requests.
+
+    Answers 304 when the client's If-None-Match still matches, without reading any items. With
+    `?since=<version>` only the items added or edited after that version and the ids of the items
+    removed since are returned, unless the meeting itself is newer, in which case it is sent in full.
+    """
     try:
-        json_files = {
-            'emails': [],
-            'web_searches': [],
-            'notes': [],
-            'todos': [],
-            'calendar_events': []
-        }
-        if os.path.exists('emails.json'):
-            with open('emails.json', 'r', encoding='utf-8') as f:
-                json_files['emails'] = json.load(f)
-        
-        if os.path.exists('web_search.json'):
-            with open('web_search.json', 'r', encoding='utf-8') as f:
-                json_files['web_searches'] = json.load(f)
-        
-        if os.path.exists('notes.json'):
-            with open('notes.json', 'r', encoding='utf-8') as f:
-                json_files['notes'] = json.load(f)
-        
-        if os.path.exists('todos.json'):
-            with open('todos.json', 'r', encoding='utf-8') as f:
-                json_files['todos'] = json.load(f)
-        
-        if os.path.exists('calendar_events.json'):
-            with open('calendar_events.json', 'r', encoding='utf-8') as f:
-                json_files['calendar_events'] = json.load(f)
-        return jsonify(json_files), 200
+        user_email = current_user()
+        # Read the version first: a write that lands in between is sent again next time, never missed
+        version = action_item_store.version(user_email)
+        meeting_id = request.args.get('meeting_id') or action_item_store.latest_meeting(user_email)
+        since = request.args.get('since', type=int)
+        etag = f"{meeting_id}.{version}" if since is None else f"{meeting_id}.{version}.{since}"
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            meeting_version = action_item_store.meeting_version(user_email, meeting_id) if meeting_id else None
+            if since is not None and meeting_version is not None and meeting_version <= since:
+                grouped, removed = action_item_store.changes_since(user_email, meeting_id, since)
+                json_files = {'since': since, 'removed': removed}
+            else:
+                grouped = action_item_store.list_items(user_email, meeting_id)
+                json_files = {}
+            json_files.update({
+                file_type: [{**entry['item'], 'id': entry['id']} for entry in entries]
+                for file_type, entries in grouped.items()
+            })
+            json_files['meeting_id'] = meeting_id
+            json_files['version'] = version
+            response = jsonify(json_files)
+        response.set_etag(etag, weak=True)
+        # Browsers keep the body and revalidate it on every fetch
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
     except Exception as e:
         return jsonify({'error': f'Error reading JSON files: {str(e)}'}), 500
+
+def item_index(value):
+    """The list index a request sends, as an int, or None unless it is a whole number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        return int(value)
+    return None
+
+def resolve_item_id(user_email, data):
+    """Find the stored id of the item addressed by a request, either directly by `id` or by file_type/index (and optional meeting_id).
+
+    Returns None when the user has no such item of that file_type; check the index with item_index() first.
+    """
+    if data.get('id'):
+        item_id = data['id']
+        if not isinstance(item_id, str):
+            return None
+        file_type, _ = action_item_store.get_items(user_email, [item_id]).get(item_id, (None, None))
+        return item_id if file_type == data.get('file_type') else None
+    index = item_index(data.get('index'))
+    if index is None:
+        return None
+    meeting_id = data.get('meeting_id') or action_item_store.latest_meeting(user_email)
+    return action_item_store.item_id_at(user_email, meeting_id, data.get('file_type'), index)
     
 @app.route('/update-json-file', methods=['POST'])
 def update_json_file():
@@ -365,27 +1018,17 @@ def update_json_file():
         file_type = data.get('file_type')
         index = data.get('index')
         updated_item = data.get('item')
-        if not file_type or index is None or not updated_item:
+        if not file_type or (index is None and not data.get('id')) or not updated_item:
             return jsonify({'error': 'Missing file_type, index, or item'}), 400
-        file_map = {
-            'emails': 'emails.json',
-            'web_searches': 'web_search.json',
-            'notes': 'notes.json',
-            'todos': 'todos.json',
-            'calendar_events': 'calendar_events.json'
-        }
-        if file_type not in file_map:
+        if file_type not in FILE_TYPES:
             return jsonify({'error': 'Invalid file_type'}), 400
-        file_path = file_map[file_type]
-        if not os.path.exists(file_path):
-            return jsonify({'error': f'{file_path} does not exist'}), 404
-        with open(file_path, 'r', encoding='utf-8') as f:
-            items = json.load(f)
-        if index < 0 or index >= len(items):
-            return jsonify({'error': 'Invalid index'}), 400
-        items[index] = updated_item
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(items, f, indent=2)
+        if not data.get('id') and item_index(index) is None:
+            return jsonify({'error': 'index must be an integer'}), 400
+        user_email = current_user()
+        item_id = resolve_item_id(user_email, data)
+        updated_item = {k: v for k, v in updated_item.items() if k != 'id'}
+        if not item_id or not action_item_store.update_item(user_email, item_id, updated_item):
+            return jsonify({'error': 'Item not found'}), 404
         return jsonify({'message': 'Item updated successfully'}), 200
     except Exception as e:
         return jsonify({'error': f'Error updating JSON file: {str(e)}'}), 500
@@ -398,31 +1041,108 @@ def reject_action_item():
         data = request.get_json()
         file_type = data.get('file_type')
         index = data.get('index')
-        if not file_type or index is None:
+        if not file_type or (index is None and not data.get('id')):
             return jsonify({'error': 'Missing file_type or index'}), 400
-        file_map = {
-            'emails': 'emails.json',
-            'web_searches': 'web_search.json',
-            'notes': 'notes.json',
-            'todos': 'todos.json',
-            'calendar_events': 'calendar_events.json'
-        }
-        if file_type not in file_map:
+        if file_type not in FILE_TYPES:
             return jsonify({'error': 'Invalid file_type'}), 400
-        file_path = file_map[file_type]
-        if not os.path.exists(file_path):
-            return jsonify({'error': f'{file_path} does not exist'}), 404
-        with open(file_path, 'r', encoding='utf-8') as f:
-            items = json.load(f)
-        if index < 0 or index >= len(items):
-            return jsonify({'error': 'Invalid index'}), 400
-        items.pop(index)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(items, f, indent=2)
+        if not data.get('id') and item_index(index) is None:
+            return jsonify({'error': 'index must be an integer'}), 400
+        user_email = current_user()
+        item_id = resolve_item_id(user_email, data)
+        if not item_id or not action_item_store.delete_item(user_email, item_id):
+            return jsonify({'error': 'Item not found'}), 404
         return jsonify({'message': 'Item rejected and removed successfully'}), 200
     except Exception as e:
         return jsonify({'error': f'Error rejecting action item: {str(e)}'}), 500
 
+class AcceptError(Exception):
+    def __init__(self, message, status_code, extra=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.extra = extra or {}
+
+def prepare_accepted_item(file_type, item):
+    """Resolve the backend, payload and auth headers for an accepted item from the current session.
+
+    Returns (backend_type, item, headers); raises AcceptError when the item cannot be sent.
+    """
+    return accepted_item_request(file_type, item, session, get_gmail_credentials, url_for('login'))
+
+def accepted_item_request(file_type, item, user_session, get_credentials, login_url):
+    """prepare_accepted_item() for any session mapping; `get_credentials` is called only for emails."""
+    backend_type = FILE_TYPE_TO_BACKEND_TYPE.get(file_type)
+    if not backend_type:
+        logger.error(f"Invalid file_type: {file_type}")
+        raise AcceptError(f'Invalid file_type: {file_type}', 400)
+    backend_url = BACKEND_URLS.get(backend_type)
+    if not backend_url:
+        logger.error(f"No backend URL configured for {file_type}")
+        raise AcceptError(f'No backend URL configured for {file_type}', 500)
+    
+    # The stable id is ours; downstream services never see it
+    item = {k: v for k, v in item.items() if k != 'id'}
+    headers = {'Content-Type': 'application/json'}
+    if backend_type == 'email':
+        creds = get_credentials()
+        if not creds:
+            logger.error("Gmail authentication required")
+            raise AcceptError('Gmail authentication required', 401, {'redirect': login_url})
+        headers['Authorization'] = f'Bearer {creds.token}'
+        if 'user_email' not in user_session:
+            logger.error("User email not found in session")
+            raise AcceptError('User email not found. Please re-authenticate.', 401)
+        item['sender_email'] = user_session['user_email']
+    else:
+        token = user_session.get('token')
+        if not token:
+            logger.error("Authentication token not found")
+            raise AcceptError('Authentication token not found', 401)
+        headers['auth-token'] = token
+    return backend_type, item, headers
+
+def send_accepted_items(backend_type, items, headers):
+    """Send prepared items for one backend in a single request; raises AcceptError if they are not accepted."""
+    logger.debug(f"Sending request to {BACKEND_URLS[backend_type]} with headers: {headers} and payload: {items}")
+    try:
+        response = backend_dispatcher.post(backend_type, items, headers=headers)
+    except CircuitOpen as e:
+        logger.error(str(e))
+        raise AcceptError(f'{e}, please try again shortly', 503)
+    except requests.Timeout:
+        logger.error(f"Backend request to {backend_type} timed out")
+        raise AcceptError(f'Timed out waiting for the {backend_type} backend', 504)
+    except requests.RequestException as e:
+        logger.error(f"Backend request to {backend_type} failed: {e}")
+        raise AcceptError(f'Failed to reach the {backend_type} backend: {e}', 502)
+    check_accept_response(response)
+
+def check_accept_response(response):
+    """Raise AcceptError unless a backend's response (requests or httpx) accepted the items."""
+    logger.debug(f"Backend response: status={response.status_code}, text={response.text}")
+    if response.status_code != 200:
+        error_msg = response.text or 'Unknown error'
+        logger.error(f"Backend request failed: status={response.status_code}, error={error_msg}")
+        raise AcceptError(f'Failed to accept item: {error_msg}', response.status_code)
+
+def send_accepted_item(backend_type, item, headers):
+    """Send one prepared item, through the accept queue when ACCEPT_QUEUE_ENABLED is set."""
+    if app.config['ACCEPT_QUEUE_ENABLED']:
+        accept_coalescer.submit(backend_type, item, headers).result()
+    else:
+        send_accepted_items(backend_type, [item], headers)
+
+# Accepted items are buffered per backend and auth context and flushed as one multi-item POST.
+# Only payload rejections are bisected to find the offending items; auth failures, throttling (retried
+# by the dispatcher first) and a backend that is down fail the whole group.
+app.config['ACCEPT_QUEUE_ENABLED'] = os.getenv('ACCEPT_QUEUE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+accept_coalescer = AcceptCoalescer(
+    send_accepted_items,
+    backend_dispatcher.submit,
+    max_batch=int(os.getenv('ACCEPT_QUEUE_MAX_BATCH', 20)),
+    max_wait=float(os.getenv('ACCEPT_QUEUE_MAX_WAIT', 0.25)),
+    should_split=lambda error: isinstance(error, AcceptError) and error.status_code in SPLIT_STATUSES,
+)
+
 @app.route('/accept-action-item', methods=['POST'])
 def accept_action_item():
     try:
@@ -434,68 +1154,97 @@ def accept_action_item():
         file_type = data.get('file_type')
         index = data.get('index')
         item = data.get('item')
-        if not file_type or index is None or not isinstance(item, dict):
+        if not file_type or (index is None and not data.get('id')) or not isinstance(item, dict):
             logger.error(f"Missing or invalid file_type: {file_type}, index: {index}, item: {item}")
             return jsonify({'error': 'Missing or invalid file_type, index, or item'}), 400
-        backend_type = FILE_TYPE_TO_BACKEND_TYPE.get(file_type)
-        if not backend_type:
-            logger.error(f"Invalid file_type: {file_type}")
-            return jsonify({'error': f'Invalid file_type: {file_type}'}), 400
-        backend_url = BACKEND_URLS.get(backend_type)
-        if not backend_url:
-            logger.error(f"No backend URL configured for {file_type}")
-            return jsonify({'error': f'No backend URL configured for {file_type}'}), 500
-        
-        headers = {'Content-Type': 'application/json'}
-        if backend_type == 'email':
-            creds = get_gmail_credentials()
-            if not creds:
-                logger.error("Gmail authentication required")
-                return jsonify({'error': 'Gmail authentication required', 'redirect': url_for('authorize')}), 401
-            headers['Authorization'] = f'Bearer {creds.token}'
-            if 'user_email' not in session:
-                logger.error("User email not found in session")
-                return jsonify({'error': 'User email not found. Please re-authenticate.'}), 401
-            item['sender_email'] = session['user_email']
-        else:
-            token = session.get('token')
-            if not token:
-                logger.error("Authentication token not found")
-                return jsonify({'error': 'Authentication token not found'}), 401
-            headers['auth-token'] = token
+        if not data.get('id') and item_index(index) is None:
+            return jsonify({'error': 'index must be an integer'}), 400
         
-        logger.debug(f"Sending request to {backend_url} with headers: {headers} and payload: [{item}]")
-        response = requests.post(backend_url, json=[item], headers=headers)
-        logger.debug(f"Backend response: status={response.status_code}, text={response.text}")
+        # Resolve the stored item before the downstream call so a concurrent edit cannot shift the index
+        user_email = current_user()
+        item_id = resolve_item_id(user_email, data)
         
-        if response.status_code == 200:
-            file_map = {
-                'emails': 'emails.json',
-                'web_searches': 'web_search.json',
-                'notes': 'notes.json',
-                'todos': 'todos.json',
-                'calendar_events': 'calendar_events.json'
-            }
-            file_path = file_map.get(file_type)
-            if file_path and os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        items = json.load(f)
-                    if 0 <= index < len(items):
-                        items.pop(index)
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            json.dump(items, f, indent=2)
-                except Exception as e:
-                    logger.error(f"Failed to delete item from {file_path}: {str(e)}")
-            return jsonify({'message': 'Item accepted and removed successfully'}), 200
-        else:
-            error_msg = response.text or 'Unknown error'
-            logger.error(f"Backend request failed: status={response.status_code}, error={error_msg}")
-            return jsonify({'error': f'Failed to accept item: {error_msg}'}), response.status_code
+        send_accepted_item(*prepare_accepted_item(file_type, item))
+        if item_id and not action_item_store.delete_item(user_email, item_id):
+            logger.error(f"Failed to delete accepted item {item_id}")
+        return jsonify({'message': 'Item accepted and removed successfully'}), 200
+    except AcceptError as e:
+        return jsonify({'error': str(e), **e.extra}), e.status_code
     except Exception as e:
         logger.error(f"Error accepting action item: {str(e)}")
         return jsonify({'error': f'Error accepting action item: {str(e)}'}), 500
 
+BATCH_OPERATIONS = ('accept', 'reject', 'update')
+
+@app.route('/batch-action-items', methods=['POST'])
+def batch_action_items():
+    """Apply a list of accept/reject/update operations addressed by item id.
+
+    The whole batch is validated first and nothing is applied if any operation is invalid. Local
+    edits and removals are committed in one transaction; accepts that a downstream backend refuses
+    are reported in their result and the item is kept.
+    """
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'Request must contain JSON data'}), 400
+        operations = request.get_json().get('operations')
+        if not isinstance(operations, list) or not operations:
+            return jsonify({'error': 'operations must be a non-empty list'}), 400
+        user_email = current_user()
+        ids = [op.get('id') for op in operations if isinstance(op, dict)]
+        stored = action_item_store.get_items(user_email, [item_id for item_id in ids if isinstance(item_id, str)])
+
+        results = []
+        seen = set()
+        for op in operations:
+            op = op if isinstance(op, dict) else {}
+            item_id = op.get('id')
+            error = None
+            if op.get('op') not in BATCH_OPERATIONS:
+                error = f"op must be one of {', '.join(BATCH_OPERATIONS)}"
+            elif item_id not in stored:
+                error = 'Item not found'
+            elif item_id in seen:
+                error = 'Duplicate operation for item'
+            elif op['op'] == 'update' and not isinstance(op.get('item'), dict):
+                error = 'update requires an item'
+            seen.add(item_id)
+            results.append({'id': item_id, 'op': op.get('op'), 'ok': error is None, 'error': error})
+        if any(not result['ok'] for result in results):
+            return jsonify({'error': 'Invalid operations; nothing was applied', 'results': results}), 400
+
+        updates, deletes = {}, []
+        accepts = []
+        for op, result in zip(operations, results):
+            file_type, item = stored[op['id']]
+            if op['op'] == 'update':
+                updates[op['id']] = {k: v for k, v in op['item'].items() if k != 'id'}
+            elif op['op'] == 'reject':
+                deletes.append(op['id'])
+            else:
+                try:
+                    accepts.append((op, result, prepare_accepted_item(file_type, op.get('item') or item)))
+                except AcceptError as e:
+                    result.update(ok=False, error=str(e), status=e.status_code)
+
+        # Coalesce accepted items into one request per backend and auth context, sent concurrently
+        futures = [accept_coalescer.submit(*prepared) for _, _, prepared in accepts]
+        accept_coalescer.flush()
+        for (op, result, _), future in zip(accepts, futures):
+            error = future.exception()
+            if error is None:
+                deletes.append(op['id'])
+            elif isinstance(error, AcceptError):
+                result.update(ok=False, error=str(error), status=error.status_code)
+            else:
+                result.update(ok=False, error=f'Error accepting action item: {error}', status=500)
+        action_item_store.apply_changes(user_email, updates, deletes)
+        status = 200 if all(result['ok'] for result in results) else 207
+        return jsonify({'results': results}), status
+    except Exception as e:
+        logger.error(f"Error applying batch: {str(e)}")
+        return jsonify({'error': f'Error applying batch: {str(e)}'}), 500
+
 @app.route('/home')
 def home():
     if 'token' not in session:
@@ -514,18 +1263,7 @@ def login():
                 session.modified = True
             
             # Initiate Google OAuth 2.0 flow
-            redirect_uri = url_for('oauth2callback', _external=True, _scheme='https')
-            client_config = {
-                "web": {
-                    "client_id": os.getenv('GOOGLE_CLIENT_ID'),
-                    "client_secret": os.getenv('GOOGLE_CLIENT_SECRET'),
-                    "redirect_uris": [redirect_uri],
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token"
-                }
-            }
-            flow = Flow.from_client_config(client_config, SCOPES)
-            flow.redirect_uri = redirect_uri
+            flow = google_oauth_flow()
             authorization_url, state = flow.authorization_url(
                 access_type='offline',
                 include_granted_scopes='true',
@@ -565,43 +1303,29 @@ def oauth2callback():
         return redirect(url_for('login'))
     
     try:
-        redirect_uri = url_for('oauth2callback', _external=True, _scheme='https')
-        client_config = {
-            "web": {
-                "client_id": os.getenv('GOOGLE_CLIENT_ID'),
-                "client_secret": os.getenv('GOOGLE_CLIENT_SECRET'),
-                "redirect_uris": [redirect_uri],
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://oauth2.googleapis.com/token"
-            }
-        }
-        flow = Flow.from_client_config(client_config, SCOPES)
-        flow.redirect_uri = redirect_uri
+        flow = google_oauth_flow()
         flow.fetch_token(authorization_response=request.url)
         credentials = flow.credentials
-        logger.debug(f"Credentials: {credentials.__dict__}")
-        session['gmail_token'] = credentials.to_json()
+
+        from jwt import InvalidTokenError
 
         # Try to get email from id_token
         user_email = None
         if credentials.id_token:
             try:
-                # Decode the JWT id_token
-                decoded_token = jwt.decode(
-                    credentials.id_token,
-                    options={"verify_signature": False},  # Disable signature verification for simplicity
-                )
-                user_email = decoded_token.get('email', '')
-                logger.debug(f"Decoded id_token: {decoded_token}")
-            except jwt.InvalidTokenError as e:
-                logger.error(f"Failed to decode id_token: {str(e)}")
+                decoded_token = verify_id_token(credentials.id_token, os.getenv('GOOGLE_CLIENT_ID'), google_jwks)
+                if decoded_token.get('email_verified'):
+                    user_email = decoded_token.get('email', '')
+                logger.debug(f"Verified id_token for subject {decoded_token.get('sub')}")
+            except InvalidTokenError as e:
+                logger.error(f"Failed to verify id_token: {str(e)}")
         else:
             logger.debug("No id_token in credentials, falling back to userinfo endpoint")
 
-        # Fallback to Userinfo API if id_token is missing or decoding fails
+        # Fallback to Userinfo API if id_token is missing or cannot be verified
         if not user_email:
-            headers = {'Authorization': f'Bearer {credentials.access_token}'}
-            response = requests.get('https://www.googleapis.com/oauth2/v3/userinfo', headers=headers)
+            headers = {'Authorization': f'Bearer {credentials.token}'}
+            response = requests.get('https://www.googleapis.com/oauth2/v3/userinfo', headers=headers, timeout=10)
             if response.status_code == 200:
                 user_info = response.json()
                 user_email = user_info.get('email', '')
@@ -615,10 +1339,12 @@ def oauth2callback():
             flash("No email found in OAuth response.", "danger")
             return redirect(url_for('login'))
 
+        credential_store.put(user_email, credentials)
+        session.pop('gmail_token', None)
         session['user_email'] = user_email
         session['token'] = str(uuid.uuid4())
         session.modified = True
-        logger.debug("Google OAuth token fetched and stored in session")
+        logger.debug("Google OAuth token fetched and stored in the credential store")
         session.pop('login_email', None)
         session.pop('state', None)
         flash("Logged in successfully!", "success")
@@ -633,4 +1359,4 @@ def oauth2callback():
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", 5000))
-    app.run(debug=False, host='0.0.0.0', port=port)
+    create_app().run(debug=False, host='0.0.0.0', port=port)
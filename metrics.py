@@ -0,0 +1,205 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KB .. 256 MB
+
+REQUEST_LATENCY = Histogram(
+    'meetsync_http_request_duration_seconds', 'Time to produce a response, per route',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_SIZE = Histogram(
+    'meetsync_http_request_size_bytes', 'Request body size, per route',
+    ['method', 'route'], buckets=SIZE_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'meetsync_http_requests_in_flight', 'Requests being handled', multiprocess_mode='livesum',
+)
+STAGE_LATENCY = Histogram(
+    'meetsync_stage_duration_seconds', 'Time spent in each processing stage',
+    ['stage', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+DOWNSTREAM_LATENCY = Histogram(
+    'meetsync_downstream_request_duration_seconds', 'Single attempt at a downstream backend call',
+    ['backend', 'status'], buckets=LATENCY_BUCKETS,
+)
+BACKEND_RETRIES = Counter('meetsync_backend_retries_total', 'Retried downstream backend calls', ['backend'])
+CACHE_LOOKUPS = Counter('meetsync_cache_lookups_total', 'Result cache lookups', ['result'])
+JOBS_IN_FLIGHT = Gauge(
+    'meetsync_jobs_in_flight', 'Background jobs queued or running', multiprocess_mode='livesum',
+)
+AUDIO_BYTES = Counter(
+    'meetsync_audio_bytes_total', 'Audio bytes before and after normalization', ['kind'],
+)
+LLM_TOKENS = Counter(
+    'meetsync_llm_tokens_total', 'Tokens used by LLM calls', ['model', 'prompt_version', 'kind'],
+)
+LLM_CALL_LATENCY = Histogram(
+    'meetsync_llm_call_duration_seconds', 'Duration of one LLM call', ['model', 'prompt_version'],
+    buckets=LATENCY_BUCKETS,
+)
+EXTRACTION_TIER_LATENCY = Histogram(
+    'meetsync_extraction_tier_duration_seconds', 'Extraction attempts per model tier, by routing outcome',
+    ['tier', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+EXTRACTION_GATE = Counter(
+    'meetsync_extraction_gate_total', 'Transcripts checked before extraction, by decision', ['decision'],
+)
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+stage_timings_var: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar('stage_timings', default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a processing stage into STAGE_LATENCY and the current request's log record."""
+    start = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_LATENCY.labels(name, outcome).observe(duration)
+        timings = stage_timings_var.get()
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0.0) + duration, 4)
+        logger.info("stage finished", extra={'stage': name, 'outcome': outcome, 'duration_seconds': round(duration, 4)})
+
+
+def metrics_response():
+    """Body and content type for /metrics, aggregated over all worker processes in multiprocess mode."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def instrument_app(app):
+    """Record latency, body size and in-flight count per route, and log each request with its id and stage timings."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request():
+        g.request_start = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_id_token = request_id_var.set(g.request_id)
+        g.stage_timings = {}
+        g.stage_timings_token = stage_timings_var.set(g.stage_timings)
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _finish_request(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        duration = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(duration)
+        if request.content_length:
+            REQUEST_SIZE.labels(request.method, route).observe(request.content_length)
+        response.headers['X-Request-ID'] = g.request_id
+        logger.info("request finished", extra={
+            'method': request.method,
+            'route': route,
+            'status': response.status_code,
+            'duration_seconds': round(duration, 4),
+            'request_bytes': request.content_length or 0,
+            'stages': g.stage_timings,
+        })
+        return response
+
+    @app.teardown_request
+    def _teardown_request(exc):
+        request_id_token = g.pop('request_id_token', None)
+        if request_id_token is None:
+            return
+        REQUESTS_IN_FLIGHT.dec()
+        stage_timings_var.reset(g.pop('stage_timings_token'))
+        request_id_var.reset(request_id_token)
+
+
+def instrument_endpoint(route: str):
+    """instrument_app() for one Starlette endpoint of the ASGI app, recorded under the same route label."""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(request):
+            start = time.perf_counter()
+            request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+            request_id_token = request_id_var.set(request_id)
+            timings = {}
+            stage_timings_token = stage_timings_var.set(timings)
+            REQUESTS_IN_FLIGHT.inc()
+            try:
+                response = await endpoint(request)
+                duration = time.perf_counter() - start
+                content_length = int(request.headers.get('content-length') or 0)
+                REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(duration)
+                if content_length:
+                    REQUEST_SIZE.labels(request.method, route).observe(content_length)
+                response.headers['X-Request-ID'] = request_id
+                logger.info("request finished", extra={
+                    'method': request.method,
+                    'route': route,
+                    'status': response.status_code,
+                    'duration_seconds': round(duration, 4),
+                    'request_bytes': content_length,
+                    'stages': timings,
+                })
+                return response
+            finally:
+                REQUESTS_IN_FLIGHT.dec()
+                stage_timings_var.reset(stage_timings_token)
+                request_id_var.reset(request_id_token)
+        return wrapper
+    return decorator
+
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, carrying the request id and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        request_id = request_id_var.get()
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(log_format: str = 'json', level: int = logging.INFO):
+    if log_format == 'json':
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        logging.basicConfig(level=level, handlers=[handler])
+    else:
+        logging.basicConfig(level=level)
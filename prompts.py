@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from extraction import estimate_tokens
+from metrics import LLM_CALL_LATENCY, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+def _compact_schema(schema: dict, model=None):
+    """Trim the JSON schema instructor sends with every call: no titles, and optional fields as plain types."""
+    schema.pop('title', None)
+    for prop in schema.get('properties', {}).values():
+        prop.pop('title', None)
+        any_of = prop.get('anyOf')
+        if any_of and len(any_of) == 2 and {'type': 'null'} in any_of:
+            prop.update(next(option for option in any_of if option != {'type': 'null'}))
+            del prop['anyOf']
+        if 'default' in prop and prop['default'] is None:
+            del prop['default']
+
+
+class ActionItem(BaseModel):
+    model_config = ConfigDict(json_schema_extra=_compact_schema)
+
+    type: str = Field(..., description="Type of action item: note, email, calendar_event, to_do, or web_search")
+    content: str = Field(..., description="Content of the action item")
+    recipient: Optional[str] = Field(None, description="Recipient for email type")
+    subject: Optional[str] = Field(None, description="Subject for email type")
+    body: Optional[str] = Field(None, description="Body for email type")
+    title: Optional[str] = Field(None, description="Title for note type")
+    tag: Optional[str] = Field(None, description="Tag for note type")
+
+
+class ActionItemsList(BaseModel):
+    model_config = ConfigDict(json_schema_extra=_compact_schema)
+
+    items: List[ActionItem] = Field(..., description="List of actionable items")
+
+
+@dataclass(frozen=True)
+class ExtractionPrompt:
+    """One version of the extraction system prompt. Versions are immutable: change a prompt by adding one."""
+
+    version: str
+    system: str
+    description: str = ''
+
+    def prompt_tokens(self, response_model=None) -> int:
+        """Estimated tokens sent with every call, including the response schema instructor appends in JSON mode."""
+        tokens = estimate_tokens(self.system)
+        if response_model is not None:
+            tokens += estimate_tokens(json.dumps(response_model.model_json_schema()))
+        return tokens
+
+    def messages(self, transcript: str, hints: Optional[str] = None) -> list:
+        """`hints` are facts found in the transcript beforehand (see gating.py), given after it."""
+        content = f"Transcript:\n{transcript}"
+        if hints:
+            content += f"\n\n{hints}"
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": content},
+        ]
+
+
+LEGACY_PROMPT = ExtractionPrompt('1', '''
+You are a smart meeting assistant. Given the transcript below, extract and classify actionable items by type.
+Supported action item types:
+- note
+- email
+- calendar_event
+- to_do
+- web_search
+Use the following JSON format for each action item:
+{
+"type": "<type>",
+"content": "<main description of the action item>",
+# Required for type 'email'
+"recipient": "<recipient email>",
+"subject": "<email subject>",
+"body": "<full email body>",
+# Required for type 'note'
+"title": "<short title>",
+"tag": "<tag or category for the note>",
+# Recommended for type 'to_do'
+"title": "<short to-do title>"
+}
+Notes:
+- For action items of type **note**, include `title`, `tag`, and `content` (used as the note description).
+- For type **email**, always include `recipient`, `subject`, and `body`.
+- For type **to_do**, include a short `title` and a longer `content` (used as the task description).
+- For type **calendar_event**, only include `type` and `content`.
+- For type **to_do**, include a short `title` and a longer `content` (used as the task description). The `title` is required.
+- For type **web_search** only include `content`.
+- Respond with a JSON array of action items only.
+''', 'Original prompt with an inline pseudo-schema')
+
+# The field layout is left to the JSON schema instructor appends, so only the per-type rules remain
+COMPACT_PROMPT = ExtractionPrompt('2', '''Extract the action items from a meeting transcript. Each item has a type:
+- to_do: short title; content = task details
+- email: recipient (email address), subject, body; content = the full email text
+- note: title, tag; content = note text
+- calendar_event: content = what and when
+- web_search: content = the search query
+Only include things someone asked for or committed to. Return no items if there are none.''',
+                               'Per-type rules only; no duplicated schema')
+
+PROMPTS: Dict[str, ExtractionPrompt] = {prompt.version: prompt for prompt in (LEGACY_PROMPT, COMPACT_PROMPT)}
+
+
+class PromptRegistry:
+    """Chooses the extraction prompt for each transcript and tracks token use and latency per version.
+
+    With a `candidate` and a `candidate_share` between 0 and 1, that share of transcripts (picked by
+    content hash, so a transcript always gets the same prompt and cache entry) uses the candidate,
+    for an online A/B comparison of cost and latency.
+    """
+
+    def __init__(self, default: str, candidate: Optional[str] = None, candidate_share: float = 0.0):
+        for version in (default, candidate):
+            if version is not None and version not in PROMPTS:
+                raise ValueError(f"Unknown extraction prompt version: {version}")
+        self.default = PROMPTS[default]
+        self.candidate = PROMPTS[candidate] if candidate else None
+        self.candidate_share = candidate_share
+        self._usage: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def choose(self, transcript: str) -> ExtractionPrompt:
+        if self.candidate is None or self.candidate_share <= 0:
+            return self.default
+        bucket = int(hashlib.sha256(transcript.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+        return self.candidate if bucket < self.candidate_share else self.default
+
+    def record(self, prompt: ExtractionPrompt, model: str, prompt_tokens: int, completion_tokens: int,
+               seconds: float, estimated: bool = False):
+        """Account one LLM call; `estimated` marks token counts that did not come from the API's usage."""
+        LLM_TOKENS.labels(model, prompt.version, 'prompt').inc(prompt_tokens)
+        LLM_TOKENS.labels(model, prompt.version, 'completion').inc(completion_tokens)
+        LLM_CALL_LATENCY.labels(model, prompt.version).observe(seconds)
+        with self._lock:
+            usage = self._usage.setdefault(prompt.version, {
+                'calls': 0, 'estimated_calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'seconds': 0.0,
+            })
+            usage['calls'] += 1
+            usage['estimated_calls'] += int(estimated)
+            usage['prompt_tokens'] += prompt_tokens
+            usage['completion_tokens'] += completion_tokens
+            usage['seconds'] += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            versions = {}
+            for version, usage in self._usage.items():
+                calls = usage['calls']
+                versions[version] = {
+                    **usage,
+                    'seconds': round(usage['seconds'], 3),
+                    'avg_prompt_tokens': round(usage['prompt_tokens'] / calls),
+                    'avg_completion_tokens': round(usage['completion_tokens'] / calls),
+                    'avg_seconds': round(usage['seconds'] / calls, 3),
+                }
+        return {
+            'default': self.default.version,
+            'candidate': self.candidate.version if self.candidate else None,
+            'candidate_share': self.candidate_share,
+            'versions': versions,
+        }
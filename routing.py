@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from admission import AdmissionError
+from extraction import estimate_tokens
+from metrics import EXTRACTION_TIER_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Fields without which an item of each type cannot be sent downstream (see convert_action_items in main.py)
+REQUIRED_FIELDS = {
+    'email': ('recipient', 'subject'),
+    'to_do': ('title',),
+    'note': ('title',),
+    'calendar_event': (),
+    'web_search': (),
+}
+
+
+def item_problems(items: List[dict]) -> List[str]:
+    """Reasons a schema-valid extraction is still unusable, such as an email without a recipient."""
+    problems = []
+    for i, item in enumerate(items):
+        item_type = item.get('type')
+        if item_type not in REQUIRED_FIELDS:
+            problems.append(f"item {i} has unknown type {item_type!r}")
+            continue
+        if not (item.get('content') or '').strip():
+            problems.append(f"item {i} ({item_type}) has no content")
+        for field in REQUIRED_FIELDS[item_type]:
+            if not (item.get(field) or '').strip():
+                problems.append(f"item {i} ({item_type}) has no {field}")
+    return problems
+
+
+def is_validation_error(error: Exception) -> bool:
+    """True when the model answered but its output never fit the response schema."""
+    from instructor.core.exceptions import InstructorRetryException
+    from pydantic import ValidationError
+    return isinstance(error, (InstructorRetryException, ValidationError))
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    name: str
+    model: str
+    max_retries: int  # instructor attempts before the output counts as invalid
+
+
+class ModelRouter:
+    """Sends each extraction to the cheapest model tier likely to get it right.
+
+    Transcripts of up to `small_max_tokens` go to the small model first, with a single attempt. Its
+    answer is escalated to the large model when it fails schema validation, fails item_problems(),
+    or the call errors; longer transcripts, and routers without a small model, go straight to the
+    large one. Every attempt is recorded per tier and outcome in EXTRACTION_TIER_LATENCY and stats().
+    """
+
+    def __init__(self, large_model: str, small_model: Optional[str] = None, small_max_tokens: int = 1500,
+                 large_retries: int = 3, small_retries: int = 1):
+        self.large = ModelTier('large', large_model, large_retries)
+        self.small = ModelTier('small', small_model, small_retries) if small_model else None
+        self.small_max_tokens = small_max_tokens
+        self._stats: Dict[str, Dict[str, dict]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the routing policy in cache keys, so a change of models never reuses old extractions."""
+        if self.small is None:
+            return self.large.model
+        return f"{self.small.model}<={self.small_max_tokens}>{self.large.model}"
+
+    def plan(self, transcript: str) -> List[ModelTier]:
+        if self.small is not None and estimate_tokens(transcript) <= self.small_max_tokens:
+            return [self.small, self.large]
+        return [self.large]
+
+    def run(self, transcript: str, call: Callable[[ModelTier], List[dict]]) -> List[dict]:
+        """Extract with `call(tier)` on each planned tier until one gives usable items.
+
+        The last tier's items are returned even if item_problems() finds fault with them, and its
+        errors are raised; this never returns None.
+        """
+        tiers = self.plan(transcript)
+        for tier in tiers:
+            start = time.perf_counter()
+            try:
+                items = call(tier)
+            except Exception as e:
+                if not self._escalate_error(tier, tier is tiers[-1], e, time.perf_counter() - start):
+                    raise
+                continue
+            if self._accept(tier, tier is tiers[-1], items, time.perf_counter() - start):
+                return items
+        raise self._exhausted(tiers)
+
+    async def arun(self, transcript: str, call: Callable[[ModelTier], Awaitable[List[dict]]]) -> List[dict]:
+        """run() for a coroutine `call`."""
+        tiers = self.plan(transcript)
+        for tier in tiers:
+            start = time.perf_counter()
+            try:
+                items = await call(tier)
+            except Exception as e:
+                if not self._escalate_error(tier, tier is tiers[-1], e, time.perf_counter() - start):
+                    raise
+                continue
+            if self._accept(tier, tier is tiers[-1], items, time.perf_counter() - start):
+                return items
+        raise self._exhausted(tiers)
+
+    @staticmethod
+    def _exhausted(tiers: List[ModelTier]) -> RuntimeError:
+        # The last tier's answer is always kept and its errors re-raised, so only an empty plan gets here
+        return RuntimeError(f"No model tier returned an extraction (planned: {[tier.model for tier in tiers]})")
+
+    def _escalate_error(self, tier: ModelTier, last: bool, error: Exception, seconds: float) -> bool:
+        outcome = 'invalid' if is_validation_error(error) else 'error'
+        self._record(tier, outcome, seconds)
+        # Throttling applies to every tier alike, so it is never escalated
+        if last or isinstance(error, AdmissionError):
+            return False
+        logger.warning(f"Escalating extraction from {tier.model} after {outcome} output: {error}")
+        return True
+
+    def _accept(self, tier: ModelTier, last: bool, items: List[dict], seconds: float) -> bool:
+        problems = item_problems(items)
+        if problems and not last:
+            self._record(tier, 'rejected', seconds)
+            logger.info(f"Escalating extraction from {tier.model}: {'; '.join(problems[:3])}")
+            return False
+        if problems:
+            logger.warning(f"Extraction from {tier.model} kept despite: {'; '.join(problems[:3])}")
+        self._record(tier, 'accepted', seconds)
+        return True
+
+    def _record(self, tier: ModelTier, outcome: str, seconds: float):
+        EXTRACTION_TIER_LATENCY.labels(tier.name, outcome).observe(seconds)
+        with self._lock:
+            usage = self._stats.setdefault(tier.name, {}).setdefault(outcome, {'calls': 0, 'seconds': 0.0})
+            usage['calls'] += 1
+            usage['seconds'] += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            tiers = {
+                name: {
+                    outcome: {'calls': usage['calls'], 'avg_seconds': round(usage['seconds'] / usage['calls'], 3)}
+                    for outcome, usage in outcomes.items()
+                }
+                for name, outcomes in self._stats.items()
+            }
+        return {
+            'small_model': self.small.model if self.small else None,
+            'large_model': self.large.model,
+            'small_max_tokens': self.small_max_tokens,
+            'tiers': tiers,
+        }
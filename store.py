@@ -0,0 +1,238 @@
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from clients import SqliteConnections
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = ('emails', 'web_searches', 'notes', 'todos', 'calendar_events')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meetings (
+    id TEXT PRIMARY KEY,
+    user_email TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_meetings_user ON meetings (user_email, created_at);
+CREATE TABLE IF NOT EXISTS action_items (
+    id TEXT PRIMARY KEY,
+    user_email TEXT NOT NULL,
+    meeting_id TEXT NOT NULL REFERENCES meetings (id),
+    file_type TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_action_items_meeting ON action_items (user_email, meeting_id, file_type, position);
+CREATE INDEX IF NOT EXISTS idx_action_items_user_type ON action_items (user_email, file_type);
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_email TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS removed_items (
+    id TEXT PRIMARY KEY,
+    user_email TEXT NOT NULL,
+    meeting_id TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_removed_items_meeting ON removed_items (user_email, meeting_id, version);
+'''
+
+# Columns added after the first release; databases created before them are migrated on open
+VERSION_COLUMNS = (
+    ('meetings', 'version'),
+    ('action_items', 'version'),
+)
+
+
+class ActionItemStore:
+    """Per-user action items in SQLite (WAL mode), one row per item.
+
+    Each thread gets its own connection; WAL lets readers proceed while another gunicorn worker
+    writes, and every edit or delete touches a single row by primary key.
+
+    Every write bumps a per-user version number and stamps the rows it touches with it, and deleted
+    items leave a tombstone, so a client holding version N can be sent only what changed after N.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connections = SqliteConnections(path, row_factory=sqlite3.Row, foreign_keys=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        for table, column in VERSION_COLUMNS:
+            if column not in {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_action_items_version ON action_items (user_email, meeting_id, version)')
+        conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def _bump_version(self, conn: sqlite3.Connection, user_email: str) -> int:
+        """Advance the user's version inside the caller's write transaction; returns the new version."""
+        conn.execute(
+            'INSERT INTO user_versions (user_email, version) VALUES (?, 1) '
+            'ON CONFLICT (user_email) DO UPDATE SET version = version + 1',
+            (user_email,),
+        )
+        return conn.execute('SELECT version FROM user_versions WHERE user_email = ?', (user_email,)).fetchone()[0]
+
+    def version(self, user_email: str) -> int:
+        """The user's current version; it changes whenever any of their meetings or items does."""
+        row = self._connect().execute('SELECT version FROM user_versions WHERE user_email = ?', (user_email,)).fetchone()
+        return row[0] if row else 0
+
+    def add_meeting(self, user_email: str, grouped_items: Dict[str, List[dict]]) -> str:
+        """Store one extraction run; `grouped_items` maps file_type to its list of items."""
+        conn = self._connect()
+        meeting_id = uuid.uuid4().hex
+        now = time.time()
+        with conn:
+            version = self._bump_version(conn, user_email)
+            conn.execute('INSERT INTO meetings (id, user_email, created_at, version) VALUES (?, ?, ?, ?)',
+                         (meeting_id, user_email, now, version))
+            conn.executemany(
+                'INSERT INTO action_items (id, user_email, meeting_id, file_type, position, data, created_at, updated_at, version) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (uuid.uuid4().hex, user_email, meeting_id, file_type, position, json.dumps(item), now, now, version)
+                    for file_type, items in grouped_items.items()
+                    for position, item in enumerate(items)
+                ],
+            )
+        return meeting_id
+
+    def create_meeting(self, user_email: str) -> str:
+        """Start an empty meeting that items are added to one at a time, e.g. while extraction streams."""
+        conn = self._connect()
+        meeting_id = uuid.uuid4().hex
+        with conn:
+            version = self._bump_version(conn, user_email)
+            conn.execute('INSERT INTO meetings (id, user_email, created_at, version) VALUES (?, ?, ?, ?)',
+                         (meeting_id, user_email, time.time(), version))
+        return meeting_id
+
+    def add_item(self, user_email: str, meeting_id: str, file_type: str, position: int, item: dict) -> str:
+        conn = self._connect()
+        item_id = uuid.uuid4().hex
+        now = time.time()
+        with conn:
+            version = self._bump_version(conn, user_email)
+            conn.execute(
+                'INSERT INTO action_items (id, user_email, meeting_id, file_type, position, data, created_at, updated_at, version) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (item_id, user_email, meeting_id, file_type, position, json.dumps(item), now, now, version),
+            )
+        return item_id
+
+    def latest_meeting(self, user_email: str) -> Optional[str]:
+        row = self._connect().execute(
+            'SELECT id FROM meetings WHERE user_email = ? ORDER BY created_at DESC LIMIT 1',
+            (user_email,),
+        ).fetchone()
+        return row['id'] if row else None
+
+    def list_items(self, user_email: str, meeting_id: Optional[str]) -> Dict[str, List[dict]]:
+        """Return {file_type: [{'id': ..., 'item': {...}}, ...]} for one meeting, in extraction order."""
+        grouped = {file_type: [] for file_type in FILE_TYPES}
+        if not meeting_id:
+            return grouped
+        rows = self._connect().execute(
+            'SELECT id, file_type, data FROM action_items WHERE user_email = ? AND meeting_id = ? '
+            'ORDER BY file_type, position',
+            (user_email, meeting_id),
+        )
+        for row in rows:
+            grouped.setdefault(row['file_type'], []).append({'id': row['id'], 'item': json.loads(row['data'])})
+        return grouped
+
+    def meeting_version(self, user_email: str, meeting_id: str) -> Optional[int]:
+        """The user's version when the meeting was created, or None if it is not theirs."""
+        row = self._connect().execute(
+            'SELECT version FROM meetings WHERE id = ? AND user_email = ?', (meeting_id, user_email),
+        ).fetchone()
+        return row['version'] if row else None
+
+    def changes_since(self, user_email: str, meeting_id: str, since: int) -> Tuple[Dict[str, List[dict]], List[str]]:
+        """Items of one meeting added or edited after version `since`, grouped like list_items(), and the ids removed since."""
+        conn = self._connect()
+        grouped = {file_type: [] for file_type in FILE_TYPES}
+        rows = conn.execute(
+            'SELECT id, file_type, data FROM action_items WHERE user_email = ? AND meeting_id = ? AND version > ? '
+            'ORDER BY file_type, position',
+            (user_email, meeting_id, since),
+        )
+        for row in rows:
+            grouped.setdefault(row['file_type'], []).append({'id': row['id'], 'item': json.loads(row['data'])})
+        removed = [row['id'] for row in conn.execute(
+            'SELECT id FROM removed_items WHERE user_email = ? AND meeting_id = ? AND version > ?',
+            (user_email, meeting_id, since),
+        )]
+        return grouped, removed
+
+    def item_id_at(self, user_email: str, meeting_id: Optional[str], file_type: str, index: int) -> Optional[str]:
+        """Resolve a list index, as shown by /get-json-files, to the item's id."""
+        if not meeting_id or index < 0:
+            return None
+        row = self._connect().execute(
+            'SELECT id FROM action_items WHERE user_email = ? AND meeting_id = ? AND file_type = ? '
+            'ORDER BY position LIMIT 1 OFFSET ?',
+            (user_email, meeting_id, file_type, index),
+        ).fetchone()
+        return row['id'] if row else None
+
+    def get_items(self, user_email: str, item_ids: List[str]) -> Dict[str, tuple]:
+        """Return {item_id: (file_type, item)} for the ids that belong to the user."""
+        if not item_ids:
+            return {}
+        placeholders = ', '.join('?' for _ in item_ids)
+        rows = self._connect().execute(
+            f'SELECT id, file_type, data FROM action_items WHERE user_email = ? AND id IN ({placeholders})',
+            (user_email, *item_ids),
+        )
+        return {row['id']: (row['file_type'], json.loads(row['data'])) for row in rows}
+
+    def apply_changes(self, user_email: str, updates: Dict[str, dict], deletes: List[str]):
+        """Apply several edits and deletes in one transaction."""
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            version = self._bump_version(conn, user_email)
+            conn.executemany(
+                'UPDATE action_items SET data = ?, updated_at = ?, version = ? WHERE id = ? AND user_email = ?',
+                [(json.dumps(item), now, version, item_id, user_email) for item_id, item in updates.items()],
+            )
+            for item_id in deletes:
+                self._remove(conn, user_email, item_id, version)
+
+    def update_item(self, user_email: str, item_id: str, item: dict) -> bool:
+        conn = self._connect()
+        with conn:
+            version = self._bump_version(conn, user_email)
+            cursor = conn.execute(
+                'UPDATE action_items SET data = ?, updated_at = ?, version = ? WHERE id = ? AND user_email = ?',
+                (json.dumps(item), time.time(), version, item_id, user_email),
+            )
+        return cursor.rowcount == 1
+
+    def delete_item(self, user_email: str, item_id: str) -> bool:
+        conn = self._connect()
+        with conn:
+            return self._remove(conn, user_email, item_id, self._bump_version(conn, user_email))
+
+    def _remove(self, conn: sqlite3.Connection, user_email: str, item_id: str, version: int) -> bool:
+        """Delete one item and leave a tombstone so clients syncing with `since` learn it is gone."""
+        conn.execute(
+            'INSERT OR REPLACE INTO removed_items (id, user_email, meeting_id, file_type, version) '
+            'SELECT id, user_email, meeting_id, file_type, ? FROM action_items WHERE id = ? AND user_email = ?',
+            (version, item_id, user_email),
+        )
+        cursor = conn.execute('DELETE FROM action_items WHERE id = ? AND user_email = ?', (item_id, user_email))
+        return cursor.rowcount == 1
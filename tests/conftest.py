@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The app is a set of top-level modules, not a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """main's Flask app, with every database and folder it writes under a temporary directory."""
+    folder = tmp_path_factory.mktemp('app')
+    for name, default in (('ACTION_ITEMS_DB', 'action_items.db'), ('RATE_LIMIT_DB', 'rate_limits.db'),
+                          ('CACHE_FOLDER', 'cache'), ('JOBS_FOLDER', 'jobs'), ('LIVE_FOLDER', 'live'),
+                          ('CREDENTIALS_FOLDER', 'credentials')):
+        os.environ.setdefault(name, str(folder / default))
+    os.environ.setdefault('FLASK_SECRET_KEY', 'test')
+    import main
+    main.app.config['TESTING'] = True
+    return main.app
+
+
+@pytest.fixture
+def client(app):
+    """A test client signed in as a fresh user, whose address is `client.user_email`."""
+    client = app.test_client()
+    client.user_email = f"user-{os.urandom(4).hex()}@example.com"
+    with client.session_transaction() as session:
+        session['user_email'] = client.user_email
+    return client
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionError, BucketStore, FairQueue, GroqLimiter, UserRateLimiter
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_waiting_users_are_served_round_robin():
+    queue = FairQueue(slots=1, max_wait=5, max_waiting=10)
+    served = []
+
+    def request(user):
+        with queue.slot(user):
+            served.append(user)
+
+    threads = []
+    with queue.slot('holder'):
+        # A queues three requests before B queues one; B still goes second
+        for user in ('a', 'a', 'a', 'b'):
+            thread = threading.Thread(target=request, args=(user,))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: queue.stats()['waiting'] == len(threads))
+    for thread in threads:
+        thread.join()
+    assert served == ['a', 'b', 'a', 'a']
+    assert queue.stats()['active'] == 0
+
+
+def test_full_queue_rejects_at_once():
+    queue = FairQueue(slots=1, max_wait=5, max_waiting=0)
+    with queue.slot('a'):
+        start = time.monotonic()
+        with pytest.raises(AdmissionError) as error:
+            with queue.slot('b'):
+                pass
+        assert time.monotonic() - start < 1
+    assert error.value.status_code == 503
+    assert error.value.retry_after >= 1
+    assert queue.stats()['rejected'] == 1
+
+
+def test_waiting_too_long_is_rejected_and_leaves_the_queue():
+    queue = FairQueue(slots=1, max_wait=0.05, max_waiting=10)
+    with queue.slot('a'):
+        with pytest.raises(AdmissionError):
+            with queue.slot('b'):
+                pass
+        assert queue.stats()['waiting'] == 0
+        assert queue.stats()['waiting_users'] == 0
+    with queue.slot('b'):
+        assert queue.stats()['active'] == 1
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    queue = FairQueue(slots=1, max_wait=5, max_waiting=10)
+
+    async def scenario():
+        async with queue.aslot('a'):
+            waiter = asyncio.create_task(queue.aslot('b').__aenter__())
+            while queue.stats()['waiting'] == 0:
+                await asyncio.sleep(0.001)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert queue.stats()['waiting'] == 0
+
+    asyncio.run(scenario())
+    assert queue.stats()['active'] == 0
+
+
+def test_user_rate_limit_allows_a_burst_then_rejects(tmp_path):
+    limiter = UserRateLimiter(BucketStore(str(tmp_path / 'buckets.db')), per_minute=1, burst=2)
+    limiter.check('a')
+    limiter.check('a')
+    with pytest.raises(AdmissionError) as error:
+        limiter.check('a')
+    assert error.value.status_code == 429
+    assert 30 <= error.value.retry_after <= 60
+    # Buckets are per user, and fractional costs draw less from them
+    limiter.check('b', cost=0.5)
+    limiter.check('b', cost=0.5)
+    limiter.check('b', cost=0.5)
+    assert limiter.stats()['limited'] == 1
+
+
+def test_rate_limit_of_zero_is_off(tmp_path):
+    limiter = UserRateLimiter(BucketStore(str(tmp_path / 'buckets.db')), per_minute=0, burst=1)
+    for _ in range(10):
+        limiter.check('a')
+
+
+def test_groq_calls_over_the_concurrency_cap_are_rejected(tmp_path):
+    limiter = GroqLimiter(BucketStore(str(tmp_path / 'buckets.db')), max_concurrency=1, requests_per_minute=0,
+                          tokens_per_minute=0, max_wait=0.05)
+    with limiter.call():
+        with pytest.raises(AdmissionError) as error:
+            with limiter.call():
+                pass
+    assert error.value.status_code == 503
+    with limiter.call():
+        pass
+    assert limiter.stats()['throttled'] == 1
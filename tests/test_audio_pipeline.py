@@ -0,0 +1,63 @@
+import io
+import os
+import wave
+
+import pytest
+
+import audio_pipeline
+from audio_pipeline import AudioPipeline, get_audio_process_pool, shutdown_audio_process_pool
+
+
+def wav_bytes(seconds, sample_rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b'\x10\x00\xf0\xff' * int(seconds * sample_rate / 2))
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    shutdown_audio_process_pool()
+    yield
+    shutdown_audio_process_pool()
+
+
+def test_pool_is_shared_within_a_process_and_replaced_after_a_fork(monkeypatch):
+    pool = get_audio_process_pool(1)
+    assert get_audio_process_pool(1) is pool
+    assert pool.submit(os.getpid).result() != os.getpid()
+    # A forked worker inherits the parent's pool object, whose processes it does not own
+    monkeypatch.setattr(audio_pipeline, '_pool_pid', -1)
+    assert get_audio_process_pool(1) is not pool
+    pool.shutdown()
+
+
+def test_pool_and_inline_preparation_agree():
+    recording = wav_bytes(25)
+    results = []
+    for max_workers in (1, 0):
+        pipeline = AudioPipeline(window_seconds=10, overlap_seconds=1, codec='wav', max_workers=max_workers)
+        prepared = pipeline.prepare(io.BytesIO(recording))
+        try:
+            assert all(os.path.exists(path) for path in prepared.paths)
+            results.append((prepared.windows, prepared.duration, [os.path.getsize(path) for path in prepared.paths]))
+        finally:
+            prepared.close()
+        assert not os.path.exists(prepared.folder)
+        assert pipeline.stats()['conversions'] == 1
+    assert results[0] == results[1]
+    windows, duration, _ = results[0]
+    assert duration == 25
+    assert windows[0][0] == 0 and windows[-1][1] == 25 * 16000
+
+
+def test_undecodable_upload_returns_none_and_cleans_up(monkeypatch, tmp_path):
+    monkeypatch.setattr('audio.ffmpeg_binary', lambda: None)
+    monkeypatch.setattr('tempfile.tempdir', str(tmp_path))
+    pipeline = AudioPipeline(codec='wav', max_workers=0)
+    assert pipeline.prepare(b'not audio') is None
+    assert os.listdir(tmp_path) == []
+    assert pipeline.stats()['conversions'] == 0
@@ -0,0 +1,23 @@
+import time
+
+from cache import DiskCache
+
+
+def test_ttl_counts_from_creation_not_last_read(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    cache = DiskCache(str(tmp_path), ttl_seconds=10)
+    cache.set('ab12', {'text': 'hello'})
+    now[0] += 6
+    assert cache.get('ab12') == {'text': 'hello'}
+    now[0] += 6
+    assert cache.get('ab12') is None
+
+
+def test_overwriting_an_entry_counts_only_the_new_size(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    cache.set('ab12', 'x' * 100)
+    cache.set('ab12', 'x' * 100)
+    cache.set('cd34', 'y' * 10)
+    cache.set('ab12', 'z')
+    assert cache.stats()['size_bytes'] == cache._scan_size()
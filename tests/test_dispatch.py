@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import requests
+
+from dispatch import SPLIT_STATUSES, AcceptCoalescer, BackendDispatcher, CircuitBreaker, CircuitOpen
+
+URL = 'http://backend.test/items'
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """Answers each post() with the next outcome: a status code or an exception to raise."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        if isinstance(outcome, FakeResponse):
+            return outcome
+        return FakeResponse(outcome)
+
+
+def make_dispatcher(session=None, **kwargs):
+    kwargs.setdefault('backoff_base', 0)
+    dispatcher = BackendDispatcher({'note': URL}, **kwargs)
+    if session is not None:
+        dispatcher._session = lambda backend_type: session
+    return dispatcher
+
+
+def test_throttled_and_unavailable_statuses_are_retried():
+    session = FakeSession(503, 429, 200)
+    dispatcher = make_dispatcher(session)
+    assert dispatcher.post('note', {}).status_code == 200
+    assert session.calls == 3
+    assert dispatcher.retries == 2
+
+
+def test_statuses_that_may_have_been_acted_on_are_not_retried():
+    for status in (500, 502, 504, 400):
+        session = FakeSession(status, 200)
+        assert make_dispatcher(session).post('note', {}).status_code == status
+        assert session.calls == 1
+
+
+def test_retries_stop_at_max_retries():
+    session = FakeSession(503, 503, 503)
+    assert make_dispatcher(session, max_retries=2).post('note', {}).status_code == 503
+    assert session.calls == 3
+
+
+def test_only_errors_before_the_request_was_sent_are_retried():
+    session = FakeSession(requests.ConnectTimeout('connect'), 200)
+    assert make_dispatcher(session).post('note', {}).status_code == 200
+    assert session.calls == 2
+
+    for error in (requests.ReadTimeout('read'), requests.ConnectionError('connection reset')):
+        session = FakeSession(error, 200)
+        with pytest.raises(type(error)):
+            make_dispatcher(session).post('note', {})
+        assert session.calls == 1
+
+
+def test_retry_after_is_honoured_up_to_backoff_max(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    session = FakeSession(FakeResponse(429, {'Retry-After': '2'}), 200)
+    assert make_dispatcher(session, backoff_max=8).post('note', {}).status_code == 200
+    assert sleeps == [2]
+
+    # A longer wait than we are willing to hold the request for returns the 429 to the caller
+    session = FakeSession(FakeResponse(429, {'Retry-After': '120'}), 200)
+    assert make_dispatcher(session, backoff_max=8).post('note', {}).status_code == 429
+    assert session.calls == 1
+
+
+def test_breaker_opens_after_consecutive_failures():
+    session = FakeSession(500, 500)
+    dispatcher = make_dispatcher(session, failure_threshold=2)
+    dispatcher.post('note', {})
+    dispatcher.post('note', {})
+    assert dispatcher.stats()['breakers']['note'] == 'open'
+    with pytest.raises(CircuitOpen):
+        dispatcher.post('note', {})
+    assert session.calls == 2
+
+
+def test_breaker_half_open_trial_closes_or_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.02)
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()  # one trial at a time
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_cancelled_trial_is_released():
+    session = FakeSession(500, KeyboardInterrupt(), 200)
+    dispatcher = make_dispatcher(session, failure_threshold=1, reset_timeout=0)
+    dispatcher.post('note', {})
+    with pytest.raises(KeyboardInterrupt):
+        dispatcher.post('note', {})
+    # The interrupted trial says nothing about the backend, so the next call may try again
+    assert dispatcher.post('note', {}).status_code == 200
+    assert dispatcher.stats()['breakers']['note'] == 'closed'
+
+
+def run_async(dispatcher, handler):
+    async def post():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        dispatcher._client = lambda: client
+        try:
+            return await dispatcher.apost('note', {})
+        finally:
+            await client.aclose()
+
+    return asyncio.run(post())
+
+
+def test_async_post_shares_the_retry_policy():
+    outcomes = [httpx.ConnectError('refused'), 503, 200]
+
+    def handler(request):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome)
+
+    dispatcher = make_dispatcher()
+    assert run_async(dispatcher, handler).status_code == 200
+    assert dispatcher.retries == 2
+
+    def read_timeout(request):
+        raise httpx.ReadTimeout('read')
+
+    with pytest.raises(httpx.ReadTimeout):
+        run_async(make_dispatcher(), read_timeout)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def coalesce(items, status, bad='bad'):
+    """Send `items` as one group; batches holding `bad` fail with `status`. Returns the batches sent and the results."""
+    batches = []
+
+    def send(backend_type, batch, headers):
+        batches.append([item['id'] for item in batch])
+        if any(item['id'] == bad for item in batch):
+            raise StatusError(status)
+
+    coalescer = AcceptCoalescer(send, lambda fn, *args: fn(*args), max_batch=len(items), max_wait=60,
+                                should_split=lambda error: error.status_code in SPLIT_STATUSES)
+    futures = [coalescer.submit('note', {'id': item}, {'Authorization': 'Bearer t'}) for item in items]
+    results = []
+    for future in futures:
+        error = future.exception()
+        results.append(error.status_code if error else 'ok')
+    return batches, results
+
+
+def test_payload_rejections_are_bisected_to_the_bad_item():
+    for status in (400, 422):
+        batches, results = coalesce(['a', 'bad', 'c', 'd'], status)
+        assert batches[0] == ['a', 'bad', 'c', 'd']
+        assert results == ['ok', status, 'ok', 'ok']
+
+
+def test_auth_failures_and_throttling_fail_the_group_without_splitting():
+    for status in (401, 403, 429, 503):
+        batches, results = coalesce(['a', 'bad', 'c', 'd'], status)
+        assert batches == [['a', 'bad', 'c', 'd']]
+        assert results == [status] * 4
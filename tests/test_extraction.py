@@ -0,0 +1,34 @@
+import pytest
+
+from extraction import estimate_tokens, split_transcript
+
+
+def test_sentences_stay_whole():
+    transcript = 'First we ship. Then we test! Are we done? Yes.'
+    assert split_transcript(transcript, 6000, 200) == [transcript]
+    chunks = split_transcript(transcript, 6, 0)
+    assert all(chunk.endswith(('.', '!', '?')) for chunk in chunks)
+
+
+def test_unpunctuated_transcript_respects_the_token_budget():
+    words = [f"word{i}" for i in range(50000)]
+    chunks = split_transcript(' '.join(words), 600, 50)
+    assert len(chunks) > 1
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 600
+    # Cuts fall between words, and consecutive chunks overlap
+    assert set(word for chunk in chunks for word in chunk.split()) == set(words)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[0] in previous.split()
+    assert chunks[0].split()[0] == words[0] and chunks[-1].split()[-1] == words[-1]
+
+
+def test_text_without_spaces_is_cut_anyway():
+    chunks = split_transcript('x' * 499999, 6000, 200)
+    assert max(estimate_tokens(chunk) for chunk in chunks) <= 6000
+    assert ''.join(chunks).count('x') >= 499999
+
+
+def test_overlap_must_be_smaller_than_the_chunk():
+    for max_tokens, overlap_tokens in ((600, 600), (600, 900), (600, -1), (0, 0)):
+        with pytest.raises(ValueError):
+            split_transcript('First we ship. Then we test.', max_tokens, overlap_tokens)
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from jobs import JobQueue
+
+
+def write_snapshot(folder, job):
+    with open(os.path.join(folder, f"{job['id']}.json"), 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_job_runs_and_hides_its_owner(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    job = queue.submit(lambda set_status: 'done', user_email='a@example.com')
+    finished = queue.wait(job.id, since=0, timeout=5)
+    while not finished.done:
+        finished = queue.wait(job.id, since=finished.updated_at, timeout=5)
+    assert finished.result == 'done'
+    assert finished.user_email == 'a@example.com'
+    assert 'user_email' not in finished.to_dict()
+    assert 'pid' not in finished.to_dict()
+
+
+def test_jobs_of_dead_workers_are_failed_at_startup(tmp_path):
+    write_snapshot(tmp_path, {'id': 'orphan', 'status': 'running', 'pid': dead_pid()})
+    write_snapshot(tmp_path, {'id': 'live', 'status': 'running', 'pid': os.getppid()})
+    write_snapshot(tmp_path, {'id': 'finished', 'status': 'completed', 'pid': dead_pid(), 'result': 1})
+    JobQueue(str(tmp_path))
+    with open(tmp_path / 'orphan.json', encoding='utf-8') as f:
+        assert json.load(f)['status'] == 'failed'
+    queue = JobQueue(str(tmp_path))
+    assert queue.get('live').status == 'running'
+    assert queue.get('finished').status == 'completed'
+
+
+def test_stale_job_with_our_own_pid_is_failed(tmp_path):
+    # A restarted container can reuse the pid of the process that wrote the snapshot
+    queue = JobQueue(str(tmp_path))
+    write_snapshot(tmp_path, {'id': 'stale', 'status': 'queued', 'pid': os.getpid()})
+    assert queue.get('stale').status == 'failed'
+
+
+def test_pool_is_created_once_under_concurrency(tmp_path):
+    queue = JobQueue(str(tmp_path))
+    pools = []
+    barrier = threading.Barrier(8)
+
+    def get_pool():
+        barrier.wait()
+        pools.append(queue._pool())
+
+    threads = [threading.Thread(target=get_pool) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(pool) for pool in pools}) == 1
@@ -0,0 +1,100 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from jwks import JwksCache, verify_id_token
+
+AUDIENCE = 'client-id.apps.googleusercontent.com'
+ISSUER = 'https://accounts.google.com'
+
+
+@pytest.fixture(scope='module')
+def private_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def jwks(private_key):
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({'kid': 'key-1', 'alg': 'RS256', 'use': 'sig'})
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return {'keys': [jwk]}, 3600
+
+    cache = JwksCache(fetch=fetch, min_refresh_interval=0)
+    cache.calls = calls
+    return cache
+
+
+def claims(**overrides):
+    now = int(time.time())
+    return {'iss': ISSUER, 'aud': AUDIENCE, 'sub': '1234', 'email': 'a@example.com',
+            'iat': now, 'exp': now + 3600, **overrides}
+
+
+def sign(private_key, payload, kid='key-1'):
+    return jwt.encode(payload, private_key, algorithm='RS256', headers={'kid': kid})
+
+
+def test_valid_token(private_key, jwks):
+    verified = verify_id_token(sign(private_key, claims()), AUDIENCE, jwks)
+    assert verified['email'] == 'a@example.com'
+    assert len(jwks.calls) == 1
+    # The key set is cached
+    verify_id_token(sign(private_key, claims()), AUDIENCE, jwks)
+    assert len(jwks.calls) == 1
+
+
+def test_wrong_audience(private_key, jwks):
+    with pytest.raises(jwt.InvalidAudienceError):
+        verify_id_token(sign(private_key, claims(aud='someone-else')), AUDIENCE, jwks)
+
+
+def test_wrong_issuer(private_key, jwks):
+    with pytest.raises(jwt.InvalidIssuerError):
+        verify_id_token(sign(private_key, claims(iss='https://evil.example.com')), AUDIENCE, jwks)
+
+
+def test_expired_token(private_key, jwks):
+    now = int(time.time())
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verify_id_token(sign(private_key, claims(iat=now - 7200, exp=now - 3600)), AUDIENCE, jwks)
+
+
+def test_unknown_key_id_refetches_then_rejects(private_key, jwks):
+    verify_id_token(sign(private_key, claims()), AUDIENCE, jwks)
+    with pytest.raises(jwt.InvalidTokenError, match='Unknown signing key'):
+        verify_id_token(sign(private_key, claims(), kid='key-2'), AUDIENCE, jwks)
+    assert len(jwks.calls) == 2
+
+
+def b64(part) -> bytes:
+    return base64.urlsafe_b64encode(part if isinstance(part, bytes) else json.dumps(part).encode()).rstrip(b'=')
+
+
+def test_unsigned_token_is_rejected(jwks):
+    token = f"{b64({'alg': 'none', 'kid': 'key-1'}).decode()}.{b64(claims()).decode()}."
+    with pytest.raises(jwt.InvalidTokenError):
+        verify_id_token(token, AUDIENCE, jwks)
+
+
+def test_hmac_token_signed_with_the_public_key_is_rejected(private_key, jwks):
+    # The classic key-confusion attack: HS256 keyed with the published RSA key
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    header = {'alg': 'HS256', 'typ': 'JWT', 'kid': 'key-1'}
+    signing_input = b64(header) + b'.' + b64(claims())
+    signature = b64(hmac.new(public_pem, signing_input, hashlib.sha256).digest())
+    token = (signing_input + b'.' + signature).decode()
+    with pytest.raises(jwt.InvalidTokenError):
+        verify_id_token(token, AUDIENCE, jwks)
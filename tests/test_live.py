@@ -0,0 +1,106 @@
+import io
+import os
+import threading
+import wave
+
+import pytest
+
+from live import LiveSessionError, LiveSessionManager
+
+USER = 'a@example.com'
+
+
+def wav_slice(seconds, sample_rate=16000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b'\0\0' * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+class Recorder:
+    """Stands in for transcription, extraction and storage, and records what it was asked."""
+
+    def __init__(self):
+        self.transcribed = []
+        self.extracted = []
+        self.during_transcription = None
+
+    def transcribe(self, filename, audio):
+        with wave.open(io.BytesIO(audio), 'rb') as wav:
+            duration = wav.getnframes() / wav.getframerate()
+        self.transcribed.append(duration)
+        if self.during_transcription:
+            self.during_transcription()
+        return f'{duration:g}s', [{'start': 0.0, 'end': duration, 'text': f'{duration:g}s'}]
+
+    def extract(self, transcript):
+        self.extracted.append(transcript)
+        return [{'type': 'note', 'content': transcript, 'title': 'Note'}]
+
+    def store(self, user_email, meeting_id, positions, items):
+        return meeting_id or 'meeting-1', [{'file_type': 'note', 'item': item, 'action_item': item} for item in items]
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+@pytest.fixture
+def manager(tmp_path, recorder):
+    return LiveSessionManager(str(tmp_path), recorder.transcribe, recorder.extract, recorder.store,
+                              window_seconds=2, extract_min_tokens=10_000)
+
+
+def test_slices_are_applied_in_order_once(manager):
+    session_id = manager.create(USER)['id']
+    assert manager.add_chunk(session_id, USER, 0, wav_slice(1))['seq'] == 0
+    assert manager.add_chunk(session_id, USER, 0, wav_slice(1))['duplicate']
+    with pytest.raises(LiveSessionError) as error:
+        manager.add_chunk(session_id, USER, 2, wav_slice(1))
+    assert error.value.status_code == 409
+    assert error.value.extra == {'expected_seq': 1}
+    assert manager.summary(session_id, USER)['duration'] == 1
+    with pytest.raises(LiveSessionError) as error:
+        manager.add_chunk(session_id, 'b@example.com', 1, wav_slice(1))
+    assert error.value.status_code == 404
+
+
+def test_full_windows_become_final_and_finish_flushes_the_rest(manager, recorder, tmp_path):
+    session_id = manager.create(USER)['id']
+    assert manager.add_chunk(session_id, USER, 0, wav_slice(1))['final'] == []
+    result = manager.add_chunk(session_id, USER, 1, wav_slice(1.5))
+    assert [segment['start'] for segment in result['final']] == [0.0]
+    assert result['partial'] == []  # partials are off by default
+
+    summary = manager.finish(session_id, USER)
+    assert summary['finished']
+    assert [segment['id'] for segment in summary['segments']] == [0, 1]
+    assert summary['segments'][1]['start'] == pytest.approx(summary['segments'][0]['end'])
+    assert sum(recorder.transcribed) == pytest.approx(2.5)
+    assert recorder.extracted == [summary['transcription']]
+    assert summary['meeting_id'] == 'meeting-1'
+    assert not os.path.exists(tmp_path / session_id / 'audio.pcm')
+
+    with pytest.raises(LiveSessionError) as error:
+        manager.add_chunk(session_id, USER, 2, wav_slice(1))
+    assert error.value.status_code == 410
+    assert manager.finish(session_id, USER) == summary
+
+
+def test_session_stays_readable_while_transcribing(manager, recorder):
+    session_id = manager.create(USER)['id']
+    seen = []
+
+    def read_session():
+        reader = threading.Thread(target=lambda: seen.append(manager.summary(session_id, USER)))
+        reader.start()
+        reader.join(timeout=5)
+
+    recorder.during_transcription = read_session
+    manager.add_chunk(session_id, USER, 0, wav_slice(2))
+    assert len(seen) == 1
+    assert seen[0]['duration'] == 2
@@ -0,0 +1,31 @@
+import io
+
+import numpy as np
+
+from audio import PcmAudio
+from local_whisper import LocalWhisperBackend, WhisperEngine, read_float32
+
+
+def pcm_of(samples, sample_rate):
+    return PcmAudio(io.BytesIO(samples.tobytes()), sample_rate, len(samples))
+
+
+def test_windowed_read_matches_a_whole_file_read():
+    samples = np.random.default_rng(0).integers(-32768, 32767, 16000 * 65 + 7).astype(np.int16)
+    read = read_float32(pcm_of(samples, 16000), 16000, window_seconds=30)
+    assert read.dtype == np.float32
+    assert np.array_equal(read, samples.astype(np.float32) / 32768)
+
+
+def test_windowed_resampling_has_no_seams():
+    samples = np.random.default_rng(1).integers(-32768, 32767, 8000 * 70 + 3).astype(np.int16)
+    read = read_float32(pcm_of(samples, 8000), 16000, window_seconds=30)
+    positions = np.arange(len(samples) * 2) / 2
+    expected = np.interp(positions, np.arange(len(samples)), samples.astype(np.float32) / 32768)
+    assert np.allclose(read, expected)
+
+
+def test_cache_id_includes_language():
+    english = LocalWhisperBackend(WhisperEngine(language='en'))
+    detected = LocalWhisperBackend(WhisperEngine(language=None))
+    assert english.cache_id != detected.cache_id
@@ -0,0 +1,89 @@
+import pytest
+
+
+@pytest.fixture
+def items(app, client):
+    """Two notes and a to-do in one meeting; returns {file_type: [item ids in list order]}."""
+    import main
+    store = main.action_item_store
+    store.add_meeting(client.user_email, {'notes': [{'title': 'A'}, {'title': 'B'}], 'todos': [{'title': 'C'}]})
+    listed = client.get('/get-json-files').get_json()
+    return {file_type: [item['id'] for item in listed[file_type]] for file_type in ('notes', 'todos')}
+
+
+def test_update_by_index(client, items):
+    response = client.post('/update-json-file', json={'file_type': 'notes', 'index': '1', 'item': {'title': 'B2'}})
+    assert response.status_code == 200
+    assert [item['title'] for item in client.get('/get-json-files').get_json()['notes']] == ['A', 'B2']
+
+
+def test_non_integer_index_is_a_bad_request(client, items):
+    for index in ('first', 1.5, [0], True):
+        response = client.post('/update-json-file', json={'file_type': 'notes', 'index': index, 'item': {'title': 'X'}})
+        assert response.status_code == 400
+        response = client.post('/reject-action-item', json={'file_type': 'notes', 'index': index})
+        assert response.status_code == 400
+
+
+def test_missing_items_are_not_found(client, items):
+    assert client.post('/reject-action-item', json={'file_type': 'notes', 'index': 5}).status_code == 404
+    assert client.post('/reject-action-item', json={'file_type': 'notes', 'id': 'nope'}).status_code == 404
+
+
+def test_id_must_belong_to_the_file_type(client, items):
+    to_do_id = items['todos'][0]
+    response = client.post('/reject-action-item', json={'file_type': 'notes', 'id': to_do_id})
+    assert response.status_code == 404
+    response = client.post('/update-json-file', json={'file_type': 'notes', 'id': to_do_id, 'item': {'title': 'X'}})
+    assert response.status_code == 404
+    assert client.post('/reject-action-item', json={'file_type': 'todos', 'id': to_do_id}).status_code == 200
+
+
+def test_other_users_items_are_not_found(app, client, items):
+    other = app.test_client()
+    with other.session_transaction() as session:
+        session['user_email'] = 'someone-else@example.com'
+    response = other.post('/reject-action-item', json={'file_type': 'notes', 'id': items['notes'][0]})
+    assert response.status_code == 404
+
+
+def test_unchanged_items_revalidate_with_304(client, items):
+    first = client.get('/get-json-files')
+    etag = first.headers['ETag']
+    again = client.get('/get-json-files', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+    client.post('/update-json-file', json={'file_type': 'notes', 'index': 0, 'item': {'title': 'A2'}})
+    changed = client.get('/get-json-files', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['notes'][0]['title'] == 'A2'
+
+
+def test_since_returns_only_changes_and_removals(client, items):
+    version = client.get('/get-json-files').get_json()['version']
+    client.post('/update-json-file', json={'file_type': 'notes', 'id': items['notes'][1], 'item': {'title': 'B2'}})
+    client.post('/reject-action-item', json={'file_type': 'notes', 'id': items['notes'][0]})
+
+    delta = client.get(f'/get-json-files?since={version}')
+    body = delta.get_json()
+    assert body['since'] == version
+    assert body['version'] > version
+    assert [item['id'] for item in body['notes']] == [items['notes'][1]]
+    assert body['todos'] == []
+    assert body['removed'] == [items['notes'][0]]
+    # The delta has its own ETag, so it revalidates separately from the full list
+    assert delta.headers['ETag'] != client.get('/get-json-files').headers['ETag']
+    assert client.get(f'/get-json-files?since={version}',
+                      headers={'If-None-Match': delta.headers['ETag']}).status_code == 304
+
+
+def test_since_before_a_newer_meeting_returns_it_in_full(app, client, items):
+    import main
+    version = client.get('/get-json-files').get_json()['version']
+    main.action_item_store.add_meeting(client.user_email, {'notes': [{'title': 'New'}]})
+    body = client.get(f'/get-json-files?since={version}').get_json()
+    assert 'removed' not in body and 'since' not in body
+    assert [item['title'] for item in body['notes']] == ['New']
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from admission import AdmissionError
+from routing import ModelRouter
+
+SHORT = 'Priya, please email the budget to dana@example.com by Friday.'
+NOTE = {'type': 'note', 'content': 'Budget is due Friday', 'title': 'Budget'}
+
+
+class Schema(BaseModel):
+    title: str
+
+
+def validation_error():
+    try:
+        Schema.model_validate({})
+    except ValidationError as e:
+        return e
+
+
+class Calls:
+    """Answers each tier's call with the outcome given for its name: items, or an exception to raise."""
+
+    def __init__(self, **outcomes):
+        self.outcomes = outcomes
+        self.tiers = []
+
+    def __call__(self, tier):
+        self.tiers.append(tier.name)
+        outcome = self.outcomes[tier.name]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def acall(self, tier):
+        return self(tier)
+
+
+def router():
+    return ModelRouter('large-model', 'small-model', small_max_tokens=100)
+
+
+def test_short_transcripts_try_the_small_model_first():
+    calls = Calls(small=[NOTE], large=[])
+    assert router().run(SHORT, calls) == [NOTE]
+    assert calls.tiers == ['small']
+    assert router().plan('word ' * 1000)[0].name == 'large'
+    assert [tier.name for tier in ModelRouter('large-model').plan(SHORT)] == ['large']
+
+
+def test_invalid_output_escalates_to_the_large_model():
+    model_router = router()
+    calls = Calls(small=validation_error(), large=[NOTE])
+    assert model_router.run(SHORT, calls) == [NOTE]
+    assert calls.tiers == ['small', 'large']
+    tiers = model_router.stats()['tiers']
+    assert tiers['small']['invalid']['calls'] == 1
+    assert tiers['large']['accepted']['calls'] == 1
+
+
+def test_unusable_items_escalate_but_are_kept_from_the_last_tier():
+    incomplete = [{'type': 'email', 'content': 'Send the budget', 'recipient': '', 'subject': 'Budget'}]
+    calls = Calls(small=incomplete, large=incomplete)
+    assert router().run(SHORT, calls) == incomplete
+    assert calls.tiers == ['small', 'large']
+
+
+def test_errors_from_the_last_tier_are_raised():
+    with pytest.raises(ValidationError):
+        router().run(SHORT, Calls(small=validation_error(), large=validation_error()))
+    with pytest.raises(RuntimeError):
+        router().run(SHORT, Calls(small=RuntimeError('down'), large=RuntimeError('down')))
+
+
+def test_throttling_is_not_escalated():
+    calls = Calls(small=AdmissionError('busy', 503, 1), large=[NOTE])
+    with pytest.raises(AdmissionError):
+        router().run(SHORT, calls)
+    assert calls.tiers == ['small']
+
+
+def test_an_empty_plan_raises_instead_of_returning_none(monkeypatch):
+    model_router = router()
+    monkeypatch.setattr(model_router, 'plan', lambda transcript: [])
+    with pytest.raises(RuntimeError):
+        model_router.run(SHORT, Calls())
+    with pytest.raises(RuntimeError):
+        asyncio.run(model_router.arun(SHORT, Calls().acall))
+
+
+def test_async_run_escalates_like_run():
+    calls = Calls(small=validation_error(), large=[NOTE])
+    assert asyncio.run(router().arun(SHORT, calls.acall)) == [NOTE]
+    assert calls.tiers == ['small', 'large']
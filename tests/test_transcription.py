@@ -0,0 +1,30 @@
+from transcription import stitch_segments
+
+
+def segment(start, end, text):
+    return {'start': start, 'end': end, 'text': text}
+
+
+def test_repeats_within_a_window_are_kept():
+    stitched = stitch_segments([(0, 100)], [[segment(1, 2, 'Yes.'), segment(2, 3, 'Yes.')]], 1)
+    assert [s['text'] for s in stitched] == ['Yes.', 'Yes.']
+
+
+def test_text_repeated_across_a_seam_is_kept_once():
+    # Windows overlap from 50 to 60; both hear "we ship friday" there
+    windows = [(0, 60), (50, 110)]
+    results = [
+        [segment(40, 48, 'Hello there'), segment(50, 58, 'we ship friday')],
+        [segment(5.5, 9, 'We ship Friday.'), segment(10, 12, 'ok')],
+    ]
+    stitched = stitch_segments(windows, results, 1)
+    assert [s['text'] for s in stitched] == ['Hello there', 'we ship friday', 'ok']
+    assert [s['id'] for s in stitched] == [0, 1, 2]
+    assert stitched[2]['start'] == 60
+
+
+def test_repeat_after_the_overlap_is_kept():
+    windows = [(0, 60), (50, 110)]
+    results = [[segment(50, 58, 'Yes.')], [segment(5.5, 9, 'Yes.'), segment(20, 21, 'Yes.')]]
+    stitched = stitch_segments(windows, results, 1)
+    assert [(s['text'], s['start']) for s in stitched] == [('Yes.', 50), ('Yes.', 70)]
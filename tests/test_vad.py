@@ -0,0 +1,59 @@
+import io
+import math
+from array import array
+
+import pytest
+
+from audio import PcmAudio
+from vad import SpeechMap, VadSettings, strip_silence
+
+RATE = 16000
+
+
+def pcm_of(*parts):
+    """PCM from (seconds, amplitude) parts: a 440 Hz tone, or silence at amplitude 0."""
+    samples = array('h')
+    for seconds, amplitude in parts:
+        samples.extend(int(amplitude * math.sin(2 * math.pi * 440 * i / RATE)) for i in range(int(seconds * RATE)))
+    return PcmAudio(io.BytesIO(samples.tobytes()), RATE, len(samples))
+
+
+def test_times_map_back_across_removed_silence():
+    # Speech at 1-3s and 10-12s of the original, laid end to end
+    speech_map = SpeechMap([(0.0, 1.0, 2.0), (2.0, 10.0, 2.0)], original_duration=15.0)
+    assert speech_map.speech_duration == 4.0
+    assert speech_map.to_original(0.0) == 1.0
+    assert speech_map.to_original(1.5) == 2.5
+    assert speech_map.to_original(2.0) == 10.0  # the seam belongs to the later piece
+    assert speech_map.to_original(3.25) == 11.25
+    assert speech_map.to_original(9.0) == 12.0  # past the end stays inside the last piece
+
+
+def test_segments_and_words_are_remapped():
+    speech_map = SpeechMap([(0.0, 1.0, 2.0), (2.0, 10.0, 2.0)], original_duration=15.0)
+    segments = [{'id': 0, 'start': 1.0, 'end': 3.0, 'text': 'ship it',
+                 'words': [{'word': 'ship', 'start': 1.0, 'end': 1.5}, {'word': 'it', 'start': 2.5, 'end': 3.0}]}]
+    [segment] = speech_map.remap_segments(segments)
+    assert (segment['start'], segment['end']) == (2.0, 11.0)
+    assert [(word['start'], word['end']) for word in segment['words']] == [(2.0, 2.5), (10.5, 11.0)]
+    assert segment['text'] == 'ship it'
+    assert segments[0]['start'] == 1.0  # the input is left alone
+
+
+def test_empty_map_is_the_identity():
+    assert SpeechMap([], original_duration=5.0).to_original(3.3) == 3.3
+
+
+def test_strip_silence_keeps_speech_with_padding():
+    settings = VadSettings()
+    stripped = strip_silence(pcm_of((1, 0), (1, 8000), (3, 0), (1, 8000), (1, 0)), settings)
+    assert stripped is not None
+    pcm, speech_map = stripped
+    assert pcm.duration == pytest.approx(2 + 4 * settings.padding_seconds, abs=2 * settings.frame_seconds)
+    # The second tone starts 5s into the original recording
+    second_start = speech_map.pieces[1][0] + settings.padding_seconds
+    assert speech_map.to_original(second_start) == pytest.approx(5.0, abs=settings.frame_seconds)
+
+
+def test_recordings_with_little_silence_are_left_alone():
+    assert strip_silence(pcm_of((5, 8000), (0.3, 0), (5, 8000)), VadSettings()) is None
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, List, Optional, Tuple
+
+from admission import GroqLimiter
+from audio import AudioSource
+from audio_pipeline import AudioPipeline, PreparedAudio
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_MODEL = "whisper-large-v3"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_transcription_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Process-wide pool shared by all requests, so concurrent uploads cannot fan out unbounded Groq calls."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='transcribe')
+        return _pool
+
+
+def transcribe_file(client, filename: str, audio: AudioSource, model: str = TRANSCRIPTION_MODEL,
+                    limiter: Optional[GroqLimiter] = None) -> Tuple[str, List[dict]]:
+    """Single transcription call; returns the text and the verbose_json segments.
+
+    `audio` may be bytes or a seekable binary stream, which is uploaded without being read into memory.
+    """
+    if not isinstance(audio, (bytes, bytearray)):
+        audio.seek(0)
+    with limiter.call() if limiter else nullcontext():
+        transcription = client.audio.transcriptions.create(
+            file=(filename, audio),
+            model=model,
+            response_format="verbose_json",
+        )
+    data = transcription.model_dump()
+    return data.get('text') or '', data.get('segments') or []
+
+
+async def transcribe_file_async(client, filename: str, audio: AudioSource, model: str = TRANSCRIPTION_MODEL,
+                                limiter: Optional[GroqLimiter] = None) -> Tuple[str, List[dict]]:
+    """transcribe_file() with an AsyncGroq client."""
+    if not isinstance(audio, (bytes, bytearray)):
+        audio.seek(0)
+    async with limiter.acall() if limiter else nullcontext():
+        transcription = await client.audio.transcriptions.create(
+            file=(filename, audio),
+            model=model,
+            response_format="verbose_json",
+        )
+    data = transcription.model_dump()
+    return data.get('text') or '', data.get('segments') or []
+
+
+def _transcribe_window(client, path: str, filename: str, model: str, limiter: Optional[GroqLimiter]) -> List[dict]:
+    with open(path, 'rb') as f:
+        return transcribe_file(client, filename, f, model, limiter)[1]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\W+', ' ', text).strip().lower()
+
+
+def stitch_segments(windows: List[Tuple[int, int]], results: List[List[dict]], sample_rate: int) -> List[dict]:
+    """Merge per-window segments into one timeline.
+
+    Segment times are shifted by their window's start offset. Inside each overlap only segments
+    whose midpoint falls on the window's side of the overlap midpoint are kept, and a segment that
+    starts inside an overlap is dropped when the previous window already has the same text there.
+    Repeats within one window, like two answers of "Yes.", are real speech and are kept.
+    """
+    stitched = []
+    previous = []  # segments kept from the previous window
+    for i, ((start, end), segments) in enumerate(zip(windows, results)):
+        offset = start / sample_rate
+        lower = 0.0 if i == 0 else (start + windows[i - 1][1]) / 2 / sample_rate
+        upper = float('inf') if i == len(windows) - 1 else (windows[i + 1][0] + end) / 2 / sample_rate
+        # Text the previous window heard inside the overlap with this one
+        seam_text = set()
+        if i > 0:
+            seam_end = windows[i - 1][1] / sample_rate
+            seam_text = {_normalize(segment['text']) for segment in previous if segment['end'] > offset}
+        kept = []
+        for segment in segments:
+            seg_start = segment.get('start', 0.0) + offset
+            seg_end = segment.get('end', 0.0) + offset
+            midpoint = (seg_start + seg_end) / 2
+            if not lower <= midpoint < upper:
+                continue
+            if seam_text and seg_start < seam_end and _normalize(segment.get('text', '')) in seam_text:
+                continue
+            kept.append({**segment, 'id': len(stitched) + len(kept), 'start': seg_start, 'end': seg_end})
+        stitched.extend(kept)
+        previous = kept
+    return stitched
+
+
+def transcribe_chunked(client, filename: str, audio: AudioSource, pipeline: AudioPipeline,
+                       max_workers: int = 4, model: str = TRANSCRIPTION_MODEL,
+                       limiter: Optional[GroqLimiter] = None) -> Tuple[str, List[dict]]:
+    """Transcribe a recording prepared by `pipeline`, as overlapping windows in parallel when it is long.
+
+    Segment times are mapped back onto the original recording when silence was cut out. Recordings
+    that cannot be decoded locally, or whose upload is already smaller than our encoding, are sent
+    unchanged in a single call.
+    """
+    prepared = pipeline.prepare(audio)
+    if prepared is None:
+        return transcribe_file(client, filename, audio, model, limiter)
+    try:
+        if not prepared.windows:
+            return '', []
+        if prepared.use_original:
+            return transcribe_file(client, filename, audio, model, limiter)
+        text, segments = _transcribe_windows(client, filename, prepared, max_workers, model, limiter)
+    finally:
+        prepared.close()
+    speech_map = prepared.speech_map
+    if speech_map is not None:
+        segments = speech_map.remap_segments(segments)
+    return text, segments
+
+
+def _transcribe_windows(client, filename: str, prepared: PreparedAudio, max_workers: int, model: str,
+                        limiter: Optional[GroqLimiter]):
+    base = os.path.splitext(filename)[0]
+    names = [f"{base}_{i}{os.path.splitext(path)[1]}" for i, path in enumerate(prepared.paths)]
+    if len(prepared.paths) == 1:
+        with open(prepared.paths[0], 'rb') as f:
+            return transcribe_file(client, names[0], f, model, limiter)
+    logger.info(f"Transcribing {prepared.duration:.0f}s of audio as {len(prepared.windows)} windows")
+    pool = get_transcription_pool(max_workers)
+    futures = [
+        pool.submit(_transcribe_window, client, path, name, model, limiter)
+        for path, name in zip(prepared.paths, names)
+    ]
+    results = [future.result() for future in futures]
+    segments = stitch_segments(prepared.windows, results, prepared.sample_rate)
+    text = " ".join(segment['text'].strip() for segment in segments if segment.get('text'))
+    return text, segments
+
+
+async def transcribe_chunked_async(client, filename: str, audio: AudioSource, pipeline: AudioPipeline,
+                                   max_workers: int = 4, model: str = TRANSCRIPTION_MODEL,
+                                   limiter: Optional[GroqLimiter] = None) -> Tuple[str, List[dict]]:
+    """transcribe_chunked() with an AsyncGroq client: the audio is prepared in a thread, then up to
+    `max_workers` windows are uploaded concurrently from the event loop."""
+    prepared = await asyncio.to_thread(pipeline.prepare, audio)
+    if prepared is None:
+        return await transcribe_file_async(client, filename, audio, model, limiter)
+    try:
+        if not prepared.windows:
+            return '', []
+        if prepared.use_original:
+            return await transcribe_file_async(client, filename, audio, model, limiter)
+        base = os.path.splitext(filename)[0]
+        names = [f"{base}_{i}{os.path.splitext(path)[1]}" for i, path in enumerate(prepared.paths)]
+        if len(prepared.paths) > 1:
+            logger.info(f"Transcribing {prepared.duration:.0f}s of audio as {len(prepared.windows)} windows")
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def transcribe_window(path: str, name: str) -> Tuple[str, List[dict]]:
+            async with semaphore:
+                with open(path, 'rb') as f:
+                    return await transcribe_file_async(client, name, f, model, limiter)
+
+        results = await asyncio.gather(*(transcribe_window(path, name) for path, name in zip(prepared.paths, names)))
+    finally:
+        prepared.close()
+    if len(results) == 1:
+        text, segments = results[0]
+    else:
+        segments = stitch_segments(prepared.windows, [segments for _, segments in results], prepared.sample_rate)
+        text = " ".join(segment['text'].strip() for segment in segments if segment.get('text'))
+    speech_map = prepared.speech_map
+    if speech_map is not None:
+        segments = speech_map.remap_segments(segments)
+    return text, segments
+
+
+class TranscriptionBackend:
+    """Turns an uploaded recording into (text, verbose_json-style segments)."""
+
+    name = 'base'
+
+    @property
+    def cache_id(self) -> str:
+        """Identifies the engine and model in cache keys, so results from different backends never mix."""
+        return self.name
+
+    def load(self):
+        """Prepare expensive state up front; called once per worker process at startup."""
+
+    def transcribe(self, filename: str, audio: AudioSource) -> Tuple[str, List[dict]]:
+        raise NotImplementedError
+
+    async def atranscribe(self, filename: str, audio: AudioSource) -> Tuple[str, List[dict]]:
+        """transcribe() for the ASGI app; backends without an async client run it in a thread."""
+        return await asyncio.to_thread(self.transcribe, filename, audio)
+
+
+class GroqBackend(TranscriptionBackend):
+    """Groq's hosted Whisper; long recordings are split into windows transcribed in parallel.
+
+    `get_client` returns the process's Groq client, which is built lazily and again after a fork;
+    `get_async_client`, when given, returns its AsyncGroq counterpart for atranscribe().
+    """
+
+    name = 'groq'
+
+    def __init__(self, get_client: Callable[[], Any], pipeline: AudioPipeline, model: str = TRANSCRIPTION_MODEL, max_workers: int = 4,
+                 limiter: Optional[GroqLimiter] = None, get_async_client: Optional[Callable[[], Any]] = None):
+        self.get_client = get_client
+        self.get_async_client = get_async_client
+        self.pipeline = pipeline
+        self.model = model
+        self.max_workers = max_workers
+        self.limiter = limiter
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.model}:{self.pipeline.cache_id}"
+
+    def transcribe(self, filename: str, audio: AudioSource) -> Tuple[str, List[dict]]:
+        return transcribe_chunked(self.get_client(), filename, audio, self.pipeline, self.max_workers, self.model,
+                                  self.limiter)
+
+    async def atranscribe(self, filename: str, audio: AudioSource) -> Tuple[str, List[dict]]:
+        if self.get_async_client is None:
+            return await super().atranscribe(filename, audio)
+        return await transcribe_chunked_async(self.get_async_client(), filename, audio, self.pipeline,
+                                              self.max_workers, self.model, self.limiter)
@@ -0,0 +1,25 @@
+import tempfile
+from contextlib import contextmanager
+
+from flask import Request, current_app
+
+
+class SpooledUploadRequest(Request):
+    """Request that buffers multipart file parts in a size-capped spool.
+
+    Parts stay in memory up to UPLOAD_SPOOL_MAX_MEMORY bytes and then move to an anonymous
+    temporary file that the OS removes on close, so nothing is written to the upload folder.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_MAX_MEMORY'])
+
+
+@contextmanager
+def upload_stream(file):
+    """Yield the rewound stream of an uploaded FileStorage and always release it afterwards."""
+    try:
+        file.stream.seek(0)
+        yield file.stream
+    finally:
+        file.close()
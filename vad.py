@@ -0,0 +1,139 @@
+import bisect
+import logging
+import math
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from audio import DEFAULT_SPOOL_BYTES, PcmAudio, frame_energy
+
+logger = logging.getLogger(__name__)
+
+FULL_SCALE_ENERGY = 32768.0 ** 2
+READ_BLOCK_SECONDS = 10
+
+
+@dataclass
+class VadSettings:
+    """Energy-based voice activity detection.
+
+    A frame counts as speech when its energy is `margin_db` above the recording's noise floor (its
+    10th-percentile frame), with the threshold kept between `min_threshold_db` and `max_threshold_db`
+    dBFS so a noisy room or an all-speech recording never gets chopped up. Only pauses of at least
+    `min_silence_seconds` are removed, and `padding_seconds` of audio is kept on both sides of every
+    speech region so word onsets and endings survive.
+    """
+
+    frame_seconds: float = 0.03
+    margin_db: float = 12.0
+    min_threshold_db: float = -60.0
+    max_threshold_db: float = -35.0
+    min_silence_seconds: float = 0.6
+    padding_seconds: float = 0.2
+    min_removed_ratio: float = 0.1
+
+    @property
+    def cache_id(self) -> str:
+        return (f"vad:{self.frame_seconds}:{self.margin_db}:{self.min_threshold_db}:{self.max_threshold_db}:"
+                f"{self.min_silence_seconds}:{self.padding_seconds}")
+
+
+class SpeechMap:
+    """Maps times on the silence-stripped timeline back to the original recording."""
+
+    def __init__(self, pieces: List[Tuple[float, float, float]], original_duration: float):
+        # (start on the stripped timeline, start in the original, duration), in order
+        self.pieces = pieces
+        self.original_duration = original_duration
+        self._starts = [piece[0] for piece in pieces]
+
+    @property
+    def speech_duration(self) -> float:
+        return sum(piece[2] for piece in self.pieces)
+
+    def to_original(self, t: float) -> float:
+        if not self.pieces:
+            return t
+        index = max(0, bisect.bisect_right(self._starts, t) - 1)
+        compact_start, original_start, duration = self.pieces[index]
+        return original_start + min(max(t - compact_start, 0.0), duration)
+
+    def remap_segments(self, segments: List[dict]) -> List[dict]:
+        """Shift segment (and word) timestamps from the stripped audio onto the original recording."""
+        remapped = []
+        for segment in segments:
+            segment = {**segment, 'start': self.to_original(segment.get('start', 0.0)),
+                       'end': self.to_original(segment.get('end', 0.0))}
+            if segment.get('words'):
+                segment['words'] = [
+                    {**word, 'start': self.to_original(word.get('start', 0.0)), 'end': self.to_original(word.get('end', 0.0))}
+                    for word in segment['words']
+                ]
+            remapped.append(segment)
+        return remapped
+
+
+def frame_levels(pcm: PcmAudio, frame: int) -> List[float]:
+    """Energy in dBFS of each `frame`-sample frame, reading the recording in bounded blocks."""
+    levels = []
+    block = max(frame, int(READ_BLOCK_SECONDS * pcm.sample_rate) // frame * frame)
+    for start in range(0, pcm.num_samples, block):
+        samples = pcm.read(start, start + block)
+        for offset in range(0, len(samples), frame):
+            energy = frame_energy(samples, offset, offset + frame)
+            levels.append(10 * math.log10(energy / FULL_SCALE_ENERGY + 1e-12))
+    return levels
+
+
+def detect_speech(pcm: PcmAudio, settings: VadSettings) -> List[Tuple[int, int]]:
+    """Return padded (start, end) sample ranges that contain speech."""
+    frame = max(1, int(settings.frame_seconds * pcm.sample_rate))
+    levels = frame_levels(pcm, frame)
+    if not levels:
+        return []
+    noise_floor = sorted(levels)[len(levels) // 10]
+    threshold = min(max(noise_floor + settings.margin_db, settings.min_threshold_db), settings.max_threshold_db)
+
+    regions = []
+    for i, level in enumerate(levels):
+        if level < threshold:
+            continue
+        start, end = i * frame, min((i + 1) * frame, pcm.num_samples)
+        if regions and start - regions[-1][1] < settings.min_silence_seconds * pcm.sample_rate:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    padding = int(settings.padding_seconds * pcm.sample_rate)
+    padded = []
+    for start, end in regions:
+        start, end = max(0, start - padding), min(pcm.num_samples, end + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+def strip_silence(pcm: PcmAudio, settings: VadSettings,
+                  spool_bytes: int = DEFAULT_SPOOL_BYTES) -> Optional[Tuple[PcmAudio, SpeechMap]]:
+    """Copy only the speech regions of `pcm` into a new PcmAudio.
+
+    Returns None when less than `min_removed_ratio` of the recording would be removed, since the
+    original upload is then as cheap to send as the stripped one.
+    """
+    regions = detect_speech(pcm, settings)
+    kept = sum(end - start for start, end in regions)
+    removed = pcm.num_samples - kept
+    if pcm.num_samples == 0 or removed < settings.min_removed_ratio * pcm.num_samples:
+        return None
+    spool = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    pieces, position = [], 0
+    for start, end in regions:
+        spool.write(pcm.read(start, end).tobytes())
+        pieces.append((position / pcm.sample_rate, start / pcm.sample_rate, (end - start) / pcm.sample_rate))
+        position += end - start
+    logger.info(f"VAD removed {removed / pcm.sample_rate:.1f}s of {pcm.duration:.1f}s "
+                f"({100 * removed / pcm.num_samples:.0f}%) across {len(regions)} speech regions")
+    return (PcmAudio(file=spool, sample_rate=pcm.sample_rate, num_samples=position),
+            SpeechMap(pieces, pcm.duration))